@@ -7,8 +7,10 @@ from pomagma.analyst import client, server
 ADDRESS = os.environ.get("POMAGMA_ANALYST_ADDRESS", "tcp://localhost:34936")
 
 
-def connect(address=ADDRESS):
-    return client.Client(address)
+def connect(address=ADDRESS, pipelined=False, cache=None):
+    if pipelined:
+        return client.PipelinedClient(address, cache=cache)
+    return client.Client(address, cache=cache)
 
 
 def serve(theory, world, address=ADDRESS, **opts):
@@ -22,6 +24,8 @@ def load(theory, world, **opts):
     )
     with pomagma.util.log_duration():
         server = serve(theory, world, address, **opts)
-        with server.connect() as client:
-            yield client
-        server.stop()
+        try:
+            with server.connect() as client:
+                yield client
+        finally:
+            server.stop()
@@ -1,13 +1,24 @@
+import asyncio
+import collections
+import itertools
+import json
+import sqlite3
 import sys
+import threading
 import time
+import uuid
+from concurrent.futures import Future
 
 import zmq
 
 from pomagma.analyst import analyst_messages_pb2 as messages
 from pomagma.analyst import compiler
+from pomagma.compiler.util import LruCache
+from pomagma.io import blobstore
 
 CONTEXT = zmq.Context()
 POLL_TIMEOUT_MS = 1000
+CACHE_CAPACITY = 100000
 VALIDATE_POLL_SEC = 0.1
 Request = messages.AnalystRequest
 Response = messages.AnalystResponse
@@ -32,11 +43,351 @@ class ServerError(Exception):
         return "\n".join(["Server Errors:"] + self.messages)
 
 
+def _check_reply(request, reply):
+    for message in reply.error_log:
+        WARN(message)
+    for key, val in request.ListFields():
+        # Handle different field types for proto3 compatibility
+        if key.name == "id":
+            # For id field (scalar string), verify response id matches request id
+            assert reply.id == val, f"Response id '{reply.id}' != request id '{val}'"
+        elif key.name == "error_log":
+            # repeated field, always present in proto3, skip validation
+            pass
+        else:
+            # For message fields, HasField still works in proto3
+            assert reply.HasField(key.name), key.name
+    if reply.error_log:
+        raise ServerError(reply.error_log)
+
+
+# ----------------------------------------------------------------------------
+# Requests and results shared by Client and PipelinedClient
+
+
+def _check_codes(codes):
+    assert isinstance(codes, list), codes
+    for code in codes:
+        assert isinstance(code, str), code
+
+
+def _simplify_request(codes):
+    """Builds a simplify request from desugared codes."""
+    request = Request()
+    request.simplify.SetInParent()
+    for code in codes:
+        request.simplify.codes.append(code)
+    return request
+
+
+def _simplify_result(reply):
+    return list(map(str, reply.simplify.codes))
+
+
+def _solve_request(var, theory, max_solutions):
+    assert isinstance(var, str), var
+    assert isinstance(theory, str), theory
+    if max_solutions is not None:
+        assert isinstance(max_solutions, (int, float)), max_solutions
+    request = Request()
+    request.solve.program = compiler.compile_solver(var, theory)
+    if max_solutions is not None:
+        request.solve.max_solutions = max_solutions
+    return request
+
+
+def _solve_result(reply):
+    return _solutions(reply.solve)
+
+
+def _solutions(solve):
+    return {
+        "necessary": list(map(str, solve.necessary)),
+        "possible": list(map(str, solve.possible)),
+    }
+
+
+def _solve_batch_request(problems, max_solutions):
+    assert isinstance(problems, list), problems
+    if max_solutions is not None:
+        assert isinstance(max_solutions, (int, float)), max_solutions
+    request = Request()
+    request.solve_batch.SetInParent()
+    for var, theory in problems:
+        assert isinstance(var, str), var
+        assert isinstance(theory, str), theory
+        problem = request.solve_batch.problems.add()
+        problem.program = compiler.compile_solver(var, theory)
+        if max_solutions is not None:
+            problem.max_solutions = max_solutions
+    return request
+
+
+def _solve_batch_result(reply):
+    return [_solutions(solve) for solve in reply.solve_batch.results]
+
+
+def _validate_request(codes):
+    request = Request()
+    request.validate.SetInParent()
+    for code in codes:
+        request.validate.codes.append(code)
+    return request
+
+
+def _validate_result(reply):
+    results = []
+    for result in reply.validate.results:
+        results.append(
+            {
+                "is_top": TROOL[result.is_top],
+                "is_bot": TROOL[result.is_bot],
+            }
+        )
+    return results
+
+
+def _validate_facts_request(facts):
+    assert isinstance(facts, list), facts
+    request = Request()
+    request.validate_facts.SetInParent()
+    for fact in facts:
+        assert isinstance(fact, str), fact
+        request.validate_facts.facts.append(compiler.desugar(fact))
+    return request
+
+
+def _validate_facts_result(reply):
+    return TROOL[reply.validate_facts.result]
+
+
+# ----------------------------------------------------------------------------
+# Result cache
+
+
+# Kinds of results that depend on the server's language, not only its world.
+LANGUAGE_KINDS = frozenset(["simplify"])
+
+
+class ResultCache(object):
+    """Cache of simplify and validate results, shared across runs.
+
+    Results are keyed by (world, language, kind, code), where world is the
+    hash of the server's world, language is the language hash reported by
+    the server for kinds in LANGUAGE_KINDS and empty otherwise, and code is
+    as sent to the server, i.e. desugared. Entries are kept in a bounded
+    in-memory LRU and, if a filename is given, in a sqlite database, so that
+    repeated runs against the same atlas are served locally.
+
+    Example:
+
+        cache = ResultCache.for_world(world, "analyst.db")
+        with Client(address, cache=cache) as client:
+            client.simplify(codes)  # sends only uncached codes
+    """
+
+    def __init__(self, world, filename=None, capacity=CACHE_CAPACITY):
+        assert isinstance(world, str), world
+        self._world = world
+        self._lru = LruCache(capacity, name="analyst.cache")
+        self._lock = threading.Lock()
+        self._db = None
+        if filename is not None:
+            self._db = sqlite3.connect(filename, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "world TEXT, language TEXT, kind TEXT, code TEXT, result TEXT, "
+                "PRIMARY KEY (world, language, kind, code))"
+            )
+            self._db.commit()
+
+    @classmethod
+    def for_world(cls, world, filename=None, capacity=CACHE_CAPACITY):
+        """Creates a cache keyed by the hash of a world blob."""
+        return cls(blobstore.load_blob_ref(world), filename, capacity)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def lookup(self, kind, codes, language=""):
+        """Returns a dict mapping cached codes to results."""
+        assert isinstance(language, str), language
+        results = {}
+        with self._lock:
+            misses = []
+            for code in codes:
+                key = (language, kind, code)
+                if key in self._lru:
+                    results[code] = json.loads(self._lru[key])
+                else:
+                    misses.append(code)
+            if self._db is not None:
+                for code in misses:
+                    row = self._db.execute(
+                        "SELECT result FROM results WHERE "
+                        "world = ? AND language = ? AND kind = ? AND code = ?",
+                        (self._world, language, kind, code),
+                    ).fetchone()
+                    if row is not None:
+                        self._lru[language, kind, code] = row[0]
+                        results[code] = json.loads(row[0])
+        return results
+
+    def update(self, kind, results, language=""):
+        """Stores a dict mapping codes to results."""
+        assert isinstance(language, str), language
+        with self._lock:
+            rows = []
+            for code, result in results.items():
+                data = json.dumps(result)
+                self._lru[language, kind, code] = data
+                rows.append((self._world, language, kind, code, data))
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", rows
+                )
+                self._db.commit()
+
+
+# ----------------------------------------------------------------------------
+# Corpus sessions
+
+Edit = Request.EditCorpus.Edit
+
+
+class CorpusSession(object):
+    """A corpus held by the server and edited by line-level diffs.
+
+    Lines are identified by ids assigned on insert. Edits are queued and sent
+    with the next flush() or poll(), and each poll returns only validities
+    that changed since the previous poll, so that the corpus is neither
+    retransmitted nor revalidated in full.
+
+    Example:
+
+        with client.open_corpus() as session:
+            line_ids = session.insert_lines(lines)
+            for line_id, validity in session.iter_changes():
+                ...
+            session.update(line_ids[0], name, code)
+            changes = session.poll()
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._session_id = ""
+        self._line_ids = itertools.count(1)
+        self._edits = []
+        self._closed = False
+        self.pending_count = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    def _edit(self, op, line_id, name="", code=""):
+        assert not self._closed, "corpus session is closed"
+        assert name is None or isinstance(name, str), name
+        assert isinstance(code, str), code
+        self._edits.append((op, line_id, name or "", code))
+
+    def insert(self, name, code):
+        line_id = next(self._line_ids)
+        self._edit(Edit.INSERT, line_id, name, code)
+        return line_id
+
+    def insert_lines(self, lines):
+        """Inserts lines as in Client.validate_corpus(-), returning ids."""
+        return [self.insert(line["name"], line["code"]) for line in lines]
+
+    def update(self, line_id, name, code):
+        self._edit(Edit.UPDATE, line_id, name, code)
+
+    def remove(self, line_id):
+        self._edit(Edit.REMOVE, line_id)
+
+    def _call(self, poll, close=False):
+        request = Request()
+        if self._edits or close or not self._session_id:
+            request.edit_corpus.SetInParent()
+            request.edit_corpus.session_id = self._session_id
+            request.edit_corpus.close = close
+            for op, line_id, name, code in self._edits:
+                edit = request.edit_corpus.edits.add()
+                edit.op = op
+                edit.line_id = line_id
+                edit.name = name
+                edit.code = code
+        if poll:
+            request.poll_corpus.session_id = self._session_id
+        self._edits = []
+        reply = self._client._call(request)
+        if request.HasField("edit_corpus"):
+            self._session_id = str(reply.edit_corpus.session_id)
+        return reply
+
+    def flush(self):
+        """Sends queued edits without waiting for validation."""
+        if self._edits or not self._session_id:
+            self._call(poll=False)
+
+    def poll(self):
+        """Sends queued edits and returns a dict of changed validities."""
+        reply = self._call(poll=True)
+        self.pending_count = int(reply.poll_corpus.pending_count)
+        changes = {}
+        for change in reply.poll_corpus.changes:
+            result = change.validity
+            changes[int(change.line_id)] = {
+                "is_top": TROOL[result.is_top],
+                "is_bot": TROOL[result.is_bot],
+                "pending": result.pending,
+            }
+        return changes
+
+    def iter_changes(self, poll_sec=VALIDATE_POLL_SEC):
+        """Yields (line_id, validity) pairs until no lines are pending."""
+        while True:
+            for line_id, validity in sorted(self.poll().items()):
+                yield line_id, validity
+            if not self.pending_count:
+                return
+            time.sleep(poll_sec)
+
+    def close(self):
+        if not self._closed:
+            if self._session_id:
+                self._edits = []
+                self._call(poll=False, close=True)
+            self._closed = True
+
+
+# ----------------------------------------------------------------------------
+# Clients
+
+
 class Client(object):
-    def __init__(self, address, poll_callback=None):
+    def __init__(self, address, poll_callback=None, cache=None):
         assert isinstance(address, str), address
         assert poll_callback is None or callable(poll_callback), poll_callback
+        assert cache is None or isinstance(cache, ResultCache), cache
         self._poll_callback = poll_callback
+        self._cache = cache
+        self._language_hash = None
         self._socket = CONTEXT.socket(zmq.REQ)
         print("connecting to analyst at", address)
         self._socket.connect(address)
@@ -56,25 +407,54 @@ class Client(object):
         raw_reply = self._socket.recv(0)
         reply = Response()
         reply.ParseFromString(raw_reply)
-        for message in reply.error_log:
-            WARN(message)
-        for key, val in request.ListFields():
-            # Handle different field types for proto3 compatibility
-            if key.name == "id":
-                # For id field (scalar string), verify response id matches request id
-                assert reply.id == val, (
-                    f"Response id '{reply.id}' != request id '{val}'"
-                )
-            elif key.name == "error_log":
-                # repeated field, always present in proto3, skip validation
-                pass
-            else:
-                # For message fields, HasField still works in proto3
-                assert reply.HasField(key.name), key.name
-        if reply.error_log:
-            raise ServerError(reply.error_log)
+        self._language_hash = reply.language_hash or None
+        _check_reply(request, reply)
         return reply
 
+    def _cache_language(self, kind):
+        """Returns the language part of cache keys for results of kind."""
+        if kind not in LANGUAGE_KINDS:
+            return ""
+        if self._language_hash is None:
+            self.ping()  # every reply reports the server's language hash
+        return self._language_hash or ""
+
+    def _cached_request(self, kind, codes, make_request, parse_result):
+        """Plans a request for only those codes missing from the cache.
+
+        Returns:
+          (request, finish), where request is None if all codes are cached,
+          and finish(reply) returns results for all codes.
+        """
+        if self._cache is None:
+            return make_request(codes), parse_result
+        language = self._cache_language(kind)
+        results = self._cache.lookup(kind, codes, language)
+        misses = list(
+            collections.OrderedDict.fromkeys(
+                code for code in codes if code not in results
+            )
+        )
+
+        def finish(reply):
+            if misses:
+                fresh = parse_result(reply)
+                assert len(fresh) == len(misses), fresh
+                fresh = dict(zip(misses, fresh))
+                if kind not in LANGUAGE_KINDS:
+                    self._cache.update(kind, fresh)
+                elif reply.language_hash:
+                    self._cache.update(kind, fresh, reply.language_hash)
+                results.update(fresh)
+            return [results[code] for code in codes]
+
+        request = make_request(misses) if misses else None
+        return request, finish
+
+    def _call_cached(self, kind, codes, make_request, parse_result):
+        request, finish = self._cached_request(kind, codes, make_request, parse_result)
+        return finish(None if request is None else self._call(request))
+
     def ping(self):
         request = Request()
         self._call(request)
@@ -93,37 +473,19 @@ class Client(object):
         return reply.test_inference.fail_count
 
     def _simplify(self, codes):
-        request = Request()
-        request.simplify.SetInParent()
-        for code in codes:
-            request.simplify.codes.append(compiler.desugar(code))
-        reply = self._call(request)
-        return list(reply.simplify.codes)
+        codes = [compiler.desugar(code) for code in codes]
+        return self._call_cached("simplify", codes, _simplify_request, _simplify_result)
 
     def simplify(self, codes):
-        assert isinstance(codes, list), codes
-        for code in codes:
-            assert isinstance(code, str), code
+        _check_codes(codes)
         results = self._simplify(codes)
         assert len(results) == len(codes), results
-        return list(map(str, results))
+        return results
 
     def _solve(self, var, theory, max_solutions):
-        request = Request()
-        request.solve.program = compiler.compile_solver(var, theory)
-        if max_solutions is not None:
-            request.solve.max_solutions = max_solutions
-        reply = self._call(request)
-        return {
-            "necessary": list(map(str, reply.solve.necessary)),
-            "possible": list(map(str, reply.solve.possible)),
-        }
+        return _solve_result(self._call(_solve_request(var, theory, max_solutions)))
 
     def solve(self, var, theory, max_solutions=None):
-        assert isinstance(var, str), var
-        assert isinstance(theory, str), theory
-        if max_solutions is not None:
-            assert isinstance(max_solutions, (int, float)), max_solutions
         solutions = self._solve(var, theory, max_solutions)
         assert not (set(solutions["necessary"]) & set(solutions["possible"]))
         if max_solutions is not None:
@@ -131,26 +493,22 @@ class Client(object):
             assert count <= max_solutions, solutions
         return solutions
 
-    def _validate(self, codes):
-        request = Request()
-        request.validate.SetInParent()
-        for code in codes:
-            request.validate.codes.append(code)
-        reply = self._call(request)
-        results = []
-        for result in reply.validate.results:
-            results.append(
-                {
-                    "is_top": TROOL[result.is_top],
-                    "is_bot": TROOL[result.is_bot],
-                }
-            )
+    def solve_batch(self, problems, max_solutions=None):
+        """Solves a list of (var, theory) problems in one request.
+
+        This is faster than many calls to solve(-) when theories share facts
+        and rules, since shared sub-programs are executed once per batch.
+        """
+        request = _solve_batch_request(problems, max_solutions)
+        results = _solve_batch_result(self._call(request))
+        assert len(results) == len(problems), results
         return results
 
+    def _validate(self, codes):
+        return self._call_cached("validate", codes, _validate_request, _validate_result)
+
     def validate(self, codes):
-        assert isinstance(codes, list), codes
-        for code in codes:
-            assert isinstance(code, str), code
+        _check_codes(codes)
         results = self._validate(codes)
         assert len(results) == len(codes), results
         return results
@@ -189,18 +547,17 @@ class Client(object):
         assert len(results) == len(lines), results
         return results
 
+    def open_corpus(self):
+        """Returns a new CorpusSession; see CorpusSession."""
+        return CorpusSession(self)
+
     def validate_facts(self, facts, block=True):
-        assert isinstance(facts, list), facts
-        request = Request()
-        request.validate_facts.SetInParent()
-        for fact in facts:
-            assert isinstance(fact, str), fact
-            request.validate_facts.facts.append(compiler.desugar(fact))
+        request = _validate_facts_request(facts)
         reply = self._call(request)
         while block and reply.validate_facts.result == Response.MAYBE:
             time.sleep(VALIDATE_POLL_SEC)
             reply = self._call(request)
-        return TROOL[reply.validate_facts.result]
+        return _validate_facts_result(reply)
 
     def get_histogram(self):
         request = Request()
@@ -218,6 +575,24 @@ class Client(object):
         result = {"obs": obs, "symbols": symbols}
         return result
 
+    def get_stats(self):
+        request = Request()
+        request.get_stats.SetInParent()
+        reply = self._call(request)
+        requests = {}
+        for stats in reply.get_stats.requests:
+            requests[str(stats.name)] = {
+                "count": int(stats.count),
+                "queue_wait_sec_total": float(stats.queue_wait_sec_total),
+                "queue_wait_sec_max": float(stats.queue_wait_sec_max),
+                "service_sec_total": float(stats.service_sec_total),
+                "service_sec_max": float(stats.service_sec_max),
+            }
+        return {
+            "thread_count": int(reply.get_stats.thread_count),
+            "requests": requests,
+        }
+
     def _fit_language(self, histogram=None):
         request = Request()
         request.fit_language.SetInParent()
@@ -251,3 +626,215 @@ class Client(object):
                 assert isinstance(ob, int), ob
                 assert isinstance(count, int), count
         return self._fit_language(histogram)
+
+
+def _then(future, fun):
+    """Returns a new Future of fun(future.result())."""
+    result = Future()
+
+    def done(future):
+        try:
+            result.set_result(fun(future.result()))
+        except Exception as e:
+            result.set_exception(e)
+
+    future.add_done_callback(done)
+    return result
+
+
+class PipelinedClient(Client):
+    """Client that can keep many requests in flight on one connection.
+
+    Requests are sent on a DEALER socket by a background I/O thread, and each
+    reply is matched to its request by id. The blocking methods of Client work
+    unchanged and may be called from many threads at once; the *_future
+    methods return concurrent.futures.Future objects and the *_async methods
+    are coroutines for use with asyncio.
+
+    Example:
+
+        with PipelinedClient(address) as client:
+            futures = [client.simplify_future([code]) for code in codes]
+            results = [future.result() for future in futures]
+    """
+
+    def __init__(self, address, poll_callback=None, cache=None):
+        assert isinstance(address, str), address
+        assert poll_callback is None or callable(poll_callback), poll_callback
+        assert cache is None or isinstance(cache, ResultCache), cache
+        self._poll_callback = poll_callback
+        self._cache = cache
+        self._language_hash = None
+        self._id_prefix = uuid.uuid4().hex[:8]
+        self._id_counter = itertools.count()
+        self._pending = {}  # : id -> (request, Future)
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._error = None  # : the exception that stopped the I/O thread
+        pipe_address = "inproc://analyst-client-{}".format(self._id_prefix)
+        self._pipe_out = CONTEXT.socket(zmq.PAIR)
+        self._pipe_out.bind(pipe_address)
+        # The I/O thread only reads pipe_in, but we own and close it, so that
+        # sends never block on a missing peer if the thread dies.
+        self._pipe_in = CONTEXT.socket(zmq.PAIR)
+        self._pipe_in.connect(pipe_address)
+        self._socket = CONTEXT.socket(zmq.DEALER)
+        self._socket.setsockopt(zmq.LINGER, 0)
+        print("connecting to analyst at", address)
+        self._socket.connect(address)
+        self._thread = threading.Thread(
+            target=self._io_loop,
+            args=(self._pipe_in,),
+            name="analyst-client",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self._thread is None:
+            return
+        with self._send_lock:
+            if self._thread.is_alive():
+                self._pipe_out.send_multipart([b"stop"])
+        self._thread.join()
+        self._thread = None
+        self._pipe_out.close()
+        self._pipe_in.close()
+        self._socket.close()
+        self._fail_pending(ServerError(["client closed"]))
+
+    def _fail_pending(self, error):
+        with self._pending_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for request, future in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    def _io_loop(self, pipe_in):
+        """Forwards requests to the server and resolves futures of replies.
+
+        If the loop dies, e.g. because poll_callback raised, the exception is
+        recorded so that pending and later requests fail with it.
+        """
+        poller = zmq.Poller()
+        poller.register(pipe_in, zmq.POLLIN)
+        poller.register(self._socket, zmq.POLLIN)
+        try:
+            while True:
+                events = dict(poller.poll(timeout=POLL_TIMEOUT_MS))
+                if not events:
+                    if self._poll_callback is not None:
+                        with self._pending_lock:
+                            waiting = bool(self._pending)
+                        if waiting:
+                            self._poll_callback()
+                    continue
+                if pipe_in in events:
+                    frames = pipe_in.recv_multipart()
+                    if frames[0] == b"stop":
+                        return
+                    # An empty delimiter frame keeps compatibility with REP.
+                    self._socket.send_multipart([b"", frames[1]])
+                if self._socket in events:
+                    frames = self._socket.recv_multipart()
+                    self._on_reply(frames[-1])
+        except Exception as e:
+            with self._pending_lock:
+                self._error = e
+            self._fail_pending(e)
+
+    def _on_reply(self, raw_reply):
+        reply = Response()
+        reply.ParseFromString(raw_reply)
+        self._language_hash = reply.language_hash or None
+        with self._pending_lock:
+            request, future = self._pending.pop(reply.id, (None, None))
+        if future is None:
+            WARN("Ignoring reply with unknown id: {}".format(reply.id))
+            return
+        try:
+            _check_reply(request, reply)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(reply)
+
+    def submit(self, request):
+        """Sends a request without waiting, returning a Future of the reply.
+
+        Requests without an id are assigned a unique id. If the I/O thread has
+        died, the returned future fails with the exception that stopped it.
+        """
+        if not request.id:
+            request.id = "{}:{}".format(self._id_prefix, next(self._id_counter))
+        future = Future()
+        with self._pending_lock:
+            if self._error is not None:
+                future.set_exception(self._error)
+                return future
+            if request.id in self._pending:
+                raise ValueError("Duplicate request id: {}".format(request.id))
+            self._pending[request.id] = (request, future)
+        raw_request = request.SerializeToString()
+        with self._send_lock:
+            if self._thread is None:
+                raise ServerError(["client closed"])
+            self._pipe_out.send_multipart([b"send", raw_request])
+        return future
+
+    def _call(self, request):
+        return self.submit(request).result()
+
+    async def call_async(self, request):
+        return await asyncio.wrap_future(self.submit(request))
+
+    def _submit_cached(self, kind, codes, make_request, parse_result):
+        request, finish = self._cached_request(kind, codes, make_request, parse_result)
+        if request is not None:
+            return _then(self.submit(request), finish)
+        future = Future()
+        future.set_result(finish(None))
+        return future
+
+    def simplify_future(self, codes):
+        _check_codes(codes)
+        codes = [compiler.desugar(code) for code in codes]
+        return self._submit_cached(
+            "simplify", codes, _simplify_request, _simplify_result
+        )
+
+    def validate_future(self, codes):
+        _check_codes(codes)
+        return self._submit_cached(
+            "validate", codes, _validate_request, _validate_result
+        )
+
+    def solve_future(self, var, theory, max_solutions=None):
+        request = _solve_request(var, theory, max_solutions)
+        return _then(self.submit(request), _solve_result)
+
+    def solve_batch_future(self, problems, max_solutions=None):
+        request = _solve_batch_request(problems, max_solutions)
+        return _then(self.submit(request), _solve_batch_result)
+
+    def validate_facts_future(self, facts):
+        """Like validate_facts(facts, block=False), but without waiting."""
+        request = _validate_facts_request(facts)
+        return _then(self.submit(request), _validate_facts_result)
+
+    async def simplify_async(self, codes):
+        return await asyncio.wrap_future(self.simplify_future(codes))
+
+    async def validate_async(self, codes):
+        return await asyncio.wrap_future(self.validate_future(codes))
+
+    async def solve_async(self, var, theory, max_solutions=None):
+        future = self.solve_future(var, theory, max_solutions)
+        return await asyncio.wrap_future(future)
+
+    async def validate_facts_async(self, facts):
+        return await asyncio.wrap_future(self.validate_facts_future(facts))
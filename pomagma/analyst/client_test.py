@@ -1,12 +1,15 @@
+import asyncio
 import json
 import os
 
 import pytest
 
 import pomagma.analyst
+import pomagma.analyst.client
 import pomagma.cartographer
 import pomagma.surveyor
 import pomagma.util
+from pomagma.analyst.client import ResultCache
 from pomagma.atlas.bootstrap import THEORY, WORLD
 from pomagma.util import TRAVIS_CI, unicode_to_str
 from pomagma.util.testing import for_each
@@ -51,9 +54,10 @@ def setup_module():
             db.dump(WORLD)
 
 
-def serve(address=ADDRESS):
+def serve(address=ADDRESS, **opts):
     setup_module()
-    return pomagma.analyst.serve(THEORY, WORLD, address, **OPTIONS)
+    opts = dict(OPTIONS, **opts)
+    return pomagma.analyst.serve(THEORY, WORLD, address, **opts)
 
 
 def load():
@@ -74,6 +78,43 @@ def test_ping():
         server.stop()
 
 
+def test_pipelined_ping():
+    server = serve()
+    try:
+        with server.connect(pipelined=True) as client:
+            for _ in range(10):
+                client.ping()
+            expected = ["test-{}".format(i) for i in range(10)]
+            futures = []
+            for id in expected:
+                request = pomagma.analyst.client.Request()
+                request.id = id
+                futures.append(client.submit(request))
+            actual = [future.result().id for future in futures]
+            assert actual == expected
+    finally:
+        server.stop()
+
+
+def test_pipelined_poll_callback_error(tmpdir):
+    class PollError(Exception):
+        pass
+
+    def poll_callback():
+        raise PollError()
+
+    # Nothing listens here, so the request waits until poll_callback raises.
+    address = "ipc://{}".format(tmpdir.join("missing.socket"))
+    client = pomagma.analyst.client.PipelinedClient(address, poll_callback)
+    try:
+        with pytest.raises(PollError):
+            client.submit(pomagma.analyst.client.Request()).result(timeout=60)
+        with pytest.raises(PollError):
+            client.submit(pomagma.analyst.client.Request()).result(timeout=1)
+    finally:
+        client.close()
+
+
 def test_ping_id():
     expected = "test"
     with load() as db:
@@ -131,6 +172,68 @@ def test_simplify():
     assert_examples(codes, expected, actual)
 
 
+def test_simplify_pipelined():
+    codes, expected = transpose(SIMPLIFY_EXAMPLES)
+    server = serve()
+    try:
+        with server.connect(pipelined=True) as client:
+            futures = [client.simplify_future([code]) for code in codes]
+            actual = [future.result()[0] for future in futures]
+    finally:
+        server.stop()
+    assert_examples(codes, expected, actual)
+
+
+def test_validate_async():
+    expected, codes = transpose(VALIDATE_EXAMPLES)
+    server = serve()
+    try:
+        with server.connect(pipelined=True) as client:
+
+            async def validate_all():
+                results = await asyncio.gather(
+                    *[client.validate_async([code]) for code in codes]
+                )
+                return [result[0] for result in results]
+
+            actual = asyncio.run(validate_all())
+    finally:
+        server.stop()
+    assert_examples(codes, expected, actual, cmp_validity)
+
+
+def test_result_cache(tmpdir):
+    filename = str(tmpdir.join("analyst.db"))
+    with ResultCache("world", filename) as cache:
+        assert cache.lookup("simplify", ["I", "K"], "language") == {}
+        cache.update("simplify", {"I": "I"}, "language")
+        cache.update("validate", {"K": {"is_top": False, "is_bot": None}})
+        assert cache.lookup("simplify", ["I", "K"], "language") == {"I": "I"}
+        assert cache.lookup("validate", ["I", "K"]) == {
+            "K": {"is_top": False, "is_bot": None}
+        }
+    with ResultCache("world", filename, capacity=1) as cache:
+        assert cache.lookup("simplify", ["I", "K"], "language") == {"I": "I"}
+        assert cache.lookup("simplify", ["I"], "fitted") == {}
+    with ResultCache("other", filename) as cache:
+        assert cache.lookup("simplify", ["I"], "language") == {}
+
+
+def test_simplify_cached(tmpdir):
+    codes, expected = transpose(SIMPLIFY_EXAMPLES)
+    server = serve()
+    try:
+        cache = server.make_cache(str(tmpdir.join("analyst.db")))
+        with server.connect(cache=cache) as client:
+            actual = client.simplify(codes)
+            assert client.simplify(codes) == actual
+            stats = client.get_stats()
+    finally:
+        server.stop()
+    assert stats["requests"]["simplify"]["count"] == 1
+    assert_examples(codes, expected, actual)
+
+
 SOLVE_EXAMPLES = [
     {
         "var": "x",
@@ -270,6 +373,15 @@ def test_solve(example):
                 assert_equal_example(example[key], actual[key], (example, key))
 
 
+def test_solve_batch():
+    examples = [e for e in SOLVE_EXAMPLES if "skip" not in e]
+    problems = [(e["var"], e["theory"]) for e in examples]
+    with load() as db:
+        expected = [db.solve(var, theory, 5) for var, theory in problems]
+        actual = db.solve_batch(problems, 5)
+    assert actual == expected
+
+
 def test_validate():
     expected, codes = transpose(VALIDATE_EXAMPLES)
     with load() as db:
@@ -297,6 +409,67 @@ def test_validate_corpus():
     assert_examples(lines, expected, actual, cmp_validity)
 
 
+def test_corpus_session():
+    expected, lines = transpose(CORPUS)
+    with load() as db:
+        with db.open_corpus() as session:
+            line_ids = session.insert_lines(lines)
+            actual = {}
+            for line_id, validity in session.iter_changes():
+                actual[line_id] = validity
+            assert sorted(actual) == sorted(line_ids)
+            assert not any(validity["pending"] for validity in actual.values())
+            assert session.poll() == {}
+
+            # Only edited lines are reported.
+            session.update(line_ids[-1], **lines[-1])
+            changes = dict(session.iter_changes())
+            assert list(changes) == [line_ids[-1]]
+            session.remove(line_ids[-1])
+            assert session.poll() == {}
+
+    actual = [actual[line_id] for line_id in line_ids]
+    for validity in actual:
+        del validity["pending"]
+    assert_examples(lines, expected, actual, cmp_validity)
+
+
+def test_corpus_session_redefine():
+    with load() as db:
+        with db.open_corpus() as session:
+            x = session.insert("x", "TOP")
+            y = session.insert("y", "BOT")
+            app_x = session.insert(None, "APP VAR x I")
+            session.insert(None, "I")
+            dict(session.iter_changes())
+
+            # Only lines that depend on an edited definition are relinked.
+            session.update(x, "x", "BOT")
+            changes = dict(session.iter_changes())
+            assert sorted(changes) == sorted([x, app_x])
+            assert changes[app_x]["is_bot"] is True
+
+            # Renaming moves dependents to the new definition.
+            session.update(x, "z", "BOT")
+            session.update(y, "x", "TOP")
+            changes = dict(session.iter_changes())
+            assert sorted(changes) == sorted([x, y, app_x])
+            assert changes[app_x]["is_top"] is True
+
+
+def test_corpus_session_limit():
+    opts = dict(OPTIONS, corpus_session_limit=1)
+    with pomagma.analyst.load(THEORY, WORLD, **opts) as db:
+        with db.open_corpus() as session:
+            session.flush()
+            assert len(session.session_id) == 32
+            with pytest.raises(pomagma.analyst.client.ServerError):
+                db.open_corpus().flush()
+        # Closing a session frees its slot.
+        with db.open_corpus() as session:
+            session.flush()
+
+
 # Some cases should be False but validate_facts is too weak to prove so.
 FALSE_SKIP = True
 
@@ -387,6 +560,25 @@ def test_get_histogram():
     assert histogram["symbols"]
 
 
+def test_get_stats():
+    server = serve(threads=2)
+    try:
+        with server.connect(pipelined=True) as client:
+            futures = [client.simplify_future(["I"]) for _ in range(10)]
+            for future in futures:
+                future.result()
+            client.ping()
+            stats = client.get_stats()
+    finally:
+        server.stop()
+    assert stats["thread_count"] == 2
+    assert stats["requests"]["simplify"]["count"] == 10
+    assert stats["requests"]["ping"]["count"] == 1
+    for request in stats["requests"].values():
+        assert request["queue_wait_sec_max"] >= 0
+        assert request["service_sec_max"] >= 0
+
+
 def validate_language(language):
     total = sum(language.values())
     assert abs(total - 1) < 1e-4, "bad total: {}".format(total)
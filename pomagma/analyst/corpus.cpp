@@ -195,17 +195,54 @@ class Corpus::Parser : public ExprParser<Corpus::Reducer> {
 // Linker
 
 Corpus::Linker::Linker(Dag &dag, std::vector<std::string> &error_log)
-    : m_dag(dag), m_error_log(error_log), m_definitions(), m_ground_terms() {}
+    : m_dag(dag),
+      m_error_log(error_log),
+      m_unlinked(),
+      m_users(),
+      m_definitions(),
+      m_ground_terms() {}
 
 inline void Corpus::Linker::define(const std::string &name, const Term *term) {
     const Term *var = m_dag.variable(name);
-    auto pair = m_definitions.insert(std::make_pair(var, term));
-    if (not pair.second) {
+    if (m_unlinked.find(var) != m_unlinked.end()) {
         POMAGMA_DEBUG("multiple definition of: " << name);
         m_error_log.push_back("multiple definition of: " + name);
+    } else {
+        bind(var, term);
     }
 }
 
+void Corpus::Linker::bind(const Term *var, const Term *term) {
+    m_unlinked[var] = term;
+    m_definitions[var] = term;
+    std::unordered_set<const Term *> free;
+    accum_free(term, free);
+    for (const Term *subterm : free) {
+        m_users.insert(std::make_pair(subterm, var));
+    }
+}
+
+void Corpus::Linker::unbind(const Term *var) {
+    auto found = m_unlinked.find(var);
+    if (found == m_unlinked.end()) {
+        return;
+    }
+    std::unordered_set<const Term *> free;
+    accum_free(found->second, free);
+    for (const Term *subterm : free) {
+        auto range = m_users.equal_range(subterm);
+        for (auto i = range.first; i != range.second; ++i) {
+            if (i->second == var) {
+                m_users.erase(i);
+                break;
+            }
+        }
+    }
+    m_unlinked.erase(found);
+    m_definitions.erase(var);
+    m_ground_terms.erase(var);
+}
+
 void Corpus::Linker::accum_free(const Term *term,
                                 std::unordered_set<const Term *> &free) {
     if (term->arity == Term::VARIABLE) {
@@ -219,23 +256,33 @@ void Corpus::Linker::accum_free(const Term *term,
 }
 
 void Corpus::Linker::finish() {
+    std::unordered_set<const Term *> vars;
+    for (const auto &pair : m_unlinked) {
+        vars.insert(pair.first);
+    }
+    relink(vars);
+}
+
+// Links each of vars whose free variables are all ground, assuming vars are
+// unlinked and every other definition is already linked as far as it can be.
+void Corpus::Linker::relink(const std::unordered_set<const Term *> &vars) {
     std::multimap<const Term *, const Term *> occurrences;
     std::unordered_map<const Term *, size_t> free_counts;
     std::queue<const Term *> ground_terms;
 
-    for (const auto &pair : m_definitions) {
-        const Term *var = pair.first;
-        const Term *term = pair.second;
+    for (const Term *var : vars) {
         std::unordered_set<const Term *> free;
-        accum_free(term, free);
-        free_counts[term] = free.size();
-        if (free.empty()) {
-            ground_terms.push(var);
-        } else {
-            for (const Term *subterm : free) {
+        accum_free(m_unlinked.find(var)->second, free);
+        size_t &free_count = free_counts[var];
+        for (const Term *subterm : free) {
+            if (m_ground_terms.find(subterm) == m_ground_terms.end()) {
+                ++free_count;
                 occurrences.insert(std::make_pair(subterm, var));
             }
         }
+        if (free_count == 0) {
+            ground_terms.push(var);
+        }
     }
 
     while (not ground_terms.empty()) {
@@ -257,6 +304,44 @@ void Corpus::Linker::finish() {
                             << m_definitions.size() << " terms");
 }
 
+std::unordered_set<const Corpus::Term *> Corpus::Linker::redefine(
+    const std::unordered_map<std::string, const Term *> &definitions) {
+    std::unordered_set<const Term *> changed;
+    std::queue<const Term *> queue;
+    for (const auto &pair : definitions) {
+        const Term *var = m_dag.variable(pair.first);
+        unbind(var);
+        if (pair.second) {
+            bind(var, pair.second);
+        }
+        if (changed.insert(var).second) {
+            queue.push(var);
+        }
+    }
+    while (not queue.empty()) {
+        const Term *var = queue.front();
+        queue.pop();
+        auto range = m_users.equal_range(var);
+        for (auto i = range.first; i != range.second; ++i) {
+            if (changed.insert(i->second).second) {
+                queue.push(i->second);
+            }
+        }
+    }
+
+    std::unordered_set<const Term *> vars;
+    for (const Term *var : changed) {
+        m_ground_terms.erase(var);
+        auto found = m_unlinked.find(var);
+        if (found != m_unlinked.end()) {
+            m_definitions[var] = found->second;
+            vars.insert(var);
+        }
+    }
+    relink(vars);
+    return changed;
+}
+
 const Corpus::Term *Corpus::Linker::link(const Term *term) {
     const std::string &name = term->name;
     const Term *const arg0 = term->arg0;
@@ -377,6 +462,21 @@ Corpus::Linker Corpus::linker(
     return linker;
 }
 
+Corpus::Linker Corpus::linker(std::vector<std::string> &error_log) {
+    return Linker(m_dag, error_log);
+}
+
+std::vector<const Corpus::Term *> Corpus::parse_unlinked(
+    const std::vector<Corpus::LineOf<std::string>> &lines,
+    std::vector<std::string> &error_log) {
+    Parser parser(m_signature, m_dag, error_log);
+    std::vector<const Term *> parsed;
+    for (const auto &line : lines) {
+        parsed.push_back(parser.parse(line.body));
+    }
+    return parsed;
+}
+
 std::vector<Corpus::LineOf<const Corpus::Term *>> Corpus::parse(
     const std::vector<Corpus::LineOf<std::string>> &lines,
     Corpus::Linker &linker, std::vector<std::string> &error_log) {
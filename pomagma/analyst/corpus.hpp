@@ -73,17 +73,29 @@ class Corpus {
         const Term *link(const Term *term);
         const Term *approximate(const Term *term, size_t depth);
 
+        // Replaces the named definitions, where nullptr undefines a name,
+        // and relinks only the definitions that depend on them. Returns the
+        // variables whose linked definitions may have changed.
+        std::unordered_set<const Term *> redefine(
+            const std::unordered_map<std::string, const Term *> &definitions);
+
+        static void accum_free(const Term *term,
+                               std::unordered_set<const Term *> &free);
+
        private:
         friend class Corpus;
         Linker(Dag &dag, std::vector<std::string> &error_log);
         void define(const std::string &name, const Term *term);
+        void bind(const Term *var, const Term *term);
+        void unbind(const Term *var);
         void finish();
+        void relink(const std::unordered_set<const Term *> &vars);
         const Term *approximate(const Term *term);
-        static void accum_free(const Term *term,
-                               std::unordered_set<const Term *> &free);
 
         Dag &m_dag;
         std::vector<std::string> &m_error_log;
+        std::unordered_map<const Term *, const Term *> m_unlinked;
+        std::unordered_multimap<const Term *, const Term *> m_users;
         std::unordered_map<const Term *, const Term *> m_definitions;
         std::unordered_set<const Term *> m_ground_terms;
 
@@ -127,6 +139,12 @@ class Corpus {
         const std::vector<LineOf<std::string>> &lines, Linker &linker,
         std::vector<std::string> &error_log);
 
+    // An empty linker and unlinked parses, for editing a corpus in place.
+    Linker linker(std::vector<std::string> &error_log);
+    std::vector<const Term *> parse_unlinked(
+        const std::vector<LineOf<std::string>> &lines,
+        std::vector<std::string> &error_log);
+
     const Histogram &histogram() const;
 
    private:
@@ -1,3 +1,5 @@
+#include <pomagma/io/blobstore.hpp>
+
 #include "server.hpp"
 
 int main(int argc, char** argv) {
@@ -19,6 +21,7 @@ int main(int argc, char** argv) {
     const char* structure_file = argv[1];
     const char* language_file = argv[2];
     const char* address = argv[3];
+    pomagma::init_blob_dir(pomagma::getenv_default("POMAGMA_BLOB_DIR", ""));
 
     pomagma::Server server(structure_file, language_file);
     server.serve(address);
@@ -1,46 +1,110 @@
+#include <google/protobuf/descriptor.h>
 #include <zmq.h>
 
 #include <algorithm>
+#include <iomanip>
 #include <limits>
 #include <map>
 #include <pomagma/analyst/propagate.hpp>
 #include <pomagma/analyst/server.hpp>
 #include <pomagma/atlas/macro/router.hpp>
 #include <pomagma/language/language.hpp>
+#include <pomagma/util/hasher.hpp>
+#include <random>
 #include <sstream>
+#include <string>
 #include <unordered_map>
+#include <vector>
 
 #include "analyst_messages.pb.h"
 
 namespace pomagma {
 
+// Hashes language weights in name order, independently of how they were
+// loaded or fitted.
+static std::string hash_language(
+    const std::unordered_map<std::string, float>& language) {
+    std::map<std::string, float> sorted(language.begin(), language.end());
+    Hasher hasher;
+    for (const auto& pair : sorted) {
+        hasher.add(static_cast<uint64_t>(pair.first.size()));
+        hasher.add(pair.first);
+        hasher.add_raw(&pair.second, sizeof(pair.second));
+    }
+    hasher.finish();
+    return hasher.str();
+}
+
+struct Server::Scratch {
+    Signature signature;
+    UnaryRelation return_relation;
+    UnaryRelation nreturn_relation;
+    vm::ProgramParser parser;
+    vm::VirtualMachine virtual_machine;
+    ApproximateParser approximate_parser;
+    std::vector<std::string> error_log;
+    Simplifier simplifier;
+
+    Scratch(Signature& shared, Approximator& approximator,
+            const std::vector<std::string>& routes)
+        : signature(),
+          return_relation(*shared.carrier()),
+          nreturn_relation(*shared.carrier()),
+          parser(),
+          virtual_machine(),
+          approximate_parser(approximator),
+          error_log(),
+          simplifier(shared, routes, error_log) {
+        // Programs refer to RETURN and NRETURN by name, so this private
+        // signature declares the shared structure plus private relations.
+        signature.declare(*shared.carrier());
+        for (const auto& i : shared.unary_relations()) {
+            signature.declare(i.first, *i.second);
+        }
+        for (const auto& i : shared.binary_relations()) {
+            signature.declare(i.first, *i.second);
+        }
+        for (const auto& i : shared.nullary_functions()) {
+            signature.declare(i.first, *i.second);
+        }
+        for (const auto& i : shared.injective_functions()) {
+            signature.declare(i.first, *i.second);
+        }
+        for (const auto& i : shared.binary_functions()) {
+            signature.declare(i.first, *i.second);
+        }
+        for (const auto& i : shared.symmetric_functions()) {
+            signature.declare(i.first, *i.second);
+        }
+        signature.declare("RETURN", return_relation);
+        signature.declare("NRETURN", nreturn_relation);
+        parser.load(signature);
+        virtual_machine.load(signature);
+    }
+};
+
 Server::Server(const char* structure_file, const char* language_file)
     : m_language(load_language(language_file)),
       m_structure(structure_file),
-      m_return(m_structure.carrier()),
-      m_nreturn(m_structure.carrier()),
       m_dense_set_store(m_structure.carrier().item_dim()),
       m_worker_pool(),
       m_intervals_approximator(m_structure, m_dense_set_store, m_worker_pool),
       m_approximator(m_structure),
-      m_approximate_parser(m_approximator),
       m_probs(),
       m_routes(),
-      m_simplifier(m_structure.signature(), m_routes, m_error_log),
+      m_language_hash(hash_language(m_language)),
       m_corpus(m_structure.signature()),
       m_validator(m_approximator),
-      m_parser(),
-      m_virtual_machine() {
-    // parser and virtual_machine must be loaded after RETURN is declared.
-    Signature& signature = m_structure.signature();
+      m_thread_count(getenv_default("POMAGMA_THREADS", get_cpu_count())),
+      m_corpus_session_limit(
+          getenv_default("POMAGMA_CORPUS_SESSION_LIMIT", size_t(64))),
+      m_corpus_session_timeout(
+          getenv_default("POMAGMA_CORPUS_SESSION_TIMEOUT_SEC", size_t(3600))) {
+    const Signature& signature = m_structure.signature();
     POMAGMA_ASSERT(not signature.unary_relation("RETURN"),
                    "reserved name RETURN is defined in loaded structure");
     POMAGMA_ASSERT(not signature.unary_relation("NRETURN"),
                    "reserved name NRETURN is defined in loaded structure");
-    signature.declare("RETURN", m_return);
-    signature.declare("NRETURN", m_nreturn);
-    m_parser.load(signature);
-    m_virtual_machine.load(signature);
 
     if (POMAGMA_DEBUG_LEVEL > 1) {
         m_structure.validate();
@@ -51,39 +115,291 @@ Server::Server(const char* structure_file, const char* language_file)
     m_routes = router.find_routes();
 }
 
-Server::~Server() {
-    for (const std::string& message : m_error_log) {
-        POMAGMA_WARN(message);
+Server::~Server() {}
+
+// Each worker thread holds at most one Scratch at a time, so at most
+// m_thread_count are ever built, lazily.
+std::shared_ptr<Server::Scratch> Server::acquire_scratch() {
+    std::unique_ptr<Scratch> scratch;
+    {
+        Mutex::Lock lock(m_scratch_mutex);
+        if (not m_idle_scratch.empty()) {
+            scratch = std::move(m_idle_scratch.back());
+            m_idle_scratch.pop_back();
+        }
     }
+    if (not scratch) {
+        scratch.reset(
+            new Scratch(m_structure.signature(), m_approximator, m_routes));
+    }
+    return std::shared_ptr<Scratch>(scratch.release(), [this](Scratch* idle) {
+        Mutex::Lock lock(m_scratch_mutex);
+        m_idle_scratch.emplace_back(idle);
+    });
 }
 
 size_t Server::test_inference() {
+    SharedMutex::UniqueLock lock(m_state_mutex);
     size_t fail_count = m_approximator.test();
     return fail_count;
 }
 
-std::string Server::simplify(const std::string& code) {
-    return m_simplifier.simplify(code);
+std::string Server::simplify(const std::string& code,
+                             std::vector<std::string>& error_log) {
+    SharedMutex::SharedLock lock(m_state_mutex);
+    auto scratch = acquire_scratch();
+    std::string result = scratch->simplifier.simplify(code);
+    error_log.insert(error_log.end(), scratch->error_log.begin(),
+                     scratch->error_log.end());
+    scratch->error_log.clear();
+    return result;
 }
 
 Approximator::Validity Server::validate(const std::string& code) {
-    Approximation approx = m_approximate_parser.parse(code);
+    SharedMutex::SharedLock lock(m_state_mutex);
+    auto scratch = acquire_scratch();
+    Approximation approx = scratch->approximate_parser.parse(code);
     return m_approximator.is_valid(approx);
 }
 
 std::vector<Validator::AsyncValidity> Server::validate_corpus(
-    const std::vector<Corpus::LineOf<std::string>>& lines) {
-    auto linker = m_corpus.linker(lines, m_error_log);
-    auto parsed = m_corpus.parse(lines, linker, m_error_log);
+    const std::vector<Corpus::LineOf<std::string>>& lines,
+    std::vector<std::string>& error_log) {
+    SharedMutex::SharedLock lock(m_state_mutex);
+    Mutex::Lock corpus_lock(m_corpus_mutex);
+    auto linker = m_corpus.linker(lines, error_log);
+    auto parsed = m_corpus.parse(lines, linker, error_log);
     return m_validator.validate(parsed, linker);
 }
 
-const Corpus::Histogram& Server::get_histogram() {
+// Session ids are 128 random bits, so clients cannot guess each other's.
+static std::string random_session_id() {
+    static std::random_device device;
+    std::ostringstream id;
+    for (int i = 0; i < 4; ++i) {
+        id << std::hex << std::setw(8) << std::setfill('0')
+           << static_cast<uint32_t>(device());
+    }
+    return id.str();
+}
+
+// Callers hold m_corpus_sessions_mutex.
+void Server::expire_corpus_sessions() {
+    const auto now = std::chrono::steady_clock::now();
+    for (auto i = m_corpus_sessions.begin(); i != m_corpus_sessions.end();) {
+        if (now - i->second->last_used > m_corpus_session_timeout) {
+            POMAGMA_DEBUG("expiring idle corpus session " << i->first);
+            i = m_corpus_sessions.erase(i);
+        } else {
+            ++i;
+        }
+    }
+}
+
+std::shared_ptr<Server::CorpusSession> Server::find_corpus_session(
+    const std::string& session_id, std::vector<std::string>& error_log) {
+    Mutex::Lock lock(m_corpus_sessions_mutex);
+    expire_corpus_sessions();
+    auto found = m_corpus_sessions.find(session_id);
+    if (found == m_corpus_sessions.end()) {
+        error_log.push_back("unknown corpus session: " + session_id);
+        return nullptr;
+    }
+    found->second->last_used = std::chrono::steady_clock::now();
+    return found->second;
+}
+
+void Server::CorpusSession::drop_unlinked(uint64_t line_id) {
+    auto found = unlinked.find(line_id);
+    if (found == unlinked.end()) {
+        return;
+    }
+    std::unordered_set<const Corpus::Term*> free;
+    Corpus::Linker::accum_free(found->second, free);
+    for (const Corpus::Term* var : free) {
+        auto range = users.equal_range(var);
+        for (auto i = range.first; i != range.second; ++i) {
+            if (i->second == line_id) {
+                users.erase(i);
+                break;
+            }
+        }
+    }
+    unlinked.erase(found);
+}
+
+std::string Server::edit_corpus(const std::string& session_id,
+                                const std::vector<CorpusEdit>& edits,
+                                bool close,
+                                std::vector<std::string>& error_log) {
+    std::string id = session_id;
+    if (id.empty()) {
+        Mutex::Lock lock(m_corpus_sessions_mutex);
+        expire_corpus_sessions();
+        if (m_corpus_sessions.size() >= m_corpus_session_limit) {
+            error_log.push_back("too many open corpus sessions");
+            return "";
+        }
+        do {
+            id = random_session_id();
+        } while (m_corpus_sessions.count(id));
+        auto& session = m_corpus_sessions[id];
+        session.reset(new CorpusSession());
+        session->last_used = std::chrono::steady_clock::now();
+    }
+    auto found = find_corpus_session(id, error_log);
+    if (not found) {
+        return id;
+    }
+    CorpusSession& session = *found;
+    Mutex::Lock session_lock(session.mutex);
+    for (const auto& edit : edits) {
+        auto line = session.lines.find(edit.line_id);
+        const bool exists = line != session.lines.end();
+        if ((edit.op == CorpusEdit::INSERT) == exists) {
+            std::ostringstream message;
+            message << (exists ? "duplicate" : "unknown")
+                    << " corpus line id: " << edit.line_id;
+            error_log.push_back(message.str());
+            continue;
+        }
+        if (exists and line->second.has_name()) {
+            const std::string& name = line->second.maybe_name;
+            auto definers = session.definers.find(name);
+            definers->second.erase(edit.line_id);
+            if (definers->second.empty()) {
+                session.definers.erase(definers);
+            }
+            session.edited_names.insert(name);
+        }
+        if (edit.op == CorpusEdit::REMOVE) {
+            session.lines.erase(line);
+            session.edited_lines.erase(edit.line_id);
+            session.linked.erase(edit.line_id);
+            session.drop_unlinked(edit.line_id);
+        } else {
+            session.lines[edit.line_id] = edit.line;
+            session.edited_lines.insert(edit.line_id);
+            if (edit.line.has_name()) {
+                session.definers[edit.line.maybe_name].insert(edit.line_id);
+                session.edited_names.insert(edit.line.maybe_name);
+            }
+        }
+        session.reported.erase(edit.line_id);
+    }
+    if (close) {
+        Mutex::Lock lock(m_corpus_sessions_mutex);
+        m_corpus_sessions.erase(id);
+    }
+    return id;
+}
+
+static bool same_validity(const Validator::AsyncValidity& lhs,
+                          const Validator::AsyncValidity& rhs) {
+    return lhs.validity.is_top == rhs.validity.is_top and
+           lhs.validity.is_bot == rhs.validity.is_bot and
+           lhs.pending == rhs.pending;
+}
+
+std::vector<Server::CorpusChange> Server::poll_corpus(
+    const std::string& session_id, size_t& pending_count,
+    std::vector<std::string>& error_log) {
+    std::vector<CorpusChange> changes;
+    pending_count = 0;
+    auto found = find_corpus_session(session_id, error_log);
+    if (not found) {
+        return changes;
+    }
+    CorpusSession& session = *found;
+    SharedMutex::SharedLock lock(m_state_mutex);
+    Mutex::Lock session_lock(session.mutex);
+    Mutex::Lock corpus_lock(m_corpus_mutex);
+    if (not session.linker) {
+        session.linker.reset(
+            new Corpus::Linker(m_corpus.linker(session.error_log)));
+    }
+
+    // Reparse edited lines.
+    std::vector<Corpus::LineOf<std::string>> edited;
+    for (uint64_t line_id : session.edited_lines) {
+        session.drop_unlinked(line_id);
+        edited.push_back(session.lines[line_id]);
+    }
+    const auto reparsed = m_corpus.parse_unlinked(edited, session.error_log);
+    std::set<uint64_t> relink_lines;
+    auto term = reparsed.begin();
+    for (uint64_t line_id : session.edited_lines) {
+        session.unlinked[line_id] = *term;
+        std::unordered_set<const Corpus::Term*> free;
+        Corpus::Linker::accum_free(*term, free);
+        for (const Corpus::Term* var : free) {
+            session.users.insert(std::make_pair(var, line_id));
+        }
+        relink_lines.insert(line_id);
+        ++term;
+    }
+
+    // Redefine edited names, then relink lines that depend on them.
+    std::unordered_map<std::string, const Corpus::Term*> definitions;
+    for (const std::string& name : session.edited_names) {
+        auto definers = session.definers.find(name);
+        if (definers == session.definers.end()) {
+            definitions[name] = nullptr;
+        } else {
+            if (definers->second.size() > 1) {
+                session.error_log.push_back("multiple definition of: " + name);
+            }
+            definitions[name] = session.unlinked[*definers->second.begin()];
+        }
+    }
+    for (const Corpus::Term* var : session.linker->redefine(definitions)) {
+        auto range = session.users.equal_range(var);
+        for (auto i = range.first; i != range.second; ++i) {
+            relink_lines.insert(i->second);
+        }
+    }
+    for (uint64_t line_id : relink_lines) {
+        session.linked[line_id] = Corpus::LineOf<const Corpus::Term*>(
+            {session.lines[line_id].maybe_name,
+             session.linker->link(session.unlinked[line_id])});
+    }
+    session.edited_lines.clear();
+    session.edited_names.clear();
+
+    std::vector<uint64_t> line_ids;
+    std::vector<Corpus::LineOf<const Corpus::Term*>> linked;
+    for (const auto& pair : session.linked) {
+        line_ids.push_back(pair.first);
+        linked.push_back(pair.second);
+    }
+    const auto validities = m_validator.validate(linked, *session.linker);
+    for (size_t i = 0; i < validities.size(); ++i) {
+        const uint64_t line_id = line_ids[i];
+        const Validator::AsyncValidity& validity = validities[i];
+        pending_count += validity.pending;
+        auto reported = session.reported.find(line_id);
+        if (reported == session.reported.end() or
+            not same_validity(reported->second, validity)) {
+            session.reported[line_id] = validity;
+            changes.push_back({line_id, validity});
+        }
+    }
+
+    error_log.insert(error_log.end(), session.error_log.begin(),
+                     session.error_log.end());
+    session.error_log.clear();
+    return changes;
+}
+
+Corpus::Histogram Server::get_histogram() {
+    SharedMutex::SharedLock lock(m_state_mutex);
+    Mutex::Lock corpus_lock(m_corpus_mutex);
     return m_corpus.histogram();
 }
 
 std::unordered_map<std::string, float> Server::fit_language(
     const Corpus::Histogram& histogram) {
+    SharedMutex::UniqueLock lock(m_state_mutex);
     Router router(m_structure.signature(), m_language);
     router.fit_language(histogram.symbols, histogram.obs);
     m_language = router.get_language();
@@ -96,13 +412,30 @@ std::unordered_map<std::string, float> Server::fit_language(
 
     m_probs = router.measure_probs();
     m_routes = router.find_routes();
+    m_language_hash = hash_language(m_language);
     return m_language;
 }
 
-std::vector<std::string> Server::flush_errors() {
-    std::vector<std::string> result;
-    m_error_log.swap(result);
-    return result;
+std::string Server::language_hash() {
+    SharedMutex::SharedLock lock(m_state_mutex);
+    return m_language_hash;
+}
+
+std::map<std::string, RequestStats> Server::get_stats() {
+    Mutex::Lock lock(m_stats_mutex);
+    return m_stats;
+}
+
+void Server::record_stats(const std::string& name, double queue_wait_sec,
+                          double service_sec) {
+    Mutex::Lock lock(m_stats_mutex);
+    RequestStats& stats = m_stats[name];
+    stats.count += 1;
+    stats.queue_wait_sec_total += queue_wait_sec;
+    stats.queue_wait_sec_max =
+        std::max(stats.queue_wait_sec_max, queue_wait_sec);
+    stats.service_sec_total += service_sec;
+    stats.service_sec_max = std::max(stats.service_sec_max, service_sec);
 }
 
 void Server::print_ob_set(const DenseSet& set, std::vector<std::string>& result,
@@ -122,48 +455,115 @@ void Server::print_ob_set(const DenseSet& set, std::vector<std::string>& result,
     }
 }
 
-Server::SolutionSet Server::solve(const std::string& program,
-                                  size_t max_solutions) {
-    std::istringstream infile(program);
-    auto listings = m_parser.parse(infile);
-    POMAGMA_ASSERT_LE(1, listings.size());
-
-    m_return.clear();
-    m_nreturn.clear();
-    for (const auto& listing : listings) {
-        vm::Program program = m_parser.find_program(listing);
-        m_virtual_machine.execute(program);
-    }
-    POMAGMA_ASSERT(m_return.get_set().disjoint(m_nreturn.get_set()),
-                   "inconsistent query result; check programs:\n"
-                       << program);
-
+Server::SolutionSet Server::print_solutions(const DenseSet& necessary,
+                                            const DenseSet& impossible,
+                                            size_t max_solutions) {
     SolutionSet solutions;
-    print_ob_set(m_return.get_set(), solutions.necessary, max_solutions);
+    print_ob_set(necessary, solutions.necessary, max_solutions);
     POMAGMA_ASSERT_LE(solutions.necessary.size(), max_solutions);
     max_solutions -= solutions.necessary.size();
     if (max_solutions > 0) {
         // TODO only execute NRETURN programs if needed
         DenseSet possible(m_structure.carrier().item_dim());
-        possible.set_pnn(m_structure.carrier().support(), m_return.get_set(),
-                         m_nreturn.get_set());
+        possible.set_pnn(m_structure.carrier().support(), necessary,
+                         impossible);
         print_ob_set(possible, solutions.possible, max_solutions);
     }
     return solutions;
 }
 
+Server::SolutionSet Server::solve(const std::string& program,
+                                  size_t max_solutions) {
+    return solve_batch({{program, max_solutions}}).front();
+}
+
+// Programs of related theories share many listings, e.g. one per common fact.
+// Each distinct listing is executed once per batch, and each problem's RETURN
+// and NRETURN sets are unions over its listings.
+std::vector<Server::SolutionSet> Server::solve_batch(
+    const std::vector<SolveProblem>& problems) {
+    SharedMutex::SharedLock lock(m_state_mutex);
+    auto scratch = acquire_scratch();
+    vm::ProgramParser& parser = scratch->parser;
+    UnaryRelation& return_relation = scratch->return_relation;
+    UnaryRelation& nreturn_relation = scratch->nreturn_relation;
+    const size_t item_dim = m_structure.carrier().item_dim();
+
+    std::unordered_map<std::string, size_t> listing_ids;
+    std::vector<DenseSet> returns;
+    std::vector<DenseSet> nreturns;
+    std::vector<std::vector<size_t>> problem_listings;
+    for (const auto& problem : problems) {
+        std::istringstream infile(problem.program);
+        auto listings = parser.parse(infile);
+        POMAGMA_ASSERT_LE(1, listings.size());
+        problem_listings.emplace_back();
+        for (const auto& listing : listings) {
+            vm::Program program = parser.find_program(listing);
+            std::string key(reinterpret_cast<const char*>(program),
+                            listing.size);
+            auto inserted = listing_ids.insert({key, returns.size()});
+            if (inserted.second) {
+                return_relation.clear();
+                nreturn_relation.clear();
+                scratch->virtual_machine.execute(program);
+                returns.emplace_back(item_dim);
+                returns.back() = return_relation.get_set();
+                nreturns.emplace_back(item_dim);
+                nreturns.back() = nreturn_relation.get_set();
+            }
+            problem_listings.back().push_back(inserted.first->second);
+        }
+    }
+    POMAGMA_DEBUG("solving " << problems.size() << " problems with "
+                             << returns.size() << " distinct listings");
+
+    std::vector<SolutionSet> results;
+    DenseSet necessary(item_dim);
+    DenseSet impossible(item_dim);
+    for (size_t i = 0; i < problems.size(); ++i) {
+        necessary.zero();
+        impossible.zero();
+        for (size_t id : problem_listings[i]) {
+            necessary += returns[id];
+            impossible += nreturns[id];
+        }
+        POMAGMA_ASSERT(necessary.disjoint(impossible),
+                       "inconsistent query result; check programs:\n"
+                           << problems[i].program);
+        results.push_back(
+            print_solutions(necessary, impossible, problems[i].max_solutions));
+    }
+    return results;
+}
+
 pomagma::Trool Server::validate_facts(
-    const std::vector<std::string>& polish_facts) {
+    const std::vector<std::string>& polish_facts,
+    std::vector<std::string>& error_log) {
+    // m_intervals_approximator is thread safe.
+    SharedMutex::SharedLock lock(m_state_mutex);
     const auto theory = propagate::parse_theory(m_structure.signature(),
-                                                polish_facts, m_error_log);
+                                                polish_facts, error_log);
     return propagate::lazy_validate(theory, m_intervals_approximator);
 }
 
+static void dump_solutions(const Server::SolutionSet& solutions,
+                           protobuf::AnalystResponse::Solve& response_solve) {
+    for (const auto& solution : solutions.necessary) {
+        response_solve.add_necessary(solution);
+    }
+    for (const auto& solution : solutions.possible) {
+        response_solve.add_possible(solution);
+    }
+}
+
 static protobuf::AnalystResponse handle(Server& server,
                                         protobuf::AnalystRequest& request) {
     POMAGMA_INFO("Handling request");
     protobuf::AnalystResponse response;
     typedef protobuf::AnalystResponse::Trool Trool;
+    std::vector<std::string> error_log;
+    const std::string language_hash = server.language_hash();
 
     if (!request.id().empty()) {
         response.set_id(request.id());
@@ -178,7 +578,7 @@ static protobuf::AnalystResponse handle(Server& server,
         size_t code_count = request.simplify().codes_size();
         for (size_t i = 0; i < code_count; ++i) {
             const std::string& code = request.simplify().codes(i);
-            std::string result = server.simplify(code);
+            std::string result = server.simplify(code, error_log);
             response.mutable_simplify()->add_codes(result);
         }
     }
@@ -205,7 +605,7 @@ static protobuf::AnalystResponse handle(Server& server,
             }
             lines[i].body = line.code();
         }
-        const auto validities = server.validate_corpus(lines);
+        const auto validities = server.validate_corpus(lines, error_log);
         auto& responses = *response.mutable_validate_corpus();
         for (const auto& pair : validities) {
             auto& result = *responses.add_results();
@@ -215,8 +615,46 @@ static protobuf::AnalystResponse handle(Server& server,
         }
     }
 
+    if (request.has_edit_corpus()) {
+        const auto& edit_corpus = request.edit_corpus();
+        size_t edit_count = edit_corpus.edits_size();
+        std::vector<Server::CorpusEdit> edits(edit_count);
+        for (size_t i = 0; i < edit_count; ++i) {
+            const auto& edit = edit_corpus.edits(i);
+            edits[i].op = static_cast<Server::CorpusEdit::Op>(edit.op());
+            edits[i].line_id = edit.line_id();
+            edits[i].line.maybe_name = edit.name();
+            edits[i].line.body = edit.code();
+        }
+        const std::string session_id = server.edit_corpus(
+            edit_corpus.session_id(), edits, edit_corpus.close(), error_log);
+        response.mutable_edit_corpus()->set_session_id(session_id);
+        // A new session may be polled in the same request.
+        if (request.has_poll_corpus() and
+            request.poll_corpus().session_id().empty()) {
+            request.mutable_poll_corpus()->set_session_id(session_id);
+        }
+    }
+
+    if (request.has_poll_corpus()) {
+        size_t pending_count = 0;
+        const auto changes = server.poll_corpus(
+            request.poll_corpus().session_id(), pending_count, error_log);
+        auto& response_poll = *response.mutable_poll_corpus();
+        for (const auto& change : changes) {
+            auto& response_change = *response_poll.add_changes();
+            response_change.set_line_id(change.line_id);
+            const auto& validity = change.validity.validity;
+            auto& result = *response_change.mutable_validity();
+            result.set_is_top(static_cast<Trool>(validity.is_top));
+            result.set_is_bot(static_cast<Trool>(validity.is_bot));
+            result.set_pending(change.validity.pending);
+        }
+        response_poll.set_pending_count(pending_count);
+    }
+
     if (request.has_get_histogram()) {
-        const Corpus::Histogram& histogram = server.get_histogram();
+        const Corpus::Histogram histogram = server.get_histogram();
         auto& response_histogram =
             *response.mutable_get_histogram()->mutable_histogram();
         for (const auto& pair : histogram.obs) {
@@ -265,72 +703,193 @@ static protobuf::AnalystResponse handle(Server& server,
         if (max_solutions > 0) {
             Server::SolutionSet solutions =
                 server.solve(request.solve().program(), max_solutions);
-            auto& response_solve = *response.mutable_solve();
-            for (const auto& solution : solutions.necessary) {
-                response_solve.add_necessary(solution);
-            }
-            for (const auto& solution : solutions.possible) {
-                response_solve.add_possible(solution);
-            }
+            dump_solutions(solutions, *response.mutable_solve());
         } else {
             response.add_error_log(
                 "expected request.solve.max_solutions > 0; actual 0");
         }
     }
 
+    if (request.has_solve_batch()) {
+        size_t problem_count = request.solve_batch().problems_size();
+        std::vector<Server::SolveProblem> problems(problem_count);
+        for (size_t i = 0; i < problem_count; ++i) {
+            const auto& problem = request.solve_batch().problems(i);
+            problems[i].program = problem.program();
+            problems[i].max_solutions = std::numeric_limits<size_t>::max();
+            if (problem.max_solutions() != 0) {
+                problems[i].max_solutions = problem.max_solutions();
+            }
+        }
+        auto& response_solve_batch = *response.mutable_solve_batch();
+        for (const auto& solutions : server.solve_batch(problems)) {
+            dump_solutions(solutions, *response_solve_batch.add_results());
+        }
+    }
+
     if (request.has_validate_facts()) {
         const auto& facts = request.validate_facts().facts();
         const std::vector<std::string> polish_facts(facts.begin(), facts.end());
-        const auto result = server.validate_facts(polish_facts);
+        const auto result = server.validate_facts(polish_facts, error_log);
         response.mutable_validate_facts()->set_result(
             static_cast<Trool>(result));
     }
 
-    for (const std::string& message : server.flush_errors()) {
+    if (request.has_get_stats()) {
+        auto& response_stats = *response.mutable_get_stats();
+        response_stats.set_thread_count(server.thread_count());
+        for (const auto& pair : server.get_stats()) {
+            auto& stats = *response_stats.add_requests();
+            stats.set_name(pair.first);
+            stats.set_count(pair.second.count);
+            stats.set_queue_wait_sec_total(pair.second.queue_wait_sec_total);
+            stats.set_queue_wait_sec_max(pair.second.queue_wait_sec_max);
+            stats.set_service_sec_total(pair.second.service_sec_total);
+            stats.set_service_sec_max(pair.second.service_sec_max);
+        }
+    }
+
+    for (const std::string& message : error_log) {
         response.add_error_log(message);
     }
 
+    // Simplify results may have been computed under either language if a
+    // new one was fitted meanwhile, so report no hash in that case.
+    const std::string final_language_hash = server.language_hash();
+    if (final_language_hash == language_hash or not request.has_simplify()) {
+        response.set_language_hash(final_language_hash);
+    }
+
     return response;
 }
 
 #define POMAGMA_ASSERT_C(cond) \
     POMAGMA_ASSERT((cond), "Failed (" #cond "): " << strerror(errno))
 
-void Server::serve(const char* address) {
-    void* context;
-    void* socket;
+// Receives a multipart message, splitting it into a routing envelope (all
+// but the last frame) and a body (the last frame).
+static void recv_multipart(void* socket, std::vector<std::string>& envelope,
+                           std::string& body) {
+    envelope.clear();
     zmq_msg_t message;
-
-    POMAGMA_INFO("Starting server");
-    POMAGMA_ASSERT_C((context = zmq_ctx_new()));
-    POMAGMA_ASSERT_C((socket = zmq_socket(context, ZMQ_REP)));
-    POMAGMA_ASSERT_C(0 == zmq_bind(socket, address));
-
     while (true) {
-        POMAGMA_DEBUG("waiting for request");
         POMAGMA_ASSERT_C(0 == zmq_msg_init(&message));
         POMAGMA_ASSERT_C(-1 != zmq_msg_recv(&message, socket, 0));
-
-        POMAGMA_DEBUG("parsing request");
-        protobuf::AnalystRequest request;
-        bool parsed = request.ParseFromArray(zmq_msg_data(&message),
-                                             zmq_msg_size(&message));
-        POMAGMA_ASSERT(parsed, "Failed to parse request");
+        std::string frame(static_cast<const char*>(zmq_msg_data(&message)),
+                          zmq_msg_size(&message));
+        const bool more = zmq_msg_more(&message);
         POMAGMA_ASSERT_C(0 == zmq_msg_close(&message));
+        if (not more) {
+            body.swap(frame);
+            return;
+        }
+        envelope.push_back(std::move(frame));
+    }
+}
 
-        protobuf::AnalystResponse response = handle(*this, request);
+static void send_multipart(void* socket,
+                           const std::vector<std::string>& envelope,
+                           const std::string& body) {
+    for (const std::string& frame : envelope) {
+        POMAGMA_ASSERT_C(int(frame.size()) == zmq_send(socket, frame.data(),
+                                                       frame.size(),
+                                                       ZMQ_SNDMORE));
+    }
+    POMAGMA_ASSERT_C(int(body.size()) ==
+                     zmq_send(socket, body.data(), body.size(), 0));
+}
 
-        POMAGMA_DEBUG("serializing response");
-        std::string response_str;
-        response.SerializeToString(&response_str);
-        const int size = response_str.length();
-        POMAGMA_ASSERT_C(0 == zmq_msg_init(&message));
-        POMAGMA_ASSERT_C(0 == zmq_msg_init_size(&message, size));
-        memcpy(zmq_msg_data(&message), response_str.c_str(), size);
+// Names a request by its set fields, e.g. "simplify" or "ping".
+static std::string request_name(const protobuf::AnalystRequest& request) {
+    std::vector<const google::protobuf::FieldDescriptor*> fields;
+    request.GetReflection()->ListFields(request, &fields);
+    std::string name;
+    for (const auto* field : fields) {
+        if (field->name() == "id" or field->name() == "error_log") {
+            continue;
+        }
+        if (not name.empty()) {
+            name += "+";
+        }
+        name += field->name();
+    }
+    return name.empty() ? "ping" : name;
+}
 
-        POMAGMA_DEBUG("sending response");
-        POMAGMA_ASSERT_C(size == zmq_msg_send(&message, socket, 0));
-        POMAGMA_ASSERT_C(0 == zmq_msg_close(&message));
+// The server binds a ROUTER socket, so that each client may have many
+// requests in flight. Each response is sent with the routing envelope of its
+// request: REQ clients see ordinary request-reply, and DEALER clients match
+// responses to requests by their id field.
+//
+// The main thread only routes messages: requests are handled by a pool of
+// POMAGMA_THREADS workers, which send responses back to the main thread
+// over an inproc socket.
+void Server::serve(const char* address) {
+    void* context;
+    void* frontend;
+    void* backend;
+    void* responses;
+    const char* backend_address = "inproc://analyst-responses";
+
+    POMAGMA_INFO("Starting server with " << m_thread_count << " workers");
+    POMAGMA_ASSERT_C((context = zmq_ctx_new()));
+    POMAGMA_ASSERT_C((frontend = zmq_socket(context, ZMQ_ROUTER)));
+    POMAGMA_ASSERT_C(0 == zmq_bind(frontend, address));
+    POMAGMA_ASSERT_C((backend = zmq_socket(context, ZMQ_PULL)));
+    POMAGMA_ASSERT_C(0 == zmq_bind(backend, backend_address));
+    POMAGMA_ASSERT_C((responses = zmq_socket(context, ZMQ_PUSH)));
+    POMAGMA_ASSERT_C(0 == zmq_connect(responses, backend_address));
+
+    // Workers share the responses socket, serialized by responses_mutex.
+    Mutex responses_mutex;
+    WorkerPool request_pool(m_thread_count);
+
+    zmq_pollitem_t items[] = {
+        {frontend, 0, ZMQ_POLLIN, 0},
+        {backend, 0, ZMQ_POLLIN, 0},
+    };
+    std::vector<std::string> envelope;
+    std::string body;
+    while (true) {
+        POMAGMA_ASSERT_C(-1 != zmq_poll(items, 2, -1));
+
+        if (items[0].revents & ZMQ_POLLIN) {
+            POMAGMA_DEBUG("receiving request");
+            recv_multipart(frontend, envelope, body);
+            const Timer queue_timer;
+            request_pool.schedule([this, envelope, body, queue_timer, responses,
+                                   &responses_mutex] {
+                const double queue_wait_sec = queue_timer.elapsed();
+                const Timer service_timer;
+
+                POMAGMA_DEBUG("parsing request");
+                protobuf::AnalystRequest request;
+                bool parsed = request.ParseFromString(body);
+                POMAGMA_ASSERT(parsed, "Failed to parse request");
+
+                protobuf::AnalystResponse response = handle(*this, request);
+
+                POMAGMA_DEBUG("serializing response");
+                std::string response_str;
+                response.SerializeToString(&response_str);
+
+                const std::string name = request_name(request);
+                const double service_sec = service_timer.elapsed();
+                POMAGMA_DEBUG("handled " << name << " after waiting "
+                                         << queue_wait_sec << " sec for "
+                                         << service_sec << " sec");
+                record_stats(name, queue_wait_sec, service_sec);
+
+                Mutex::Lock lock(responses_mutex);
+                send_multipart(responses, envelope, response_str);
+            });
+        }
+
+        if (items[1].revents & ZMQ_POLLIN) {
+            POMAGMA_DEBUG("sending response");
+            recv_multipart(backend, envelope, body);
+            send_multipart(frontend, envelope, body);
+        }
     }
 }
 
@@ -1,5 +1,8 @@
 #pragma once
 
+#include <chrono>
+#include <map>
+#include <memory>
 #include <pomagma/analyst/approximate.hpp>
 #include <pomagma/analyst/corpus.hpp>
 #include <pomagma/analyst/intervals.hpp>
@@ -9,55 +12,140 @@
 #include <pomagma/atlas/macro/vm.hpp>
 #include <pomagma/util/dense_set_store.hpp>
 #include <pomagma/util/worker_pool.hpp>
+#include <set>
 
 namespace pomagma {
 
+// Per-request-type timing, for sizing the pool of request workers.
+struct RequestStats {
+    size_t count = 0;
+    double queue_wait_sec_total = 0;
+    double queue_wait_sec_max = 0;
+    double service_sec_total = 0;
+    double service_sec_max = 0;
+};
+
 class Server {
+    // A corpus held across requests, edited by line id. Each poll reparses
+    // only the edited lines and relinks only the lines that depend on a
+    // changed definition.
+    struct CorpusSession {
+        Mutex mutex;
+        std::map<uint64_t, Corpus::LineOf<std::string>> lines;
+        std::unordered_map<uint64_t, Validator::AsyncValidity> reported;
+        std::set<uint64_t> edited_lines;
+        std::set<std::string> edited_names;
+        // The lowest line id defining a name wins.
+        std::map<std::string, std::set<uint64_t>> definers;
+        std::unordered_map<uint64_t, const Corpus::Term*> unlinked;
+        std::unordered_multimap<const Corpus::Term*, uint64_t> users;
+        std::map<uint64_t, Corpus::LineOf<const Corpus::Term*>> linked;
+        std::unique_ptr<Corpus::Linker> linker;
+        std::vector<std::string> error_log;
+        std::chrono::steady_clock::time_point last_used;
+
+        void drop_unlinked(uint64_t line_id);
+    };
+
+    // Parsers, the simplifier and the solver's RETURN and NRETURN relations
+    // are not thread safe, so each concurrent request checks out its own.
+    struct Scratch;
+
     std::unordered_map<std::string, float> m_language;
     Structure m_structure;
-    UnaryRelation m_return;
-    UnaryRelation m_nreturn;
     DenseSetStore m_dense_set_store;
     WorkerPool m_worker_pool;
     intervals::Approximator m_intervals_approximator;
     Approximator m_approximator;
-    ApproximateParser m_approximate_parser;
     std::vector<float> m_probs;
     std::vector<std::string> m_routes;
-    Simplifier m_simplifier;
+    std::string m_language_hash;
     Corpus m_corpus;
     Validator m_validator;
-    vm::ProgramParser m_parser;
-    vm::VirtualMachine m_virtual_machine;
-    std::vector<std::string> m_error_log;
+    const size_t m_thread_count;
+
+    // Read-only requests hold m_state_mutex shared and may run concurrently,
+    // whereas mutating requests hold it uniquely. The corpus hash-conses
+    // terms as it parses, so corpus requests also hold m_corpus_mutex.
+    SharedMutex m_state_mutex;
+    Mutex m_corpus_mutex;
+    Mutex m_scratch_mutex;
+    std::vector<std::unique_ptr<Scratch>> m_idle_scratch;
+    Mutex m_stats_mutex;
+    std::map<std::string, RequestStats> m_stats;
+    // Sessions have unguessable ids and expire when idle, and at most
+    // m_corpus_session_limit may be open at once.
+    Mutex m_corpus_sessions_mutex;
+    std::unordered_map<std::string, std::shared_ptr<CorpusSession>>
+        m_corpus_sessions;
+    const size_t m_corpus_session_limit;
+    const std::chrono::seconds m_corpus_session_timeout;
 
    public:
     Server(const char* structure_file, const char* language_file);
     ~Server();
 
+    struct CorpusEdit {
+        enum Op { INSERT, UPDATE, REMOVE };
+        Op op;
+        uint64_t line_id;
+        Corpus::LineOf<std::string> line;
+    };
+
+    struct CorpusChange {
+        uint64_t line_id;
+        Validator::AsyncValidity validity;
+    };
+
     struct SolutionSet {
         std::vector<std::string> necessary;
         std::vector<std::string> possible;
     };
 
+    struct SolveProblem {
+        std::string program;
+        size_t max_solutions;
+    };
+
     size_t test_inference();
-    std::string simplify(const std::string& code);
+    std::string simplify(const std::string& code,
+                         std::vector<std::string>& error_log);
     Approximator::Validity validate(const std::string& code);
     std::vector<Validator::AsyncValidity> validate_corpus(
-        const std::vector<Corpus::LineOf<std::string>>& lines);
-    const Corpus::Histogram& get_histogram();
+        const std::vector<Corpus::LineOf<std::string>>& lines,
+        std::vector<std::string>& error_log);
+    std::string edit_corpus(const std::string& session_id,
+                            const std::vector<CorpusEdit>& edits, bool close,
+                            std::vector<std::string>& error_log);
+    std::vector<CorpusChange> poll_corpus(const std::string& session_id,
+                                          size_t& pending_count,
+                                          std::vector<std::string>& error_log);
+    Corpus::Histogram get_histogram();
     std::unordered_map<std::string, float> fit_language(
         const Corpus::Histogram& histogram);
     SolutionSet solve(const std::string& program, size_t max_solutions);
-    Trool validate_facts(const std::vector<std::string>& polish_facts);
+    std::vector<SolutionSet> solve_batch(
+        const std::vector<SolveProblem>& problems);
+    Trool validate_facts(const std::vector<std::string>& polish_facts,
+                         std::vector<std::string>& error_log);
+    size_t thread_count() const { return m_thread_count; }
+    std::string language_hash();
+    std::map<std::string, RequestStats> get_stats();
 
     void serve(const char* address) __attribute__((noreturn));
 
-    std::vector<std::string> flush_errors();
-
    private:
+    std::shared_ptr<Scratch> acquire_scratch();
+    std::shared_ptr<CorpusSession> find_corpus_session(
+        const std::string& session_id, std::vector<std::string>& error_log);
+    void expire_corpus_sessions();
+    void record_stats(const std::string& name, double queue_wait_sec,
+                      double service_sec);
     void print_ob_set(const DenseSet& set, std::vector<std::string>& result,
                       size_t max_count) const;
+    SolutionSet print_solutions(const DenseSet& necessary,
+                                const DenseSet& impossible,
+                                size_t max_solutions);
 };
 
 }  // namespace pomagma
@@ -2,7 +2,7 @@ import os
 from subprocess import CalledProcessError
 
 import pomagma.util
-from pomagma.analyst.client import Client
+from pomagma.analyst.client import Client, PipelinedClient, ResultCache
 
 BINARY = os.path.join(pomagma.util.BIN, "analyst", "analyst")
 
@@ -22,6 +22,7 @@ class Server(object):
         assert os.path.exists(world), world
         assert os.path.exists(language_file), language_file
         self._theory = theory
+        self._world = world
         self._address = address
         self._dir = os.path.abspath(os.curdir)
         self._log_file = pomagma.util.get_log_file(opts)
@@ -39,12 +40,19 @@ class Server(object):
     def pid(self):
         return self._proc.pid
 
-    def connect(self):
-        return Client(self.address, poll_callback=self.check)
+    def connect(self, pipelined=False, cache=None):
+        if pipelined:
+            return PipelinedClient(self.address, poll_callback=self.check, cache=cache)
+        return Client(self.address, poll_callback=self.check, cache=cache)
+
+    def make_cache(self, filename=None):
+        return ResultCache.for_world(self._world, filename)
 
     def stop(self):
+        # Wait, so that a server restarted at this address cannot reach us.
         if self._proc.poll() is None:
             self._proc.terminate()
+            self._proc.wait()
 
     def kill(self):
         self._proc.kill()
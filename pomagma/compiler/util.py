@@ -1,4 +1,5 @@
 import atexit
+import collections
 import contextlib
 import functools
 import glob
@@ -8,6 +9,7 @@ import sys
 from math import exp, log
 
 import pomagma.util
+from pomagma.util.metrics import COLLECTORS, COUNTERS
 
 function = type(lambda x: x)
 
@@ -153,9 +155,126 @@ def find_theories():
 
 MEMOIZED_CACHES = {}
 
+MEMOIZE_CAPACITY = int(os.environ.get("POMAGMA_MEMOIZE_CAPACITY", 0))
+"""Default per-function capacity of memoized caches; 0 means unbounded."""
 
-def memoize_arg(fun):
-    cache = {}
+_DEFAULT = object()
+
+counter = COUNTERS[__name__]
+
+
+class LruCache(object):
+    """A bounded dict-like cache that evicts least recently used entries.
+
+    Each entry has size sizeof(key, value), defaulting to 1, and entries are
+    evicted until the total size is at most capacity. Lookups and evictions
+    are tallied in plain integers, which are copied into COUNTERS only when
+    counters are read; see pomagma.util.metrics.collect_counters().
+    """
+
+    __slots__ = [
+        "capacity",
+        "sizeof",
+        "size",
+        "name",
+        "hits",
+        "misses",
+        "evictions",
+        "_data",
+    ]
+
+    def __init__(self, capacity, sizeof=None, name="lru"):
+        assert capacity > 0, capacity
+        self.capacity = capacity
+        self.sizeof = sizeof
+        self.size = 0
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __getitem__(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        data = self._data
+        if key in data:
+            self.size -= self._sizeof(key, data.pop(key))
+        data[key] = value
+        self.size += self._sizeof(key, value)
+        while self.size > self.capacity and len(data) > 1:
+            old_key, old_value = data.popitem(last=False)
+            self.size -= self._sizeof(old_key, old_value)
+            self.evictions += 1
+
+    def _sizeof(self, key, value):
+        return 1 if self.sizeof is None else self.sizeof(key, value)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        return list(self._data.items())
+
+    def update(self, other):
+        for key, value in other.items():
+            self[key] = value
+
+    def clear(self):
+        self._data.clear()
+        self.size = 0
+
+
+def _collect_counters():
+    for cache in list(MEMOIZED_CACHES.values()):
+        if isinstance(cache, LruCache):
+            counter["{}.hit".format(cache.name)] = cache.hits
+            counter["{}.miss".format(cache.name)] = cache.misses
+            counter["{}.evict".format(cache.name)] = cache.evictions
+
+
+COLLECTORS.append(_collect_counters)
+
+
+def _make_memo_cache(fun, capacity, sizeof):
+    if capacity is _DEFAULT:
+        capacity = MEMOIZE_CAPACITY or None
+    if capacity is None:
+        assert sizeof is None, "sizeof requires a capacity"
+        return {}
+    name = "{}.{}".format(fun.__module__, fun.__qualname__)
+    return LruCache(capacity, sizeof, name)
+
+
+def memoize_arg(fun=None, capacity=_DEFAULT, sizeof=None):
+    """Memoize a function of one hashable argument.
+
+    Args:
+      capacity: max total size of cached entries, or None for unbounded.
+        Defaults to $POMAGMA_MEMOIZE_CAPACITY, unbounded if unset or 0.
+        Functions used for hash consing must pass capacity=None.
+      sizeof: optional function (arg, result) -> size, defaulting to 1.
+    """
+    if fun is None:
+        return functools.partial(memoize_arg, capacity=capacity, sizeof=sizeof)
+    cache = _make_memo_cache(fun, capacity, sizeof)
 
     @functools.wraps(fun)
     def memoized(arg):
@@ -170,8 +289,18 @@ def memoize_arg(fun):
     return memoized
 
 
-def memoize_args(fun):
-    cache = {}
+def memoize_args(fun=None, capacity=_DEFAULT, sizeof=None):
+    """Memoize a function of hashable positional arguments.
+
+    Args:
+      capacity: max total size of cached entries, or None for unbounded.
+        Defaults to $POMAGMA_MEMOIZE_CAPACITY, unbounded if unset or 0.
+        Functions used for hash consing must pass capacity=None.
+      sizeof: optional function (args, result) -> size, defaulting to 1.
+    """
+    if fun is None:
+        return functools.partial(memoize_args, capacity=capacity, sizeof=sizeof)
+    cache = _make_memo_cache(fun, capacity, sizeof)
 
     @functools.wraps(fun)
     def memoized(*args):
@@ -277,5 +406,5 @@ def memoize_modulo_renaming_constants(fun):
 
 
 def memoize_make(cls):
-    cls.make = staticmethod(memoize_args(cls))
+    cls.make = staticmethod(memoize_args(cls, capacity=None))
     return cls
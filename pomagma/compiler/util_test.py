@@ -1,4 +1,11 @@
-from pomagma.compiler.util import eval_float44, eval_float53
+from pomagma.compiler.util import (
+    MEMOIZED_CACHES,
+    eval_float44,
+    eval_float53,
+    memoize_arg,
+    memoize_args,
+)
+from pomagma.util.metrics import collect_counters
 
 
 def test_eval_float44():
@@ -15,3 +22,46 @@ def test_eval_float53():
     for i, j in zip(values[:-1], values[1:]):
         assert i < j
         assert j - i - 1 < 0.04 * j  # less than 4% wasted space
+
+
+def test_memoize_args_lru():
+    calls = []
+
+    @memoize_args(capacity=2)
+    def fun(x, y):
+        calls.append((x, y))
+        return x + y
+
+    cache = MEMOIZED_CACHES[fun]
+    hit = "{}.{}.hit".format(fun.__module__, fun.__qualname__)
+    evict = "{}.{}.evict".format(fun.__module__, fun.__qualname__)
+    counter = collect_counters()["pomagma.compiler.util"]
+    hits = counter[hit]
+    evictions = counter[evict]
+
+    assert fun(1, 2) == 3
+    assert fun(3, 4) == 7
+    assert fun(1, 2) == 3  # hit, and (1, 2) becomes most recent
+    assert fun(5, 6) == 11  # evicts (3, 4)
+    assert len(cache) == 2
+    assert fun(1, 2) == 3
+    assert fun(3, 4) == 7
+    assert calls == [(1, 2), (3, 4), (5, 6), (3, 4)]
+    collect_counters()
+    assert counter[hit] - hits == 2
+    assert counter[evict] - evictions == 2
+
+
+def test_memoize_arg_sizeof():
+    @memoize_arg(capacity=10, sizeof=lambda arg, result: len(result))
+    def fun(n):
+        return "x" * n
+
+    cache = MEMOIZED_CACHES[fun]
+    fun(4)
+    fun(4)
+    fun(5)
+    assert cache.size == 9
+    fun(3)
+    assert cache.size == 8
+    assert len(cache) == 2
@@ -91,6 +91,19 @@ def define(name=None, max_solutions=32, address=pomagma.analyst.ADDRESS):
     return solutions
 
 
+@parsable
+def define_all(max_solutions=32, address=pomagma.analyst.ADDRESS):
+    """Conjecture definitions of all types in a single batch request."""
+    names = sorted(theories)
+    problems = [("t", theories[name]) for name in names]
+    with pomagma.analyst.connect(address) as db:
+        results = db.solve_batch(problems, int(max_solutions))
+    for name, solutions in zip(names, results):
+        print("Type {}:".format(name))
+        print_solutions(solutions)
+    return dict(zip(names, results))
+
+
 @parsable
 def rs_pairs(max_solutions=32, address=pomagma.analyst.ADDRESS):
     """Find retract,section pairs (i.e. pairs below A)."""
@@ -1,12 +1,27 @@
 import sys
+from timeit import default_timer
 
 from parsable import parsable
 
-from pomagma.reducer import bohm, curry, lib
+from pomagma.reducer import bohm, curry, graphs, koopman, lib
+from pomagma.reducer.batch import run_batch, warm_up
 from pomagma.reducer.bohm import polish_simplify, print_tiny, sexpr_simplify
 from pomagma.reducer.linker import link
-from pomagma.reducer.syntax import polish_parse, polish_print, sexpr_parse, sexpr_print
+from pomagma.reducer.profiler import EngineProfiler
+from pomagma.reducer.snapshot import load_snapshot, save_snapshot
+from pomagma.reducer.sugar import as_term
+from pomagma.reducer.syntax import (
+    APP,
+    is_app,
+    is_atom,
+    is_equal,
+    polish_parse,
+    polish_print,
+    sexpr_parse,
+    sexpr_print,
+)
 from pomagma.util import debuggable
+from pomagma.util.metrics import COUNTERS
 
 FORMATS = {
     "polish": (polish_parse, polish_print, polish_simplify),
@@ -92,16 +107,82 @@ def repl(fmt="sexpr"):
             continue
 
 
+def _graphs_byte_test(byte, budget=100):
+    """Computes each bit of a byte as a combinator graph, as graphs does not
+    support the UNIT and BOOL atoms of lib.byte_test(-).
+    """
+    for get_bit in lib.byte_get_bit:
+        graph = graphs.convert(curry.convert(APP(as_term(get_bit), byte)))
+        for _ in range(budget):
+            graph = graphs.try_compute_step(graph)
+            if graph is None:
+                break
+
+
+def _koopman_node(term):
+    if is_app(term):
+        return koopman.APP(_koopman_node(term[1]), _koopman_node(term[2]))
+    elif is_atom(term):
+        return koopman.ATOM(term[0])
+    else:
+        raise ValueError(term)
+
+
+def _koopman_byte_test(byte, budget=100):
+    """Computes each bit of a byte by in-place combinator graph reduction."""
+    for get_bit in lib.byte_get_bit:
+        node = _koopman_node(curry.convert(APP(as_term(get_bit), byte)))
+        for _ in range(budget):
+            if not koopman.try_beta_step(node):
+                break
+
+
+# Each engine maps to (modules, functions, workload), as EngineProfiler args
+# plus a function of a byte. koopman is not memoized, so its step functions
+# are profiled explicitly.
+PROFILE_WORKLOADS = {
+    "bohm": ([bohm], [], lambda byte: bohm.reduce(lib.byte_test(byte))),
+    "curry": ([curry], [], lambda byte: curry.reduce(lib.byte_test(byte))),
+    "graphs": ([graphs], [], _graphs_byte_test),
+    "koopman": (
+        [],
+        [koopman.try_beta_step, koopman._try_beta_step],
+        _koopman_byte_test,
+    ),
+}
+
+
 @parsable
-def profile(engine="bohm", count=256):
-    """Run a reduce(lib.byte_test(lib.byte_table[n])) for the first count
-    bytes."""
-    engine = ENGINES[engine]
+def profile(engine="bohm", count=256, json_out="", collapsed_out=""):
+    """Run a byte_test workload for the first count bytes, profiling the
+    functions of the engine.
+
+    The bohm and curry engines reduce(lib.byte_test(byte)); the graphs and
+    koopman engines, which lack UNIT and BOOL, compute each bit of the byte.
+
+    Args:
+        engine: 'bohm', 'curry', 'graphs', 'koopman'
+        count: number of bytes to test
+        json_out: optional filename for per-function stats in JSON
+        collapsed_out: optional filename for collapsed stacks, as consumed by
+            flamegraph.pl or speedscope, weighted by microseconds
+
+    """
+    modules, functions, workload = PROFILE_WORKLOADS[engine]
     examples = sorted(lib.byte_table.items())
-    for n, byte in examples[:count]:
-        engine.reduce(lib.byte_test(byte))
-        sys.stdout.write(".")
-        sys.stdout.flush()
+    with EngineProfiler(modules, functions) as profiler:
+        for n, byte in examples[:count]:
+            workload(byte)
+            sys.stdout.write(".")
+            sys.stdout.flush()
+    sys.stdout.write("\n")
+    profiler.write_summary(sys.stdout)
+    if json_out:
+        with open(json_out, "w") as f:
+            profiler.write_json(f)
+    if collapsed_out:
+        with open(collapsed_out, "w") as f:
+            profiler.write_collapsed(f)
 
 
 @parsable
@@ -164,6 +245,121 @@ def reduce(string, engine="bohm", fmt="auto"):
     return result_string
 
 
+@parsable
+def batch(
+    engine,
+    *files,
+    out="-",
+    threads=0,
+    budget=100,
+    timeout=10.0,
+    warmup="",
+    snapshot="",
+):
+    """Reduce all terms in sexpr files in parallel, streaming JSONL results.
+
+    Each line of output describes one term, with keys file, line, status,
+    sec, and result, and for equations (EQUAL lhs rhs) also whether lhs
+    reduces to rhs.
+
+    Args:
+        engine: 'bohm', 'curry'
+        files: sexpr files in the format of testdata/*.sexpr
+        out: filename for JSONL results, or '-' for stdout
+        threads: number of worker processes, defaulting to the cpu count
+        budget: max number of reduction steps per term
+        timeout: max wall time per term in seconds, or 0 for no limit
+        warmup: optional comma-separated sexpr files to reduce before forking
+            workers, so that workers share the warmed memo caches
+        snapshot: optional snapshot file written by make-snapshot, to load
+            before forking workers
+
+    """
+    if engine not in ENGINES:
+        raise ValueError(
+            "Unknown engine {}, try one of: {}".format(
+                engine, ", ".join(list(ENGINES.keys()))
+            )
+        )
+    warmup = [f for f in warmup.split(",") if f]
+    start_time = default_timer()
+    if snapshot:
+        load_snapshot(snapshot, [lib])
+    with open(out, "w") if out != "-" else sys.stdout as f:
+        summary = run_batch(
+            ENGINES[engine],
+            files,
+            f,
+            threads=int(threads),
+            budget=int(budget),
+            timeout=float(timeout),
+            warmup=warmup,
+        )
+    elapsed = default_timer() - start_time
+    sys.stderr.write(
+        "Processed {} terms in {:0.3f} sec: {}\n".format(
+            sum(summary.values()),
+            elapsed,
+            ", ".join("{} {}".format(v, k) for k, v in sorted(summary.items())),
+        )
+    )
+    return summary
+
+
+@parsable
+def make_snapshot(filename, engine="bohm", count=256, warmup=""):
+    """Warm up memo caches, then save a snapshot for use by later processes.
+
+    Warm-up reduces lib.byte_test(lib.byte_table[n]) for the first count
+    bytes, and then all terms in the warmup files. Load the snapshot via
+    snapshot.load_snapshot(filename, [lib]) or via batch snapshot=filename.
+
+    Args:
+        filename: the snapshot file to write
+        engine: 'bohm', 'curry'
+        count: number of bytes to test
+        warmup: optional comma-separated sexpr files to reduce
+
+    """
+    engine = ENGINES[engine]
+    start_time = default_timer()
+    for n, byte in sorted(lib.byte_table.items())[:count]:
+        engine.reduce(lib.byte_test(byte))
+    warm_up(engine, [f for f in warmup.split(",") if f])
+    elapsed = default_timer() - start_time
+    count = save_snapshot(filename, [lib])
+    print("Warmed up in {:0.3f} sec".format(elapsed))
+    print("Saved {} cache entries to {}".format(count, filename))
+
+
+@parsable
+def profile_join(antichain=True, suites=",".join(bohm.SUPPORTED_TESTDATA)):
+    """Count order decisions while reducing equations in testdata/*.sexpr.
+
+    Run once with antichain=True and once with antichain=False, in separate
+    processes, to compare join_set(-) filtering strategies.
+
+    """
+    from pomagma.reducer.testing import iter_test_cases
+
+    bohm.JOIN_SET_ANTICHAIN = antichain
+    counter = COUNTERS[bohm.__name__]
+    start_time = default_timer()
+    count = 0
+    for term, comment, message in iter_test_cases("bohm", suites.split(",")):
+        if not is_equal(term):
+            continue
+        try:
+            bohm.reduce(link(bohm.convert(term[1])))
+            bohm.simplify(link(bohm.convert(term[2])))
+        except NotImplementedError:
+            pass
+        count += 1
+    elapsed = default_timer() - start_time
+    print("Reduced {} equations in {:0.3f} sec".format(count, elapsed))
+    print("Made {} order decisions".format(counter["try_decide_less"]))
+
+
 @parsable
 @debuggable
 def step(string, steps=10, fmt="auto"):
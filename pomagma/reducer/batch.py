@@ -0,0 +1,169 @@
+"""Parallel batch reduction of sexpr corpora.
+
+A batch run shards the lines of sexpr files (in the format of testdata/) across
+a pool of worker processes, each reducing terms under a per-term step budget
+and time budget, and streams one JSON result per line.
+
+Workers are forked from a parent process whose memo caches may first be warmed
+by reducing a warm-up corpus. Forked workers share the warmed caches
+copy-on-write, rather than each repopulating them.
+
+Example:
+
+    with open("results.jsonl", "w") as out:
+        run_batch(bohm, ["testdata/sk.sexpr"], out, threads=4)
+"""
+
+import json
+import multiprocessing
+import signal
+from collections import Counter
+from timeit import default_timer
+
+from pomagma.reducer.linker import link
+from pomagma.reducer.syntax import is_equal, sexpr_parse, sexpr_print
+from pomagma.reducer.testing import parse_xfail
+
+# Worker state, set by _init_worker(-).
+_engine = None
+_budget = None
+_timeout = None
+
+
+class BatchTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise BatchTimeout()
+
+
+def iter_tasks(filenames):
+    """Yields (filename, lineno, sexpr, comment) for each term in files."""
+    for filename in filenames:
+        with open(filename) as f:
+            for i, line in enumerate(f):
+                parts = line.split(";", 1)
+                sexpr = parts[0].strip()
+                if sexpr:
+                    comment = None if len(parts) < 2 else parts[1].strip()
+                    yield filename, 1 + i, sexpr, comment
+
+
+def _reduce(engine, term, budget):
+    """Returns (result, steps), where steps is None if not reported."""
+    reduce_with_stats = getattr(engine, "reduce_with_stats", None)
+    if reduce_with_stats is None:
+        return engine.reduce(term, budget), None
+    result, stats = reduce_with_stats(term, budget)
+    return result, stats.steps
+
+
+def run_task(engine, task, budget=100):
+    """Reduces one term, or checks one equation, returning a JSON-able dict.
+
+    Equations (EQUAL lhs rhs) are checked by reducing lhs and converting rhs,
+    as in testing.iter_equations(-). Other terms are simply reduced.
+    """
+    filename, lineno, sexpr, comment = task
+    result = {"file": filename, "line": lineno}
+    test_id = engine.__name__.split(".")[-1]
+    xfail = bool(comment) and parse_xfail(comment, test_id)
+    start_time = default_timer()
+    try:
+        term = sexpr_parse(sexpr)
+        if is_equal(term):
+            lhs = link(engine.convert(term[1]))
+            rhs = link(engine.convert(term[2]))
+            actual, steps = _reduce(engine, lhs, budget)
+            expected = engine.convert(rhs)
+            if actual == expected:
+                status = "xpass" if xfail else "pass"
+            else:
+                status = "xfail" if xfail else "fail"
+                result["expected"] = sexpr_print(expected)
+        else:
+            actual, steps = _reduce(engine, link(engine.convert(term)), budget)
+            status = "done"
+        result["result"] = sexpr_print(actual)
+        if steps is not None:
+            result["steps"] = steps
+    except BatchTimeout:
+        status = "timeout"
+    except NotImplementedError:
+        status = "not_implemented"
+    except Exception as e:
+        status = "error"
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+    result["status"] = status
+    result["sec"] = default_timer() - start_time
+    return result
+
+
+def _init_worker(engine, budget, timeout):
+    global _engine, _budget, _timeout
+    _engine = engine
+    _budget = budget
+    _timeout = timeout
+    signal.signal(signal.SIGALRM, _raise_timeout)
+
+
+def _run_task(task):
+    if not _timeout:
+        return run_task(_engine, task, _budget)
+    start_time = default_timer()
+    try:
+        signal.setitimer(signal.ITIMER_REAL, _timeout)
+        try:
+            return run_task(_engine, task, _budget)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except BatchTimeout:
+        # The alarm fired outside run_task's own handler, e.g. while it was
+        # recording a result or before the timer was cancelled.
+        filename, lineno = task[:2]
+        return {
+            "file": filename,
+            "line": lineno,
+            "status": "timeout",
+            "sec": default_timer() - start_time,
+        }
+
+
+def warm_up(engine, filenames, budget=100):
+    """Reduces all terms in files, populating the engine's memo caches."""
+    for task in iter_tasks(filenames):
+        run_task(engine, task, budget)
+
+
+def run_batch(engine, filenames, out, threads=0, budget=100, timeout=10.0, warmup=()):
+    """Reduces all terms in files in parallel, writing JSONL results to out.
+
+    Args:
+        engine: a reducer module such as bohm or curry
+        filenames: a list of sexpr files
+        out: a writable file to stream JSONL results to, in input order
+        threads: number of worker processes, defaulting to cpu_count()
+        budget: max number of reduction steps per term
+        timeout: max wall time per term in seconds, or 0 for no limit
+        warmup: a list of sexpr files to reduce before forking workers
+
+    Returns:
+        a Counter mapping status to count.
+    """
+    if warmup:
+        warm_up(engine, warmup, budget)
+    threads = threads or multiprocessing.cpu_count()
+    # Workers are forked to inherit memo caches of this process.
+    context = multiprocessing.get_context("fork")
+    summary = Counter()
+    with context.Pool(
+        threads, initializer=_init_worker, initargs=(engine, budget, timeout)
+    ) as pool:
+        results = pool.imap(_run_task, iter_tasks(filenames), chunksize=4)
+        for result in results:
+            summary[result["status"]] += 1
+            out.write(json.dumps(result, sort_keys=True))
+            out.write("\n")
+            out.flush()
+    return summary
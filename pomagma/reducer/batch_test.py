@@ -0,0 +1,68 @@
+import io
+import json
+
+import pytest
+
+from pomagma.reducer import batch, bohm, curry
+from pomagma.reducer.batch import iter_tasks, run_batch, run_task
+
+CORPUS = """
+; A comment line.
+(EQUAL (I x) x)
+(EQUAL (K x y) x)
+(EQUAL (K x y) y)
+(EQUAL (K x y) y)  ; xfail bohm curry
+(K x)
+"""
+
+
+def test_iter_tasks(tmpdir):
+    filename = str(tmpdir.join("corpus.sexpr"))
+    with open(filename, "w") as f:
+        f.write(CORPUS)
+    tasks = list(iter_tasks([filename]))
+    assert [lineno for _, lineno, _, _ in tasks] == [3, 4, 5, 6, 7]
+    assert tasks[3][2:] == ("(EQUAL (K x y) y)", "xfail bohm curry")
+
+
+@pytest.mark.parametrize("engine", [bohm, curry], ids=["bohm", "curry"])
+def test_run_batch(engine, tmpdir):
+    filename = str(tmpdir.join("corpus.sexpr"))
+    with open(filename, "w") as f:
+        f.write(CORPUS)
+    out = io.StringIO()
+    summary = run_batch(engine, [filename], out, threads=2, warmup=[filename])
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["line"] for r in results] == [3, 4, 5, 6, 7]
+    assert [r["status"] for r in results] == ["pass", "pass", "fail", "xfail", "done"]
+    assert results[2]["result"] == "x"
+    assert results[2]["expected"] == "y"
+    assert summary == {"pass": 2, "fail": 1, "xfail": 1, "done": 1}
+
+
+def test_run_batch_timeout(tmpdir):
+    filename = str(tmpdir.join("corpus.sexpr"))
+    with open(filename, "w") as f:
+        f.write("(ABS (0 0) (ABS (0 0)))\n")
+    out = io.StringIO()
+    summary = run_batch(bohm, [filename], out, threads=1, budget=10**9, timeout=0.1)
+    assert summary == {"timeout": 1}
+
+
+def test_run_task_budget():
+    task = ("example.sexpr", 1, "(ABS (0 0) (ABS (0 0)))", None)
+    result = run_task(bohm, task, budget=7)
+    assert result["status"] == "done"
+    assert result["steps"] == 7
+
+
+def test_run_task_late_timeout(monkeypatch):
+    # Simulate the alarm firing after run_task has left its own try block.
+    def late_timeout(engine, task, budget):
+        raise batch.BatchTimeout()
+
+    monkeypatch.setattr(batch, "run_task", late_timeout)
+    monkeypatch.setattr(batch, "_timeout", 10.0)
+    result = batch._run_task(("example.sexpr", 1, "x", None))
+    assert result["status"] == "timeout"
+    assert (result["file"], result["line"]) == ("example.sexpr", 1)
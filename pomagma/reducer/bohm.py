@@ -18,6 +18,9 @@ CHANGELOG
 
 """
 
+from collections import namedtuple
+from timeit import default_timer
+
 from pomagma.compiler.util import memoize_arg, memoize_args, unique
 from pomagma.reducer import syntax
 from pomagma.reducer.syntax import (
@@ -49,18 +52,26 @@ from pomagma.reducer.syntax import (
     is_join,
     is_nvar,
     is_quote,
+    ivar_bound,
     polish_parse,
     quoted_vars,
     sexpr_parse,
     sexpr_print,
 )
 from pomagma.reducer.util import UnreachableError, logged, trool_all, trool_any
+from pomagma.util.metrics import COUNTERS
 
 SUPPORTED_TESTDATA = ["sk", "join", "quote", "types", "lib", "unit"]
 
 # TODO Make strong version not horribly expensive.
 TRY_DECIDE_LESS_STRONG = False
 
+# Whether join_set(-) filters dominated terms via an antichain of maximal
+# terms, rather than by comparing all pairs.
+JOIN_SET_ANTICHAIN = True
+
+counter = COUNTERS[__name__]
+
 I = ABS(IVAR(0))
 K = ABS(ABS(IVAR(1)))
 B = ABS(ABS(ABS(APP(IVAR(2), APP(IVAR(1), IVAR(0))))))
@@ -87,7 +98,9 @@ def maybe_pretty(term):
 
 @memoize_args
 def _increment_rank(term, min_rank):
-    if is_atom(term):
+    if ivar_bound(term) <= min_rank:
+        return term
+    elif is_atom(term):
         return term
     elif is_nvar(term):
         return term
@@ -122,7 +135,9 @@ class CannotDecrementRank(Exception):
 
 @memoize_args
 def _try_decrement_rank(term, min_rank):
-    if is_atom(term):
+    if ivar_bound(term) <= min_rank:
+        return term
+    elif is_atom(term):
         return term
     elif is_nvar(term):
         return term
@@ -239,7 +254,9 @@ def is_cheap_to_copy(term):
 @memoize_args
 def _permute_rank(term, min_rank, max_rank):
     assert min_rank < max_rank
-    if is_atom(term) or is_nvar(term):
+    if ivar_bound(term) <= min_rank:
+        return term
+    elif is_atom(term) or is_nvar(term):
         return term
     elif is_ivar(term):
         rank = term[1]
@@ -548,11 +565,14 @@ def join_set(terms):
         return next(iter(terms))
 
     # Filter out strictly dominated terms (requires transitivity).
-    filtered_terms = [
-        term
-        for term in terms
-        if not any(dominates(ub, term) for ub in terms if ub is not term)
-    ]
+    if JOIN_SET_ANTICHAIN:
+        filtered_terms = _filter_dominated(terms)
+    else:
+        filtered_terms = [
+            term
+            for term in terms
+            if not any(dominates(ub, term) for ub in terms if ub is not term)
+        ]
     filtered_terms.sort(key=priority, reverse=True)
 
     # Construct a JOIN term.
@@ -562,6 +582,39 @@ def join_set(terms):
     return result
 
 
+def _filter_dominated(terms):
+    """Returns the maximal terms wrt dominates(-, -).
+
+    This incrementally maintains an antichain of maximal terms. By
+    transitivity of dominates(-, -), each new term need only be compared to
+    the current maximal terms, since any term dominating it is dominated by
+    some maximal term. Each comparison decides order in both directions at
+    once, and verdicts are cached across calls.
+    """
+    maximal = []
+    for term in sorted(terms, key=priority, reverse=True):
+        dominated = False
+        survivors = []
+        for ub in maximal:
+            ub_term, term_ub = _try_decide_order(ub, term)
+            if term_ub is True and ub_term is False:  # dominates(ub, term)
+                dominated = True
+                break
+            if ub_term is True and term_ub is False:  # dominates(term, ub)
+                continue
+            survivors.append(ub)
+        if not dominated:
+            survivors.append(term)
+            maximal = survivors
+    return maximal
+
+
+@memoize_args
+def _try_decide_order(lhs, rhs):
+    """Returns the pair (try_decide_less(lhs, rhs), try_decide_less(rhs, lhs))."""
+    return try_decide_less(lhs, rhs), try_decide_less(rhs, lhs)
+
+
 def dominates(lhs, rhs):
     """Weak strict domination relation: lhs =] rhs and lhs [!= rhs.
 
@@ -585,6 +638,7 @@ def dominates(lhs, rhs):
 
 @logged(pretty, pretty, returns=str)
 def try_decide_less(lhs, rhs):
+    counter["try_decide_less"] += 1
     if TRY_DECIDE_LESS_STRONG:
         return try_decide_less_strong(lhs, rhs)
     else:
@@ -964,14 +1018,8 @@ def _compute_step(term):
     if is_app(term):
         fun = term[1]
         arg = term[2]
-        if is_abs(fun):
-            assert not is_linear(fun), fun
-            assert not is_linear(arg), arg
-            body = fun[1]
-            return substitute(body, arg, 0, True)
-        elif fun is Y and is_abs(arg):
-            body = arg[1]
-            return substitute(body, term, 0, False)
+        if is_abs(fun) or (fun is Y and is_abs(arg)):
+            return _contract(term)
         elif is_normal(fun):
             return app(fun, _compute_step(arg))
         else:
@@ -1015,16 +1063,158 @@ def simplify(term):
 
 @logged(pretty, returns=pretty)
 def reduce(term, budget=100):
-    """Beta-reduce term up to budget."""
+    """Beta-reduce term up to budget.
+
+    This agrees with iterating try_compute_step(-), but keeps the spine from
+    the root to the last contracted redex between steps. Each step rebuilds
+    only that path, and the search for the next redex resumes from the
+    deepest spine node whose normal-order decision is unchanged, rather than
+    from the root.
+    """
     term = simplify(term)
+    spine = []  # : list of (direction, node) from the root down.
+    subterm = term
     for _ in range(budget):
-        reduced = try_compute_step(term)
-        if reduced is None:
-            return term
-        term = reduced
+        if is_normal(term):
+            break
+        redex = _find_redex(subterm, spine)
+        term, subterm = _rebuild_spine(_contract(redex), spine)
     return term
 
 
+ReduceStats = namedtuple("ReduceStats", ["steps", "elapsed", "peak_size"])
+
+
+def reduce_with_stats(term, budget=100):
+    """Beta-reduce term up to budget as in reduce(-), reporting statistics.
+
+    Returns:
+        a pair (term, ReduceStats(steps, elapsed sec, peak term size)).
+    """
+    start_time = default_timer()
+    term = simplify(term)
+    sizes = {}  # : term -> size, so each step sizes only its new nodes.
+    peak_size = term_size(term, sizes)
+    spine = []
+    subterm = term
+    steps = 0
+    while steps < budget and not is_normal(term):
+        redex = _find_redex(subterm, spine)
+        term, subterm = _rebuild_spine(_contract(redex), spine)
+        peak_size = max(peak_size, term_size(term, sizes))
+        steps += 1
+    elapsed = default_timer() - start_time
+    return term, ReduceStats(steps, elapsed, peak_size)
+
+
+_APP_LHS = "APP_LHS"
+_APP_RHS = "APP_RHS"
+_JOIN_LHS = "JOIN_LHS"
+_ABS_BODY = "ABS_BODY"
+_REDEX = "REDEX"
+
+
+def _decide_direction(term):
+    """Returns the direction in which _compute_step(term) recurses."""
+    if is_app(term):
+        fun = term[1]
+        if is_abs(fun) or (fun is Y and is_abs(term[2])):
+            return _REDEX
+        elif is_normal(fun):
+            return _APP_RHS
+        else:
+            return _APP_LHS
+    elif is_join(term):
+        return _JOIN_LHS
+    elif is_abs(term):
+        return _ABS_BODY
+    else:
+        raise ValueError(term)
+
+
+def _find_redex(term, spine):
+    """Descend to the normal-order redex of term, pushing onto spine."""
+    while True:
+        assert not is_normal(term), term
+        direction = _decide_direction(term)
+        if direction is _REDEX:
+            return term
+        spine.append((direction, term))
+        term = term[2] if direction is _APP_RHS else term[1]
+
+
+def _contract(term):
+    """Contracts a beta redex APP(ABS(-), -) or a Y redex APP(Y, ABS(-))."""
+    fun = term[1]
+    arg = term[2]
+    if is_abs(fun):
+        assert not is_linear(fun), fun
+        assert not is_linear(arg), arg
+        return substitute(fun[1], arg, 0, True)
+    else:
+        assert fun is Y and is_abs(arg), term
+        return substitute(arg[1], term, 0, False)
+
+
+def _rebuild_spine(term, spine):
+    """Rebuild term up the spine, as in _compute_step(-).
+
+    Truncates spine to its longest prefix that remains the normal-order path
+    of the rebuilt term, and returns a pair (root, subterm), where subterm is
+    the node below that prefix, at which the next redex search resumes.
+    """
+    nodes = [term] * (len(spine) + 1)
+    for i in range(len(spine) - 1, -1, -1):
+        direction, node = spine[i]
+        if direction is _APP_LHS:
+            term = app(term, node[2])
+        elif direction is _APP_RHS:
+            term = app(node[1], term)
+        elif direction is _JOIN_LHS:
+            term = join(term, node[2])
+        else:
+            term = abstract(term)
+        nodes[i] = term
+
+    # Smart constructors may restructure; keep only the unchanged path.
+    for i, (direction, old) in enumerate(spine):
+        node = nodes[i]
+        if (
+            node[0] is not old[0]
+            or is_normal(node)
+            or _decide_direction(node) is not direction
+        ):
+            break
+        child = node[2] if direction is _APP_RHS else node[1]
+        if child is not nodes[i + 1] or is_normal(child):
+            break
+        spine[i] = direction, node
+    else:
+        i = len(spine)
+    del spine[i:]
+    return nodes[0], nodes[i]
+
+
+def term_size(term, cache=None):
+    """Number of nodes in the tree of term, counting shared subterms.
+
+    Args:
+      cache: an optional dict from terms to sizes, to share across calls.
+    """
+    if cache is None:
+        cache = {}
+    try:
+        return cache[term]
+    except KeyError:
+        pass
+    if is_atom(term) or is_nvar(term) or is_ivar(term):
+        size = 1
+    else:
+        size = 1 + sum(term_size(arg, cache) for arg in term[1:])
+    cache[term] = size
+    return size
+
+
 # ----------------------------------------------------------------------------
 # Eager parsing
 
@@ -861,6 +861,16 @@ def test_dominates_transitive(x, y, z):
             assert bohm.dominates(x, z)
 
 
+@hypothesis.given(s.sets(s_qterms, max_size=6))
+def test_filter_dominated(terms):
+    expected = set(
+        term
+        for term in terms
+        if not any(bohm.dominates(ub, term) for ub in terms if ub is not term)
+    )
+    assert set(bohm._filter_dominated(terms)) == expected
+
+
 # ----------------------------------------------------------------------------
 # Type casting
 
@@ -1106,6 +1116,51 @@ def test_reduce_equations(term, expected, message):
     assert actual == expected, message
 
 
+def _reduce_by_steps(term, budget):
+    term = bohm.simplify(term)
+    steps = 0
+    while steps < budget:
+        reduced = bohm.try_compute_step(term)
+        if reduced is None:
+            break
+        term = reduced
+        steps += 1
+    return term, steps
+
+
+@for_each(
+    [
+        ("(ABS (ABS (1 (0 (ABS (0 0) (ABS (0 0)))))))", 10),
+        ("(ABS (1 (ABS (0 0) (ABS (0 0 0)))))", 10),
+        ("(ABS (0 (Y (ABS (ABS (0 (1 1)))))))", 20),
+        (
+            "(JOIN (ABS (0 (ABS (0 0) (ABS (0 0 0)))))"
+            " (ABS (0 (Y (ABS (ABS (0 (1 1))))))))",
+            20,
+        ),
+    ]
+)
+def test_reduce_agrees_with_steps(term, max_budget):
+    term = sexpr_parse(term)
+    for budget in range(max_budget):
+        expected, steps = _reduce_by_steps(term, budget)
+        actual, stats = bohm.reduce_with_stats(term, budget)
+        assert actual is expected
+        assert stats.steps == steps
+
+
+@for_each(iter_equations("bohm", xfail=False))
+def test_reduce_with_stats(term, expected, message):
+    budget = 20
+    with xfail_if_not_implemented():
+        expected, expected_steps = _reduce_by_steps(term, budget)
+        actual, stats = bohm.reduce_with_stats(term, budget)
+    assert actual is expected, message
+    assert stats.steps == expected_steps
+    assert stats.peak_size >= bohm.term_size(actual)
+    assert stats.elapsed >= 0
+
+
 # ----------------------------------------------------------------------------
 # Eager parsing
 
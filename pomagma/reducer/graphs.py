@@ -46,6 +46,9 @@ from pomagma.compiler.util import memoize_arg, memoize_args
 from pomagma.reducer import syntax
 from pomagma.reducer.util import UnreachableError
 from pomagma.util import TODO
+from pomagma.util.metrics import COUNTERS
+
+counter = COUNTERS[__name__]
 
 # ----------------------------------------------------------------------------
 # Signature
@@ -77,7 +80,7 @@ class Term(tuple):
     __str__ = __repr__
 
     @staticmethod
-    @memoize_args
+    @memoize_args(capacity=None)
     def make(*args):
         return Term(args)
 
@@ -138,7 +141,7 @@ Term.TOP = Term.make(_TOP)
 
 class Graph(tuple):
     @staticmethod
-    @memoize_args
+    @memoize_args(capacity=None)
     def make(*args):
         assert args
         return Graph(args)
@@ -282,26 +285,30 @@ def graph_quotient_weak(terms):
 class ApartnessRelation(object):
     def __init__(self, size):
         self._size = size
-        self._table = [False] * (size * size)
+        self._table = bytearray(size * size)
+        self._count = 0
 
     def add(self, x, y):
         assert isinstance(x, int), x
         assert isinstance(y, int), y
         assert x != y
-        self._table[x + y * self._size] = True
-        self._table[y + x * self._size] = True
+        if not self._table[x + y * self._size]:
+            self._table[x + y * self._size] = 1
+            self._table[y + x * self._size] = 1
+            self._count += 2
 
     def __call__(self, x, y):
         assert isinstance(x, int), x
         assert isinstance(y, int), y
-        return self._table[x + y * self._size]
+        return bool(self._table[x + y * self._size])
 
     def __len__(self):
-        return sum(self._table)
+        return self._count
 
     def copy(self):
         other = ApartnessRelation(self._size)
         other._table = self._table[:]
+        other._count = self._count
         return other
 
 
@@ -314,32 +321,48 @@ def graph_quotient_strong(terms):
     distinguishability) and quotient by the resulting equivalence relation.
     However JOIN terms introduce nondeterminism and require additional
     backtracking.
+
+    Apartness is propagated backwards from newly apart pairs to pairs of
+    their parents along a worklist, so each pair is visited at most once.
     """
-    # Compute apartness by forward-chaining.
+    # Seed apartness from the head symbols of terms.
     apart = ApartnessRelation(size=len(terms))
-    old_count = -1
-    while len(apart) > old_count:
-        old_count = len(apart)
-        for i, x in enumerate(terms):
-            symbol = x[0]
-            for j, y in enumerate(terms[:i]):
-                if y[0] is not symbol:
+    pending = []
+    for i, x in enumerate(terms):
+        symbol = x[0]
+        for j, y in enumerate(terms[:i]):
+            if y[0] is not symbol:
+                apart.add(i, j)
+            elif symbol is _ABS or symbol is _APP:
+                continue
+            elif symbol is _JOIN:
+                if len(x) != len(y):
+                    apart.add(i, j)
+                elif set(x[1:]) != set(y[1:]):
+                    # TODO Branch, searching among feasible matchings.
+                    # FIXME The following is not complete:
                     apart.add(i, j)
-                elif symbol is _ABS:
-                    if apart(x[1], y[1]):
-                        apart.add(i, j)
-                elif symbol is _APP:
-                    if apart(x[1], y[1]) or apart(x[2], y[2]):
-                        apart.add(i, j)
-                elif symbol is _JOIN:
-                    if len(x) != len(y):
-                        apart.add(i, j)
-                    elif set(x[1:]) != set(y[1:]):
-                        # TODO Branch, searching among feasible matchings.
-                        # FIXME The following is not complete:
-                        apart.add(i, j)
-                elif x is not y:
+                else:
+                    continue
+            elif x is not y:
+                apart.add(i, j)
+            else:
+                continue
+            pending.append((i, j))
+
+    # Forward-chain apartness from children to parents.
+    parents = [[] for _ in terms]
+    for i, x in enumerate(terms):
+        if x[0] is _ABS or x[0] is _APP:
+            for direction, j in term_iter_subterms(x):
+                parents[j].append((direction, i))
+    while pending:
+        x, y = pending.pop()
+        for x_direction, i in parents[x]:
+            for y_direction, j in parents[y]:
+                if x_direction is y_direction and i != j and not apart(i, j):
                     apart.add(i, j)
+                    pending.append((i, j))
 
     # Construct the coarsest equivalence relation.
     pending = set(range(len(terms)))
@@ -414,19 +437,125 @@ def partitioned_permutations(partitions):
         yield perm_inverse(sum(perms, ()))
 
 
+def term_signature(term, color):
+    """Describe a term up to the colors of its subterms."""
+    symbol = term[0]
+    if symbol is _VAR or symbol is _ABS:
+        return symbol, color[term[1]]
+    elif symbol is _APP:
+        return symbol, color[term[1]], color[term[2]]
+    elif symbol is _JOIN:
+        return symbol, tuple(sorted(color[i] for i in term[1:]))
+    else:
+        return term
+
+
+def graph_refine(terms, partitions):
+    """Refine an ordered partition of vertices until it is equitable.
+
+    Each vertex is colored by the first position of its part, and parts are
+    repeatedly split and sorted by term_signature(-) wrt this coloring. Both
+    the resulting partition and the ordering of its parts are invariant under
+    graph isomorphism, given an invariant input partition.
+    """
+    color = [None] * len(terms)
+    changed = True
+    while changed:
+        changed = False
+        pos = 0
+        for part in partitions:
+            for i in part:
+                color[i] = pos
+            pos += len(part)
+        refined = []
+        for part in partitions:
+            if len(part) == 1:
+                refined.append(part)
+                continue
+            by_signature = defaultdict(list)
+            for i in part:
+                by_signature[term_signature(terms[i], color)].append(i)
+            if len(by_signature) > 1:
+                changed = True
+            refined.extend(by_signature[key] for key in sorted(by_signature))
+        partitions = refined
+    return partitions
+
+
+class _CanonicalSearch(object):
+    """State of an individualization-refinement search for a min graph.
+
+    Whenever two leaves yield the same permuted graph, the composition of
+    their permutations is an automorphism. Automorphisms fixing every vertex
+    individualized so far map sibling branches onto each other, so only one
+    vertex per orbit needs to be explored.
+    """
+
+    def __init__(self, terms):
+        self.terms = terms
+        self.best = None
+        self.leaves = {}  # : graph -> perm
+        self.automorphisms = []
+
+    def add_leaf(self, perm):
+        counter["graph_sort.leaves"] += 1
+        graph = tuple(graph_permute(self.terms, perm))
+        if self.best is None or graph < self.best:
+            self.best = graph
+        other = self.leaves.setdefault(graph, perm)
+        if other is not perm:
+            inverse = perm_inverse(perm)
+            self.automorphisms.append([inverse[j] for j in other])
+
+    def orbit(self, i, fixed):
+        automorphisms = [g for g in self.automorphisms if all(g[j] == j for j in fixed)]
+        orbit = set([i])
+        pending = [i]
+        while pending:
+            j = pending.pop()
+            for g in automorphisms:
+                if g[j] not in orbit:
+                    orbit.add(g[j])
+                    pending.append(g[j])
+        return orbit
+
+    def search(self, partitions, fixed=()):
+        partitions = graph_refine(self.terms, partitions)
+        for pos, part in enumerate(partitions):
+            if len(part) > 1:
+                break
+        else:
+            self.add_leaf(perm_inverse([part[0] for part in partitions]))
+            return
+
+        # Individualize one vertex per orbit of the first ambiguous part.
+        explored = []
+        for i in part:
+            if not self.orbit(i, fixed).isdisjoint(explored):
+                continue
+            explored.append(i)
+            rest = [j for j in part if j != i]
+            individualized = partitions[:pos] + [[i], rest] + partitions[pos + 1 :]
+            self.search(individualized, fixed + (i,))
+
+
 def graph_sort(terms):
     """Canonicalize the ordering of vertices in a graph.
 
     This implementation first sorts terms by an isomorphism-invariant
-    address, and then disambiguates address collisions by finding the
-    min graph among all graphs with the same address partitions, wrt the
-    arbitrary linear order of the python langauge.
+    address, then refines the address partition by iterated color refinement
+    (see graph_refine), and finally disambiguates any remaining symmetry by
+    individualizing vertices and finding the min graph among the resulting
+    discrete partitions, wrt the arbitrary linear order of the python
+    langauge. On typical graphs refinement alone yields a discrete partition,
+    so no search is needed; otherwise the search is pruned by automorphisms
+    discovered along the way (see _CanonicalSearch).
 
     """
     min_address = graph_address(terms)
-    partitions = partition_by_address(min_address)
-    perms = partitioned_permutations(partitions)
-    return min(graph_permute(terms, p) for p in perms)
+    search = _CanonicalSearch(terms)
+    search.search(partition_by_address(min_address))
+    return list(search.best)
 
 
 def graph_make(terms):
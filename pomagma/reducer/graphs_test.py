@@ -1,7 +1,11 @@
+import itertools
+import random
+
 import hypothesis
 import hypothesis.strategies as s
 import pytest
 
+from pomagma.reducer import graphs
 from pomagma.reducer.graphs import (
     APP,
     BOT,
@@ -30,6 +34,7 @@ from pomagma.reducer.graphs import (
     try_decide_less,
 )
 from pomagma.reducer.syntax import sexpr_parse
+from pomagma.util.metrics import COUNTERS
 from pomagma.util.testing import for_each, xfail_if_not_implemented
 
 j = NVAR("j")
@@ -163,6 +168,44 @@ def test_graph_sort(terms, r):
     assert sorted_terms == list(terms)
 
 
+def test_graph_sort_large_join():
+    # Each NVAR has the same address, so a permutation search would visit 10!
+    # orderings; color refinement resolves them without search.
+    terms = JOIN([NVAR("x{}".format(i)) for i in range(10)])
+    r = random.Random(0)
+    for _ in range(10):
+        perm = list(range(1, len(terms)))
+        r.shuffle(perm)
+        perm = [0] + perm
+        shuffled_terms = graph_permute(terms, perm)
+        assert graph_sort(shuffled_terms) == list(terms)
+
+
+@pytest.mark.parametrize("k", [2, 3, 5, 7])
+def test_graph_sort_isomorphic_branches(k):
+    # A JOIN of k unquotiented copies of (ABS VAR) defeats color refinement,
+    # so without pruning the search would visit k! leaves.
+    terms = [Term.JOIN(range(1, k + 1))]
+    terms += [Term.ABS(k + i) for i in range(1, k + 1)]
+    terms += [Term.VAR(i) for i in range(1, k + 1)]
+    expected = min(graph_permute(terms, p) for p in _naive_perms(k))
+    r = random.Random(k)
+    for _ in range(3):
+        perm = list(range(1, k + 1))
+        r.shuffle(perm)
+        perm = [0] + perm + [i + k for i in perm]
+        shuffled_terms = graph_permute(terms, perm)
+        leaves = COUNTERS[graphs.__name__]["graph_sort.leaves"]
+        assert graph_sort(shuffled_terms) == expected
+        leaves = COUNTERS[graphs.__name__]["graph_sort.leaves"] - leaves
+        assert leaves <= k * k
+
+
+def _naive_perms(k):
+    for branches in itertools.permutations(range(1, k + 1)):
+        yield [0] + list(branches) + [i + k for i in branches]
+
+
 # ----------------------------------------------------------------------------
 # Graph construction (intro forms)
 
@@ -139,6 +139,7 @@ K = ATOM("K")
 B = ATOM("B")
 C = ATOM("C")
 S = ATOM("S")
+Y = ATOM("Y")
 
 
 def print_to_depth(node, depth=10):
@@ -183,6 +184,9 @@ def _try_beta_step(node, stack):
             elif atom == I:
                 node.copy_from(node.arg)
                 return True
+            elif atom == Y:
+                node.args = (node.arg, node)
+                return True
         elif node.fun.is_app:
             if node.fun.fun.is_atom:
                 atom = node.fun.fun
@@ -0,0 +1,406 @@
+"""
+Array-backed Combinator Graph Reduction.
+
+This is a second backend for reducer.koopman, storing the graph in
+preallocated NumPy int32 arrays rather than in a Python object per vertex.
+Each cell has a tag (APP or an atom code) and, for APP cells, fun and arg
+cell ids. Reduction steps rewrite cells in place, in the same order as
+koopman.try_beta_step(-), searching for redexes with an explicit stack
+rather than recursion.
+
+Cells are reclaimed by a bulk mark pass from a set of roots, followed either
+by compaction, which renumbers live cells, or by a sweep onto a free list,
+which preserves cell ids. ArrayGraph.reduce(-) collects garbage whenever it
+runs out of cells, so that long reductions run in memory proportional to the
+live graph.
+
+[1] Philip Koopman (1990)
+  "An Architecture for Combinator Graph Reduction"
+  https://users.ece.cmu.edu/~koopman/tigre/index.html
+"""
+
+import numpy as np
+
+from pomagma.reducer import koopman, syntax
+from pomagma.reducer.syntax import APP, NVAR, is_app, is_atom, is_nvar
+
+_APP = 0  # The tag of APP cells; other tags are atom codes.
+_NONE = -1  # The fun and arg of atom cells.
+
+_ATOM_NAMES = ["TOP", "BOT", "I", "K", "B", "C", "S", "Y"]
+
+
+class ArrayGraph(object):
+    """A combinator graph stored in preallocated int32 arrays."""
+
+    def __init__(self, capacity=1024):
+        assert capacity >= 2, capacity
+        self._tag = np.zeros(capacity, np.int32)
+        self._fun = np.full(capacity, _NONE, np.int32)
+        self._arg = np.full(capacity, _NONE, np.int32)
+        self._free = np.zeros(capacity, np.int32)  # : stack of free cells
+        self._free_count = 0
+        self._size = 0  # : number of cells ever allocated since compaction
+        self._names = [None]  # : atom code -> name
+        self._codes = {}  # : name -> atom code
+        self._atoms = {}  # : name -> shared cell
+        for name in _ATOM_NAMES:
+            self.atom(name)
+        codes = [self._codes[name] for name in _ATOM_NAMES]
+        self._TOP, self._BOT, self._I, self._K = codes[:4]
+        self._B, self._C, self._S, self._Y = codes[4:]
+
+    @property
+    def capacity(self):
+        return len(self._tag)
+
+    def __len__(self):
+        """Returns the number of allocated cells, including garbage."""
+        return self._size - self._free_count
+
+    def available(self):
+        """Returns the number of cells that can be allocated without GC."""
+        return self.capacity - self._size + self._free_count
+
+    # ------------------------------------------------------------------------
+    # Construction
+
+    def _alloc(self):
+        if self._free_count:
+            self._free_count -= 1
+            return int(self._free[self._free_count])
+        if self._size == self.capacity:
+            raise MemoryError("ArrayGraph is full; try .collect(roots)")
+        cell = self._size
+        self._size += 1
+        return cell
+
+    def atom(self, name):
+        """Returns the shared cell of an atom."""
+        try:
+            return self._atoms[name]
+        except KeyError:
+            pass
+        code = self._codes.get(name)
+        if code is None:
+            code = len(self._names)
+            self._names.append(name)
+            self._codes[name] = code
+        cell = self._alloc()
+        self._tag[cell] = code
+        self._fun[cell] = _NONE
+        self._arg[cell] = _NONE
+        self._atoms[name] = cell
+        return cell
+
+    def app(self, fun, arg):
+        """Allocates a new APP cell."""
+        cell = self._alloc()
+        self._tag[cell] = _APP
+        self._fun[cell] = fun
+        self._arg[cell] = arg
+        return cell
+
+    # ------------------------------------------------------------------------
+    # Inspection
+
+    def is_app(self, cell):
+        return self._tag[cell] == _APP
+
+    def name(self, cell):
+        """Returns the name of an atom cell."""
+        tag = int(self._tag[cell])
+        assert tag != _APP, cell
+        return self._names[tag]
+
+    def fun(self, cell):
+        assert self._tag[cell] == _APP, cell
+        return int(self._fun[cell])
+
+    def arg(self, cell):
+        assert self._tag[cell] == _APP, cell
+        return int(self._arg[cell])
+
+    def print_to_depth(self, cell, depth=10):
+        if not self.is_app(cell):
+            return self.name(cell)
+        elif depth > 0:
+            fun = self.print_to_depth(self.fun(cell), depth - 1)
+            arg = self.print_to_depth(self.arg(cell), depth - 1)
+            return "APP({},{})".format(fun, arg)
+        else:
+            return "APP(...,...)"
+
+    def equal(self, lhs, rhs):
+        """Syntactic equality modulo graph quotient, as koopman.Node.__eq__."""
+        return self.to_node(lhs) == self.to_node(rhs)
+
+    # ------------------------------------------------------------------------
+    # Conversion
+
+    def from_node(self, node):
+        """Loads a possibly cyclic koopman.Node graph, returning a cell."""
+        assert isinstance(node, koopman.Node), node
+        nodes = list(_iter_nodes(node))
+        cells = {}  # : id(node) -> cell
+        for n in nodes:
+            cells[id(n)] = self.atom(n.name) if n.is_atom else self.app(_NONE, _NONE)
+        for n in nodes:
+            if n.is_app:
+                cell = cells[id(n)]
+                self._fun[cell] = cells[id(n.fun)]
+                self._arg[cell] = cells[id(n.arg)]
+        return cells[id(node)]
+
+    def to_node(self, cell):
+        """Converts a cell to a possibly cyclic koopman.Node graph."""
+        nodes = {}  # : cell -> node
+        pending = [cell]
+        while pending:
+            c = pending.pop()
+            if c in nodes:
+                continue
+            if self.is_app(c):
+                nodes[c] = koopman.Node(koopman._APP, None, None)
+                pending.append(self.arg(c))
+                pending.append(self.fun(c))
+            else:
+                nodes[c] = koopman.ATOM(self.name(c))
+        for c, node in nodes.items():
+            if node.is_app:
+                node.args = (nodes[self.fun(c)], nodes[self.arg(c)])
+        return nodes[cell]
+
+    def from_term(self, term):
+        """Loads an APP term of combinator atoms and NVARs, returning a cell."""
+        if is_atom(term):
+            return self.atom(term[0])
+        elif is_nvar(term):
+            return self.atom(term[1])
+        elif is_app(term):
+            return self.app(self.from_term(term[1]), self.from_term(term[2]))
+        else:
+            raise ValueError(term)
+
+    def to_term(self, cell):
+        """Converts an acyclic graph to an APP term.
+
+        Names of syntax atoms convert to atoms, and other names to NVARs.
+        """
+        if self.is_app(cell):
+            return APP(self.to_term(self.fun(cell)), self.to_term(self.arg(cell)))
+        name = self.name(cell)
+        return syntax._atoms.get(name) or NVAR(name)
+
+    # ------------------------------------------------------------------------
+    # Reduction
+
+    def _try_rewrite(self, node):
+        """Tries to rewrite a redex at an APP cell in place."""
+        tag = self._tag
+        fun = self._fun
+        arg = self._arg
+        f = fun[node]
+        head = tag[f]
+        if head != _APP:
+            if head == self._TOP or head == self._BOT:
+                tag[node] = head
+                fun[node] = _NONE
+                arg[node] = _NONE
+                return True
+            elif head == self._I:
+                x = arg[node]
+                tag[node] = tag[x]
+                fun[node] = fun[x]
+                arg[node] = arg[x]
+                return True
+            elif head == self._Y:
+                fun[node] = arg[node]
+                arg[node] = node
+                return True
+            return False
+        ff = fun[f]
+        head = tag[ff]
+        if head != _APP:
+            if head == self._K:
+                x = arg[f]
+                tag[node] = tag[x]
+                fun[node] = fun[x]
+                arg[node] = arg[x]
+                return True
+            return False
+        fff = fun[ff]
+        head = tag[fff]
+        if head == self._B:
+            x, y, z = arg[ff], arg[f], arg[node]
+            fun[node] = x
+            arg[node] = self.app(y, z)
+            return True
+        elif head == self._C:
+            x, y, z = arg[ff], arg[f], arg[node]
+            fun[node] = self.app(x, z)
+            arg[node] = y
+            return True
+        elif head == self._S:
+            x, y, z = arg[ff], arg[f], arg[node]
+            fun[node] = self.app(x, z)
+            arg[node] = self.app(y, z)
+            return True
+        return False
+
+    def try_beta_step(self, root):
+        """Try to perform a beta-step in-place, as koopman.try_beta_step(-).
+
+        This may allocate up to two cells.
+
+        Returns:
+            True or False, depending on whether a step was performed.
+        """
+        tag = self._tag
+        fun = self._fun
+        arg = self._arg
+        spine = [root]  # : stack of cells
+        phase = [0]  # : 0 = try rewrite, 1 = visit fun, 2 = visit arg
+        path = {root}
+        while spine:
+            node = spine[-1]
+            state = phase[-1]
+            if state == 0:
+                if tag[node] != _APP:
+                    spine.pop()
+                    phase.pop()
+                    path.discard(node)
+                    continue
+                if self._try_rewrite(node):
+                    return True
+                phase[-1] = 1
+                child = int(fun[node])
+            elif state == 1:
+                phase[-1] = 2
+                child = int(arg[node])
+            else:
+                spine.pop()
+                phase.pop()
+                path.discard(node)
+                continue
+            if child in path:
+                # As koopman, give up on this node on reaching a cycle.
+                spine.pop()
+                phase.pop()
+                path.discard(node)
+                continue
+            spine.append(child)
+            phase.append(0)
+            path.add(child)
+        return False
+
+    def reduce(self, root, budget=None):
+        """Reduce in place, collecting garbage as needed.
+
+        Args:
+            root: the cell to reduce
+            budget: optional max number of steps
+
+        Returns:
+            a pair (root, steps), where root may be renumbered by compaction.
+        """
+        steps = 0
+        while budget is None or steps < budget:
+            if self.available() < 2:
+                (root,) = self.collect([root])
+            if not self.try_beta_step(root):
+                break
+            steps += 1
+        return root, steps
+
+    def count_beta_steps(self, root):
+        """Returns number of reduction steps."""
+        return self.reduce(root)[1]
+
+    # ------------------------------------------------------------------------
+    # Garbage collection
+
+    def _mark(self, roots):
+        """Returns a boolean mask of cells reachable from roots or atoms."""
+        size = self._size
+        tag = self._tag[:size]
+        fun = self._fun[:size]
+        arg = self._arg[:size]
+        marked = np.zeros(size, bool)
+        frontier = np.array(list(roots) + list(self._atoms.values()), np.int32)
+        while frontier.size:
+            frontier = np.unique(frontier[~marked[frontier]])
+            marked[frontier] = True
+            apps = frontier[tag[frontier] == _APP]
+            frontier = np.concatenate([fun[apps], arg[apps]])
+        return marked
+
+    def collect(self, roots, compact=True):
+        """Collect garbage unreachable from roots.
+
+        Args:
+            roots: a list of cells to keep
+            compact: whether to renumber live cells to a prefix of the
+                arrays, rather than sweeping dead cells onto the free list
+
+        Returns:
+            the list of roots, renumbered if compact.
+        """
+        marked = self._mark(roots)
+        if compact:
+            roots = self._compact(marked, roots)
+        else:
+            dead = np.flatnonzero(~marked).astype(np.int32)
+            self._free[: dead.size] = dead
+            self._free_count = dead.size
+        live = int(marked.sum())
+        if live > self.capacity * 3 // 4:
+            self._grow(2 * self.capacity)
+        return roots
+
+    def _compact(self, marked, roots):
+        size = self._size
+        live = np.flatnonzero(marked)
+        new_id = np.full(size, _NONE, np.int32)
+        new_id[live] = np.arange(live.size, dtype=np.int32)
+        tag = self._tag[live]
+        fun = self._fun[live]
+        arg = self._arg[live]
+        apps = tag == _APP
+        fun[apps] = new_id[fun[apps]]
+        arg[apps] = new_id[arg[apps]]
+        self._tag[: live.size] = tag
+        self._fun[: live.size] = fun
+        self._arg[: live.size] = arg
+        self._fun[live.size : size] = _NONE
+        self._arg[live.size : size] = _NONE
+        self._size = int(live.size)
+        self._free_count = 0
+        for name, cell in self._atoms.items():
+            self._atoms[name] = int(new_id[cell])
+        return [int(new_id[root]) for root in roots]
+
+    def _grow(self, capacity):
+        old = self.capacity
+        assert capacity > old
+        extra = capacity - old
+        self._tag = np.concatenate([self._tag, np.zeros(extra, np.int32)])
+        self._fun = np.concatenate([self._fun, np.full(extra, _NONE, np.int32)])
+        self._arg = np.concatenate([self._arg, np.full(extra, _NONE, np.int32)])
+        free = np.zeros(capacity, np.int32)
+        free[: self._free_count] = self._free[: self._free_count]
+        self._free = free
+
+
+def _iter_nodes(node):
+    """Iterates over all nodes reachable from a koopman.Node."""
+    seen = set()
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield node
+        if node.is_app:
+            pending.extend(node.args)
@@ -0,0 +1,107 @@
+import pytest
+
+from pomagma.reducer import bohm, koopman
+from pomagma.reducer.koopman import APP, BOT, I, Y, count_beta_steps
+from pomagma.reducer.koopman_array import ArrayGraph
+from pomagma.reducer.koopman_test import (
+    BETA_STEP_EXAMPLES,
+    app,
+    const_stream,
+    five,
+    four,
+    three,
+    two,
+    x,
+)
+from pomagma.reducer.syntax import sexpr_parse
+from pomagma.util.testing import for_each
+
+
+@for_each(BETA_STEP_EXAMPLES)
+def test_try_beta_step(node, expected_result, expected_node):
+    graph = ArrayGraph()
+    cell = graph.from_node(node)
+    assert graph.try_beta_step(cell) is expected_result
+    assert graph.to_node(cell) == expected_node
+
+
+@for_each(BETA_STEP_EXAMPLES)
+def test_try_beta_step_stream(x, expected_result, expected_x):
+    graph = ArrayGraph()
+    cell = graph.from_node(const_stream(x))
+    assert graph.try_beta_step(cell) is expected_result
+    assert graph.to_node(cell) == const_stream(expected_x)
+
+
+def test_try_beta_step_y():
+    expected = APP(x, BOT)
+    expected.set_arg(expected)
+    node = APP(Y, x)
+    graph = ArrayGraph()
+    cell = graph.from_node(node)
+    assert graph.try_beta_step(cell)
+    assert graph.to_node(cell) == expected
+    assert koopman.try_beta_step(node)
+    assert node == expected
+
+
+@for_each(
+    [
+        app(two, I, I),
+        app(two, two, I, I),
+        app(two, two, two, I, I),
+        app(three, two, I, I),
+        app(four, two, I, I),
+        app(five, two, I, I),
+        app(two, two, two, x),
+    ]
+)
+def test_count_beta_steps_agrees_with_koopman(node):
+    graph = ArrayGraph()
+    cell = graph.from_node(node)
+    node = node.copy()
+    expected = count_beta_steps(node)
+    cell, actual = graph.reduce(cell)
+    assert actual == expected
+    assert graph.to_node(cell) == node
+
+
+@pytest.mark.parametrize("compact", [True, False])
+def test_collect(compact):
+    graph = ArrayGraph(capacity=64)
+    cell = graph.from_node(app(two, two, two, I, x))
+    garbage = graph.from_node(app(two, two, x))
+    assert garbage != cell
+    size = len(graph)
+    (root,) = graph.collect([cell], compact=compact)
+    assert len(graph) < size
+    assert graph.to_node(root) == app(two, two, two, I, x)
+    if not compact:
+        assert root == cell
+
+
+def test_reduce_in_bounded_memory():
+    graph = ArrayGraph(capacity=64)
+    cell = graph.from_node(app(four, two, I, x))
+    cell, steps = graph.reduce(cell)
+    assert steps == count_beta_steps(app(four, two, I, x))
+    assert graph.to_node(cell) == x
+    assert graph.capacity == 64
+
+
+@for_each(
+    [
+        "(S K K x)",
+        "(B x y z)",
+        "(C x y z)",
+        "(S (K x) I y)",
+        "(C (B B (B B I)) x y z)",
+    ]
+)
+def test_reduce_agrees_with_bohm(string):
+    term = sexpr_parse(string)
+    graph = ArrayGraph()
+    cell, _ = graph.reduce(graph.from_term(term))
+    actual = bohm.convert(graph.to_term(cell))
+    expected = bohm.reduce(bohm.convert(term))
+    assert actual is expected
@@ -0,0 +1,187 @@
+"""Per-function profiling of reducer engines.
+
+An EngineProfiler temporarily rebinds the memoized functions of engine modules
+(e.g. bohm, curry, graphs) to wrappers that record, per function: calls,
+memoization cache hits, inclusive and exclusive wall time, and a histogram of
+argument complexity. Unmemoized functions, such as the step functions of
+koopman, can be profiled by passing them explicitly. Results can be written as
+JSON or as a collapsed-stack file suitable for flamegraph.pl or speedscope.
+
+Example:
+
+    with EngineProfiler([bohm]) as profiler:
+        bohm.reduce(term)
+    profiler.write_json(sys.stdout)
+
+Only callers that look up functions via module attributes are profiled, as
+with util.enable_tracing(-).
+"""
+
+import functools
+import inspect
+import json
+import sys
+from collections import Counter, defaultdict
+from timeit import default_timer
+
+from pomagma.compiler.util import MEMOIZED_CACHES
+from pomagma.reducer.syntax import Term, complexity
+
+
+class FunctionStats(object):
+    __slots__ = ["calls", "hits", "inclusive", "exclusive", "complexity"]
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        self.complexity = Counter()
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "hit_ratio": self.hits / self.calls if self.calls else 0.0,
+            "inclusive_sec": self.inclusive,
+            "exclusive_sec": self.exclusive,
+            "complexity": {str(k): v for k, v in sorted(self.complexity.items())},
+        }
+
+
+def _max_complexity(args):
+    result = None
+    for arg in args:
+        if isinstance(arg, Term):
+            c = complexity(arg)
+            if result is None or c > result:
+                result = c
+    return result
+
+
+class EngineProfiler(object):
+    """Context manager to profile memoized functions of engine modules.
+
+    Args:
+        modules: engine modules whose memoized functions are profiled
+        functions: additional module-level functions to profile, which
+            report no cache hits
+    """
+
+    def __init__(self, modules, functions=()):
+        self.modules = list(modules)
+        self.functions = list(functions)
+        self.stats = defaultdict(FunctionStats)  # : name -> FunctionStats
+        self.stacks = Counter()  # : collapsed stack -> exclusive sec
+        self._stack = []  # : list of [name, start time, child time]
+        self._active = Counter()  # : name -> recursion depth
+        self._originals = []  # : list of (module, attr, function)
+
+    def _find_memoized(self, module):
+        """Yields (attr, fun, memoized), following wrappers of memoized
+        functions such as those added by util.logged(-).
+        """
+        memoized = set(map(id, MEMOIZED_CACHES))
+        for attr, fun in sorted(vars(module).items()):
+            if getattr(fun, "__module__", None) != module.__name__:
+                continue
+            inner = fun
+            while id(inner) not in memoized and hasattr(inner, "__wrapped__"):
+                inner = inner.__wrapped__
+            if id(inner) in memoized:
+                yield attr, fun, inner
+
+    def _patch(self, module, attr, fun, memoized):
+        name = "{}.{}".format(module.__name__.split(".")[-1], attr)
+        self._originals.append((module, attr, fun))
+        setattr(module, attr, self._wrap(fun, name, memoized))
+
+    def __enter__(self):
+        for module in self.modules:
+            for attr, fun, memoized in self._find_memoized(module):
+                self._patch(module, attr, fun, memoized)
+        for fun in self.functions:
+            module = sys.modules[fun.__module__]
+            self._patch(module, fun.__name__, fun, None)
+        return self
+
+    def __exit__(self, *args):
+        for module, attr, fun in self._originals:
+            setattr(module, attr, fun)
+        self._originals = []
+
+    def _wrap(self, fun, name, memoized):
+        stats = self.stats[name]
+        stack = self._stack
+        active = self._active
+        stacks = self.stacks
+        cache = {} if memoized is None else MEMOIZED_CACHES[memoized]
+        # memoize_args caches by args tuple, memoize_arg by the single arg.
+        varargs = memoized is None or bool(
+            memoized.__code__.co_flags & inspect.CO_VARARGS
+        )
+
+        @functools.wraps(fun)
+        def profiled(*args):
+            stats.calls += 1
+            try:
+                if (args if varargs else args[0]) in cache:
+                    stats.hits += 1
+            except TypeError:
+                pass  # A wrapper may preprocess unhashable args into a key.
+            c = _max_complexity(args)
+            if c is not None:
+                stats.complexity[c] += 1
+            frame = [name, default_timer(), 0.0]
+            stack.append(frame)
+            active[name] += 1
+            try:
+                return fun(*args)
+            finally:
+                elapsed = default_timer() - frame[1]
+                stack.pop()
+                active[name] -= 1
+                if not active[name]:
+                    stats.inclusive += elapsed
+                exclusive = elapsed - frame[2]
+                stats.exclusive += exclusive
+                stacks[";".join(f[0] for f in stack) + ";" + name] += exclusive
+                if stack:
+                    stack[-1][2] += elapsed
+
+        return profiled
+
+    def as_dict(self):
+        return {name: stats.as_dict() for name, stats in sorted(self.stats.items())}
+
+    def write_json(self, file):
+        json.dump(self.as_dict(), file, indent=2, sort_keys=True)
+        file.write("\n")
+
+    def write_collapsed(self, file):
+        """Writes stacks in collapsed format, weighted by microseconds."""
+        for stack, sec in sorted(self.stacks.items()):
+            usec = int(round(sec * 1e6))
+            if usec:
+                file.write("{} {}\n".format(stack.lstrip(";"), usec))
+
+    def write_summary(self, file):
+        file.write(
+            "{: >10} {: >8} {: >10} {: >10} {}\n".format(
+                "calls", "hit %", "incl sec", "excl sec", "function"
+            )
+        )
+        file.write("-" * 64 + "\n")
+        rows = sorted(self.stats.items(), key=lambda kv: -kv[1].exclusive)
+        for name, stats in rows:
+            if not stats.calls:
+                continue
+            file.write(
+                "{: >10} {: >8.1f} {: >10.4f} {: >10.4f} {}\n".format(
+                    stats.calls,
+                    100.0 * stats.hits / stats.calls,
+                    stats.inclusive,
+                    stats.exclusive,
+                    name,
+                )
+            )
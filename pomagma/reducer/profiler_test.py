@@ -0,0 +1,54 @@
+import io
+import json
+
+from pomagma.reducer import bohm, graphs, koopman
+from pomagma.reducer.profiler import EngineProfiler
+from pomagma.reducer.syntax import sexpr_parse
+
+
+def test_engine_profiler():
+    app = bohm.app
+    # Use a fresh NVAR so that memoized results of other tests do not apply.
+    term = sexpr_parse("(ABS (0 (ABS (0 0) (ABS (0 profiler_test)))))")
+    with EngineProfiler([bohm]) as profiler:
+        assert bohm.app is not app
+        bohm.reduce(term)
+    assert bohm.app is app
+
+    stats = profiler.as_dict()
+    assert stats["bohm.app"]["calls"] > 0
+    for name, fun_stats in stats.items():
+        assert 0 <= fun_stats["hits"] <= fun_stats["calls"], name
+        assert fun_stats["exclusive_sec"] <= fun_stats["inclusive_sec"] + 1e-6, name
+
+    file = io.StringIO()
+    profiler.write_json(file)
+    assert json.loads(file.getvalue()) == stats
+
+    file = io.StringIO()
+    profiler.write_collapsed(file)
+    for line in file.getvalue().splitlines():
+        stack, usec = line.rsplit(" ", 1)
+        assert all(frame.startswith("bohm.") for frame in stack.split(";"))
+        assert int(usec) > 0
+
+
+def test_engine_profiler_follows_wrapped():
+    # graphs.JOIN wraps a memoized function to preprocess its args.
+    x = graphs.NVAR("profiler_test")
+    with EngineProfiler([graphs]) as profiler:
+        graphs.JOIN([x, graphs.BOT])
+    assert profiler.as_dict()["graphs.JOIN"]["calls"] == 1
+
+
+def test_engine_profiler_functions():
+    try_beta_step = koopman.try_beta_step
+    node = koopman.APP(koopman.I, koopman.ATOM("x"))
+    with EngineProfiler([], [koopman.try_beta_step]) as profiler:
+        assert koopman.try_beta_step is not try_beta_step
+        assert koopman.try_beta_step(node)
+    assert koopman.try_beta_step is try_beta_step
+    stats = profiler.as_dict()
+    assert list(stats) == ["koopman.try_beta_step"]
+    assert stats["koopman.try_beta_step"]["calls"] == 1
+    assert stats["koopman.try_beta_step"]["hits"] == 0
@@ -0,0 +1,223 @@
+"""Persistent snapshots of hash-consed terms and memo caches.
+
+A snapshot records the compiled terms of @combinator definitions and the
+entries of memoized reducer functions, so that short-lived processes can skip
+the warm-up of recompiling lib and repopulating caches.
+
+Terms are serialized by structure, as a table of nodes in which each node
+refers to earlier nodes by index. Loading rebuilds each node via Term.make,
+so that loaded terms are hash-consed together with existing terms, and
+identity comparisons (term is other) remain valid. Memo caches are identified
+by the module and qualified name of their function. Cache entries whose keys
+or values cannot be serialized are skipped.
+
+Example:
+
+    save_snapshot("reducer.snapshot", [lib])  # after a warm-up run
+    ...
+    load_snapshot("reducer.snapshot", [lib])  # at startup of a new process
+"""
+
+import pickle
+import sys
+
+from pomagma.compiler.util import MEMOIZED_CACHES
+from pomagma.reducer import syntax
+from pomagma.reducer.sugar import _Combinator
+from pomagma.reducer.syntax import Term
+from pomagma.reducer.util import LOG
+
+SNAPSHOT_VERSION = 1
+
+# Functions whose caches are restored implicitly, by hash consing.
+_EXCLUDED = frozenset(["pomagma.reducer.syntax.Term.make"])
+
+_TERM = 0
+_LITERAL = 1
+_TUPLE = 2
+_FROZENSET = 3
+
+_LITERAL_TYPES = (str, int, bool, float, type(None))
+
+
+class _Unencodable(Exception):
+    pass
+
+
+class _Encoder(object):
+    """Encodes values as indices into a table of nodes, children first."""
+
+    def __init__(self):
+        self.nodes = []
+        self._terms = {}  # : id(term) -> index
+        self._literals = {}  # : (type, literal) -> index
+
+    def _add(self, node):
+        self.nodes.append(node)
+        return len(self.nodes) - 1
+
+    def __call__(self, value):
+        if type(value) is Term:
+            try:
+                return self._terms[id(value)]
+            except KeyError:
+                pass
+            args = tuple(self(arg) for arg in value[1:])
+            index = self._add((_TERM, value[0], args))
+            self._terms[id(value)] = index
+            return index
+        elif type(value) in _LITERAL_TYPES:
+            key = type(value), value
+            try:
+                return self._literals[key]
+            except KeyError:
+                index = self._add((_LITERAL, value))
+                self._literals[key] = index
+                return index
+        elif type(value) is tuple:
+            return self._add((_TUPLE, tuple(self(item) for item in value)))
+        elif type(value) is frozenset:
+            return self._add((_FROZENSET, tuple(self(item) for item in value)))
+        else:
+            raise _Unencodable(value)
+
+
+def _decode(nodes):
+    """Decodes a table of nodes to a list of values, hash consing terms."""
+    values = []
+    for node in nodes:
+        kind = node[0]
+        if kind == _TERM:
+            args = [values[arg] for arg in node[2]]
+            values.append(Term.make(sys.intern(node[1]), *args))
+        elif kind == _LITERAL:
+            literal = node[1]
+            values.append(sys.intern(literal) if type(literal) is str else literal)
+        elif kind == _TUPLE:
+            values.append(tuple(values[item] for item in node[1]))
+        elif kind == _FROZENSET:
+            values.append(frozenset(values[item] for item in node[1]))
+        else:
+            raise ValueError("Unknown snapshot node kind: {}".format(kind))
+    return values
+
+
+def _cache_name(fun):
+    return "{}.{}".format(fun.__module__, fun.__qualname__)
+
+
+def _iter_caches(prefix):
+    """Yields (name, cache) for memoized functions of modules under prefix.
+
+    Names defined more than once, e.g. by redefinition, are ambiguous and
+    are skipped.
+    """
+    caches = {}
+    for fun, cache in list(MEMOIZED_CACHES.items()):
+        name = _cache_name(fun)
+        if name.startswith(prefix) and name not in _EXCLUDED:
+            caches.setdefault(name, []).append(cache)
+    for name, matches in sorted(caches.items()):
+        if len(matches) == 1:
+            yield name, matches[0]
+
+
+def _iter_combinators(modules):
+    """Yields (name, combinator) for all @combinator definitions in modules."""
+    for module in modules:
+        for attr, value in sorted(vars(module).items()):
+            if isinstance(value, _Combinator):
+                yield "{}.{}".format(module.__name__, attr), value
+
+
+def _fingerprint():
+    """Summary of the term language, which snapshots depend on."""
+    return sorted(syntax._keywords.items())
+
+
+def save_snapshot(filename, modules=(), prefix="pomagma.reducer."):
+    """Saves compiled combinators of modules and memo caches to a file.
+
+    Args:
+      filename: the file to write
+      modules: modules whose compiled @combinator terms are saved, e.g. [lib]
+      prefix: module prefix of memoized functions whose caches are saved
+
+    Returns:
+      the number of cache entries saved.
+    """
+    encode = _Encoder()
+    combinators = []
+    for name, combinator in _iter_combinators(modules):
+        if hasattr(combinator, "_term"):
+            combinators.append((name, encode(combinator._term)))
+    caches = []
+    count = 0
+    for name, cache in _iter_caches(prefix):
+        entries = []
+        for key, value in cache.items():
+            try:
+                entries.append((encode(key), encode(value)))
+            except _Unencodable:
+                continue
+        caches.append((name, entries))
+        count += len(entries)
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": _fingerprint(),
+        "nodes": encode.nodes,
+        "combinators": combinators,
+        "caches": caches,
+    }
+    with open(filename, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    LOG.info("Saved {} cache entries to {}".format(count, filename))
+    return count
+
+
+def load_snapshot(filename, modules=(), prefix="pomagma.reducer."):
+    """Loads compiled combinators and memo caches from a file.
+
+    Existing cache entries and already compiled combinators are kept.
+
+    Args:
+      filename: a file written by save_snapshot(-)
+      modules: modules whose @combinator definitions are restored
+      prefix: module prefix of memoized functions whose caches are restored
+
+    Returns:
+      the number of cache entries loaded.
+
+    Raises:
+      ValueError if the snapshot is from an incompatible version.
+    """
+    with open(filename, "rb") as f:
+        snapshot = pickle.load(f)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(
+            "Snapshot version {} != {}: {}".format(
+                snapshot.get("version"), SNAPSHOT_VERSION, filename
+            )
+        )
+    if snapshot["fingerprint"] != _fingerprint():
+        raise ValueError("Snapshot has incompatible syntax: {}".format(filename))
+    values = _decode(snapshot["nodes"])
+
+    saved = dict(snapshot["combinators"])
+    for name, combinator in _iter_combinators(modules):
+        if name in saved and not hasattr(combinator, "_term"):
+            combinator._term = values[saved[name]]
+
+    caches = dict(_iter_caches(prefix))
+    count = 0
+    for name, entries in snapshot["caches"]:
+        cache = caches.get(name)
+        if cache is None:
+            continue
+        for key, value in entries:
+            key = values[key]
+            if key not in cache:
+                cache[key] = values[value]
+                count += 1
+    LOG.info("Loaded {} cache entries from {}".format(count, filename))
+    return count
@@ -0,0 +1,74 @@
+import pickle
+
+import pytest
+
+from pomagma.reducer import bohm, lib
+from pomagma.reducer.snapshot import (
+    SNAPSHOT_VERSION,
+    _decode,
+    _Encoder,
+    _iter_caches,
+    load_snapshot,
+    save_snapshot,
+)
+from pomagma.reducer.syntax import Term, sexpr_parse
+from pomagma.util.testing import for_each
+
+EXAMPLES = [
+    "(ABS (0 0) (ABS (0 x)))",
+    "(ABS (0 (ABS (0 0) (ABS (0 y)))))",
+    "(JOIN (ABS (0 x)) (ABS (0 (ABS (0 0) (ABS (0 z))))))",
+]
+
+
+@for_each(
+    [
+        sexpr_parse("(ABS (0 (JOIN x y)))"),
+        (sexpr_parse("(x y)"), 0, True, None, "y"),
+        frozenset([sexpr_parse("x"), sexpr_parse("(ABS 0)")]),
+        (1, True, 1.0),
+    ]
+)
+def test_encode_decode(value):
+    encode = _Encoder()
+    index = encode(value)
+    nodes = pickle.loads(pickle.dumps(encode.nodes))
+    actual = _decode(nodes)[index]
+    assert actual == value
+    assert sorted(map(repr, actual)) == sorted(map(repr, value))
+    # Decoded terms are hash consed.
+    if isinstance(value, Term):
+        assert actual is value
+    elif isinstance(value, tuple):
+        for a, v in zip(actual, value):
+            assert a is v or not isinstance(v, Term)
+
+
+def test_save_load_snapshot(tmpdir):
+    filename = str(tmpdir.join("reducer.snapshot"))
+    terms = [bohm.simplify(sexpr_parse(string)) for string in EXAMPLES]
+    expected = [bohm.reduce(term, 10) for term in terms]
+    caches = dict(_iter_caches("pomagma.reducer.bohm."))
+    backup = {name: dict(cache.items()) for name, cache in caches.items()}
+    try:
+        assert save_snapshot(filename, [lib]) > 0
+        for cache in caches.values():
+            cache.clear()
+        assert load_snapshot(filename, [lib], "pomagma.reducer.bohm.") > 0
+        for name, cache in caches.items():
+            for key, value in cache.items():
+                assert backup[name][key] == value, name
+        assert load_snapshot(filename, [lib], "pomagma.reducer.bohm.") == 0
+        for term, reduced in zip(terms, expected):
+            assert bohm.reduce(term, 10) is reduced
+    finally:
+        for name, cache in caches.items():
+            cache.update(backup[name])
+
+
+def test_load_snapshot_version(tmpdir):
+    filename = str(tmpdir.join("reducer.snapshot"))
+    with open(filename, "wb") as f:
+        pickle.dump({"version": SNAPSHOT_VERSION + 1}, f)
+    with pytest.raises(ValueError):
+        load_snapshot(filename)
@@ -0,0 +1,313 @@
+"""Hash-consed term store with integer nodes.
+
+A TermStore represents terms as small integer ids indexing flat arrays of
+(symbol, arg0, arg1). Hash consing is by a dict from node triples to ids, so
+structural hashing and equality of terms are O(1) int operations. Each node
+also caches its IVAR bound (see syntax.ivar_bound), so that rank shifts return
+untouched subterms unchanged, without traversing them.
+
+A TermStore is a syntax.Transform, so it converts syntax terms to ids via
+store(term), and its builders (APP, ABS, IVAR, ...) and atoms (TOP, K, ...)
+mirror those of syntax. Use store.convert(id, transform) to convert back.
+Conversions are cached per store rather than in the memoized
+Transform.__call__, so that a discarded store can be garbage collected.
+"""
+
+from array import array
+
+from pomagma.reducer import syntax
+from pomagma.reducer.syntax import Transform
+from pomagma.reducer.util import UnreachableError
+
+_KIND_ATOM = 0
+_KIND_NVAR = 1
+_KIND_IVAR = 2
+_KIND_UNARY = 3
+_KIND_BINARY = 4
+
+_INCREMENT = 0
+_DECREMENT = 1
+_PERMUTE = 2
+
+
+class TermStore(Transform):
+    """Store of hash-consed terms, represented as integer ids."""
+
+    def __init__(self):
+        self._symbols = []  # : code -> keyword
+        self._codes = {}  # : keyword -> code
+        self._names = []  # : name id -> NVAR name
+        self._name_ids = {}  # : NVAR name -> name id
+        self._symbol = array("l")
+        self._arg0 = array("l")
+        self._arg1 = array("l")
+        self._bound = array("l")
+        self._index = {}  # : (symbol, arg0, arg1) -> id
+        self._shifts = {}  # : (method, node, *args) -> id or None
+        self._interned = {}  # : syntax.Term -> id
+        for name in syntax._keywords:
+            self._codes[name] = len(self._symbols)
+            self._symbols.append(name)
+        for name in syntax._atoms:
+            setattr(self, name, self._make(name, -1, -1, 0))
+
+    def __len__(self):
+        return len(self._symbol)
+
+    def __call__(self, term):
+        """Interns a syntax.Term, returning its id."""
+        if not isinstance(term, syntax.Term):
+            raise TypeError(term)
+        cache = self._interned
+        pending = [term]
+        while pending:
+            term = pending[-1]
+            if term in cache:
+                pending.pop()
+                continue
+            if syntax.is_atom(term):
+                cache[term] = getattr(self, term[0])
+            elif syntax.is_nvar(term):
+                cache[term] = self.NVAR(term[1])
+            elif syntax.is_ivar(term):
+                cache[term] = self.IVAR(term[1])
+            else:
+                args = term[1:]
+                missing = [arg for arg in args if arg not in cache]
+                if missing:
+                    pending.extend(missing)
+                    continue
+                args = [cache[arg] for arg in args]
+                cache[term] = getattr(self, term[0])(*args)
+            pending.pop()
+        return cache[term]
+
+    def _make(self, name, arg0, arg1, bound):
+        key = self._codes[name], arg0, arg1
+        try:
+            return self._index[key]
+        except KeyError:
+            pass
+        node = len(self._symbol)
+        self._symbol.append(key[0])
+        self._arg0.append(arg0)
+        self._arg1.append(arg1)
+        self._bound.append(bound)
+        self._index[key] = node
+        return node
+
+    # ------------------------------------------------------------------------
+    # Builders
+
+    def NVAR(self, name):
+        try:
+            name_id = self._name_ids[name]
+        except KeyError:
+            name_id = len(self._names)
+            self._names.append(name)
+            self._name_ids[name] = name_id
+        return self._make(syntax._NVAR, name_id, -1, 0)
+
+    def IVAR(self, rank):
+        assert isinstance(rank, int) and rank >= 0, rank
+        return self._make(syntax._IVAR, rank, -1, rank + 1)
+
+    def ABS(self, body):
+        return self._make(syntax._ABS, body, -1, max(0, self._bound[body] - 1))
+
+    def QUOTE(self, body):
+        return self._make(syntax._QUOTE, body, -1, self._bound[body])
+
+    def FUN(self, var, body):
+        return self._make(syntax._FUN, var, body, self._bound[body])
+
+    def _binary(self, name, lhs, rhs):
+        bound = max(self._bound[lhs], self._bound[rhs])
+        return self._make(name, lhs, rhs, bound)
+
+    def APP(self, lhs, rhs):
+        return self._binary(syntax._APP, lhs, rhs)
+
+    def JOIN(self, lhs, rhs):
+        return self._binary(syntax._JOIN, lhs, rhs)
+
+    def RAND(self, lhs, rhs):
+        return self._binary(syntax._RAND, lhs, rhs)
+
+    def LESS(self, lhs, rhs):
+        return self._binary(syntax._LESS, lhs, rhs)
+
+    def NLESS(self, lhs, rhs):
+        return self._binary(syntax._NLESS, lhs, rhs)
+
+    def EQUAL(self, lhs, rhs):
+        return self._binary(syntax._EQUAL, lhs, rhs)
+
+    # ------------------------------------------------------------------------
+    # Inspection
+
+    def symbol(self, node):
+        return self._symbols[self._symbol[node]]
+
+    def args(self, node):
+        """Returns the subterm ids of a node, or () for leaves."""
+        kind = self._kind(node)
+        if kind == _KIND_UNARY:
+            return (self._arg0[node],)
+        elif kind == _KIND_BINARY:
+            return self._arg0[node], self._arg1[node]
+        else:
+            return ()
+
+    def rank(self, node):
+        """Returns the rank of an IVAR node."""
+        assert self.symbol(node) is syntax._IVAR, node
+        return self._arg0[node]
+
+    def name(self, node):
+        """Returns the name of an NVAR node."""
+        assert self.symbol(node) is syntax._NVAR, node
+        return self._names[self._arg0[node]]
+
+    def ivar_bound(self, node):
+        """Returns 1 + the max rank of free IVARs in node, or 0."""
+        return self._bound[node]
+
+    def _kind(self, node):
+        symbol = self.symbol(node)
+        if symbol is syntax._NVAR:
+            return _KIND_NVAR
+        elif symbol is syntax._IVAR:
+            return _KIND_IVAR
+        arity = syntax._keywords[symbol]
+        if arity == 0:
+            return _KIND_ATOM
+        elif arity == 1:
+            return _KIND_UNARY
+        elif arity == 2:
+            return _KIND_BINARY
+        raise UnreachableError(symbol)
+
+    def convert(self, node, transform=syntax.identity):
+        """Converts a node to a term via a transform, e.g. to a syntax.Term."""
+        cache = {}
+        pending = [node]
+        while pending:
+            node = pending[-1]
+            if node in cache:
+                pending.pop()
+                continue
+            kind = self._kind(node)
+            symbol = self.symbol(node)
+            if kind == _KIND_ATOM:
+                cache[node] = getattr(transform, symbol)
+            elif kind == _KIND_NVAR:
+                cache[node] = transform.NVAR(self.name(node))
+            elif kind == _KIND_IVAR:
+                cache[node] = transform.IVAR(self.rank(node))
+            else:
+                args = self.args(node)
+                missing = [arg for arg in args if arg not in cache]
+                if missing:
+                    pending.extend(missing)
+                    continue
+                args = [cache[arg] for arg in args]
+                cache[node] = getattr(transform, symbol)(*args)
+            pending.pop()
+        return cache[node]
+
+    # ------------------------------------------------------------------------
+    # Rank shifting
+
+    def _rebuild(self, node, args):
+        symbol = self.symbol(node)
+        if args == self.args(node):
+            return node
+        return getattr(self, symbol)(*args)
+
+    def increment_rank(self, node, min_rank=0):
+        """Increment rank of all free IVARs of rank >= min_rank in node."""
+        if self._bound[node] <= min_rank:
+            return node
+        key = _INCREMENT, node, min_rank
+        try:
+            return self._shifts[key]
+        except KeyError:
+            result = self._increment_rank(node, min_rank)
+            self._shifts[key] = result
+            return result
+
+    def _increment_rank(self, node, min_rank):
+        kind = self._kind(node)
+        if kind == _KIND_IVAR:
+            return self.IVAR(self._arg0[node] + 1)
+        symbol = self.symbol(node)
+        if symbol is syntax._ABS:
+            return self.ABS(self.increment_rank(self._arg0[node], min_rank + 1))
+        args = tuple(self.increment_rank(arg, min_rank) for arg in self.args(node))
+        return self._rebuild(node, args)
+
+    def try_decrement_rank(self, node, min_rank=0):
+        """Decrement rank of all free IVARs of rank > min_rank in node.
+
+        Returns None if IVAR(min_rank) is free in node.
+        """
+        if self._bound[node] <= min_rank:
+            return node
+        key = _DECREMENT, node, min_rank
+        try:
+            return self._shifts[key]
+        except KeyError:
+            result = self._try_decrement_rank(node, min_rank)
+            self._shifts[key] = result
+            return result
+
+    def _try_decrement_rank(self, node, min_rank):
+        kind = self._kind(node)
+        if kind == _KIND_IVAR:
+            rank = self._arg0[node]
+            return None if rank == min_rank else self.IVAR(rank - 1)
+        symbol = self.symbol(node)
+        if symbol is syntax._ABS:
+            body = self.try_decrement_rank(self._arg0[node], min_rank + 1)
+            return None if body is None else self.ABS(body)
+        args = []
+        for arg in self.args(node):
+            arg = self.try_decrement_rank(arg, min_rank)
+            if arg is None:
+                return None
+            args.append(arg)
+        return self._rebuild(node, tuple(args))
+
+    def permute_rank(self, node, rank, min_rank=0):
+        """Permute IVARs from [0,1,2...,rank] to [1,2,...,rank,0].
+
+        More generally, permute IVARs from [min_rank,...,min_rank+rank].
+        """
+        assert isinstance(rank, int) and rank >= 0, rank
+        if rank == 0 or self._bound[node] <= min_rank:
+            return node
+        key = _PERMUTE, node, rank, min_rank
+        try:
+            return self._shifts[key]
+        except KeyError:
+            result = self._permute_rank(node, rank, min_rank)
+            self._shifts[key] = result
+            return result
+
+    def _permute_rank(self, node, rank, min_rank):
+        kind = self._kind(node)
+        if kind == _KIND_IVAR:
+            ivar_rank = self._arg0[node]
+            if ivar_rank > min_rank + rank:
+                return node
+            elif ivar_rank == min_rank + rank:
+                return self.IVAR(min_rank)
+            return self.IVAR(ivar_rank + 1)
+        symbol = self.symbol(node)
+        if symbol is syntax._ABS:
+            body = self.permute_rank(self._arg0[node], rank, min_rank + 1)
+            return self.ABS(body)
+        args = self.args(node)
+        args = tuple(self.permute_rank(arg, rank, min_rank) for arg in args)
+        return self._rebuild(node, args)
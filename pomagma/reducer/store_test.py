@@ -0,0 +1,62 @@
+import gc
+import weakref
+
+import hypothesis
+
+from pomagma.reducer import bohm
+from pomagma.reducer.bohm_test import (
+    DECREMENT_RANK_EXAMPLES,
+    INCREMENT_RANK_EXAMPLES,
+    PERMUTE_RANK_EXAMPLES,
+    s_qterms,
+)
+from pomagma.reducer.store import TermStore
+from pomagma.reducer.syntax import ivar_bound, sexpr_parse
+from pomagma.util.testing import for_each
+
+STORE = TermStore()
+
+
+@hypothesis.given(s_qterms)
+def test_convert(term):
+    node = STORE(term)
+    assert STORE(term) == node
+    assert STORE.ivar_bound(node) == ivar_bound(term)
+    assert STORE.convert(node) is term
+
+
+def test_store_is_not_retained():
+    store = TermStore()
+    store(sexpr_parse("(ABS (APP 0 x))"))
+    ref = weakref.ref(store)
+    del store
+    gc.collect()
+    assert ref() is None
+
+
+@for_each(INCREMENT_RANK_EXAMPLES)
+def test_increment_rank(term, expected):
+    actual = STORE.increment_rank(STORE(term))
+    assert actual == STORE(expected)
+
+
+@for_each(DECREMENT_RANK_EXAMPLES)
+def test_try_decrement_rank(term, expected):
+    actual = STORE.try_decrement_rank(STORE(term))
+    assert actual == STORE(expected)
+
+
+@hypothesis.given(s_qterms)
+def test_shifts_agree_with_bohm(term):
+    node = STORE(term)
+    expected = bohm.increment_rank(term)
+    assert STORE.convert(STORE.increment_rank(node)) is expected
+    assert STORE.try_decrement_rank(STORE(expected)) == node
+    if ivar_bound(term) == 0:
+        assert STORE.increment_rank(node) == node
+
+
+@for_each(PERMUTE_RANK_EXAMPLES)
+def test_permute_rank(term, rank, expected):
+    actual = STORE.permute_rank(STORE(sexpr_parse(term)), rank)
+    assert actual == STORE(sexpr_parse(expected))
@@ -2,6 +2,7 @@
 
 import functools
 import inspect
+import logging
 
 from pomagma.reducer.bohm import convert
 from pomagma.reducer.syntax import NVAR, Term, free_vars, quoted_vars
@@ -26,7 +27,10 @@ def _compile(fun, actual_fun=None):
         raise SyntaxError("Unsupported signature: {}".format(source))
     symbolic_args = list(map(NVAR, args))
     symbolic_result = fun(*symbolic_args)
-    LOG.debug("compiling {}{} = {}".format(fun, tuple(symbolic_args), symbolic_result))
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug(
+            "compiling {}{} = {}".format(fun, tuple(symbolic_args), symbolic_result)
+        )
     term = as_term(symbolic_result)
     for var in reversed(symbolic_args):
         term = convert.FUN(var, term)
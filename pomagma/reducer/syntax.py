@@ -31,7 +31,7 @@ class Term(tuple):
         raise NotImplementedError("import pomagma.reduce.sugar")
 
     @staticmethod
-    @memoize_args
+    @memoize_args(capacity=None)
     def make(*args):
         return Term(args)
 
@@ -375,6 +375,26 @@ def is_defined(term):
     return not any(is_nvar(v) for v in free_vars(term))
 
 
+@memoize_arg
+def ivar_bound(term):
+    """Returns 1 + the max rank of free IVARs in term, possibly quoted, or 0.
+
+    Rank shifts that only affect IVARs of rank >= ivar_bound(term) leave term
+    unchanged.
+    """
+    assert isinstance(term, Term), term
+    if is_atom(term) or is_nvar(term):
+        return 0
+    elif is_ivar(term):
+        return term[1] + 1
+    elif is_abs(term):
+        return max(0, ivar_bound(term[1]) - 1)
+    elif is_fun(term):
+        return ivar_bound(term[2])
+    else:
+        return max(ivar_bound(arg) for arg in term[1:])
+
+
 # ----------------------------------------------------------------------------
 # Complexity
 
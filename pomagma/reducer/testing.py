@@ -80,13 +80,18 @@ def parse_xfail(comment, test_id):
     return False
 
 
-def iter_equations(test_id, suites=None):
+def iter_equations(test_id, suites=None, xfail=True):
+    """Yields (lhs, rhs, message) cases, marking xfail cases unless xfail=False.
+
+    Pass xfail=False for tests that do not compare lhs to rhs, since xfail
+    comments refer to that comparison.
+    """
     assert isinstance(test_id, str), test_id
     for term, comment, message in iter_test_cases(test_id, suites):
         if is_equal(term):
             lhs = link(bohm.convert(term[1]))
             rhs = link(bohm.convert(term[2]))
-            if comment and parse_xfail(comment, test_id):
+            if xfail and comment and parse_xfail(comment, test_id):
                 yield xfail_param(lhs, rhs, message)
             else:
                 yield lhs, rhs, message
@@ -1,10 +1,13 @@
 import atexit
 import functools
 import inspect
+import itertools
 import logging
 import os
+import signal
 import sys
-from collections import defaultdict
+from collections import defaultdict, deque
+from timeit import default_timer
 
 import pomagma.util
 
@@ -156,7 +159,110 @@ def _not_logged(*args, **kwargs):
     return lambda fun: fun
 
 
-logged = _logged if LOG.isEnabledFor(logging.DEBUG) else _not_logged
+_logged_or_not = _logged if LOG.isEnabledFor(logging.DEBUG) else _not_logged
+
+
+def logged(*format_args, **format_kwargs):
+    """Decorator to log calls when DEBUG is enabled, and to allow tracing.
+
+    This must be the outermost decorator of a module-level function, so that
+    enable_tracing(-) can rebind the function's module attribute. When
+    tracing is disabled this adds no wrapper beyond that of logging.
+    """
+    log = _logged_or_not(*format_args, **format_kwargs)
+
+    def decorator(fun):
+        fun = log(fun)
+        TRACEABLE.append((fun.__module__, fun.__name__))
+        if _TRACE_ORIGINALS is not None:
+            _TRACE_ORIGINALS[fun.__module__, fun.__name__] = fun
+            fun = _sampled(fun)
+        return fun
+
+    return decorator
+
+
+# ----------------------------------------------------------------------------
+# Tracing
+
+TRACEABLE = []  # : list of (module name, function name)
+TRACE = deque(maxlen=10000)  # : (function name, elapsed sec, arg complexities)
+_TRACE_ORIGINALS = None  # : None or {(module name, function name): function}
+_TRACE_EVERY = 100
+
+
+def _arg_complexity(arg):
+    from pomagma.reducer.syntax import Term, complexity
+
+    return complexity(arg) if isinstance(arg, Term) else None
+
+
+def _sampled(fun):
+    calls = itertools.count()
+    name = fun.__name__
+
+    @functools.wraps(fun)
+    def sampled(*args, **kwargs):
+        if next(calls) % _TRACE_EVERY:
+            return fun(*args, **kwargs)
+        start = default_timer()
+        try:
+            return fun(*args, **kwargs)
+        finally:
+            elapsed = default_timer() - start
+            TRACE.append((name, elapsed, tuple(map(_arg_complexity, args))))
+
+    return sampled
+
+
+def enable_tracing(sample_every=100, capacity=10000):
+    """Record 1-in-sample_every calls of @logged functions into TRACE.
+
+    This rebinds @logged functions in their modules, so it affects callers
+    that look functions up via module attributes, but not callers that have
+    imported functions by name.
+    """
+    global TRACE, _TRACE_EVERY, _TRACE_ORIGINALS
+    assert sample_every >= 1, sample_every
+    disable_tracing()
+    TRACE = deque(maxlen=capacity)
+    _TRACE_EVERY = sample_every
+    _TRACE_ORIGINALS = {}
+    for module_name, name in TRACEABLE:
+        module = sys.modules[module_name]
+        fun = getattr(module, name)
+        _TRACE_ORIGINALS[module_name, name] = fun
+        setattr(module, name, _sampled(fun))
+
+
+def disable_tracing():
+    """Restore @logged functions, so that they have no tracing overhead."""
+    global _TRACE_ORIGINALS
+    if _TRACE_ORIGINALS is None:
+        return
+    for (module_name, name), fun in _TRACE_ORIGINALS.items():
+        setattr(sys.modules[module_name], name, fun)
+    _TRACE_ORIGINALS = None
+
+
+def dump_trace(file=sys.stderr):
+    """Write the sampled trace, slowest calls first."""
+    records = sorted(TRACE, key=lambda record: record[1], reverse=True)
+    file.write("{: >12} {: >24} {}\n".format("sec", "fun", "arg complexity"))
+    file.write("-" * 48 + "\n")
+    for name, elapsed, complexities in records:
+        file.write("{: >12.6f} {: >24} {}\n".format(elapsed, name, complexities))
+    file.flush()
+
+
+def install_trace_signal(signum=signal.SIGUSR1):
+    """Dump the sampled trace on receipt of a signal, e.g. kill -USR1 pid."""
+    signal.signal(signum, lambda signum, frame: dump_trace())
+
+
+if int(os.environ.get("POMAGMA_TRACE_EVERY", 0)):
+    enable_tracing(sample_every=int(os.environ["POMAGMA_TRACE_EVERY"]))
+    install_trace_signal()
 
 # ----------------------------------------------------------------------------
 # Profiling
@@ -1,6 +1,18 @@
+import io
+
 import pytest
 
-from pomagma.reducer.util import trool_all, trool_any, trool_fuse
+from pomagma.reducer import util
+from pomagma.reducer.syntax import APP, I, K
+from pomagma.reducer.util import (
+    disable_tracing,
+    dump_trace,
+    enable_tracing,
+    logged,
+    trool_all,
+    trool_any,
+    trool_fuse,
+)
 from pomagma.util.testing import for_each
 
 
@@ -69,3 +81,27 @@ def test_trool_all(expected, values):
 )
 def test_trool_any(expected, values):
     assert trool_any(values) is expected
+
+
+@logged(str, returns=str)
+def traced_example(term):
+    return term
+
+
+def test_tracing():
+    original = traced_example
+    try:
+        enable_tracing(sample_every=2)
+        assert globals()["traced_example"] is not original
+        for term in [I, K, APP(K, I), APP(I, I)]:
+            assert globals()["traced_example"](term) is term
+        names = [name for name, _, _ in util.TRACE]
+        complexities = [args for _, _, args in util.TRACE]
+        assert names == ["traced_example", "traced_example"]
+        assert complexities == [(2,), (4,)]
+        file = io.StringIO()
+        dump_trace(file)
+        assert "traced_example" in file.getvalue()
+    finally:
+        disable_tracing()
+    assert globals()["traced_example"] is original
@@ -36,21 +36,44 @@ def find_best_pattern(
     Returns:
         Best pattern E-class (Ob) or None if no good patterns found.
     """
-    counter["find_best_pattern"] += 1
-    data_tensor = obtree.materialize(structure)
-    occurrences = language.compute_occurrences(structure, data_tensor, probs=probs)
+    return find_best_patterns(structure, language, probs, [obtree])[0]
 
-    # Benefit is the number of consolidated occurrences times the complexity,
-    # where complexity = -log(probability).
-    approx_benefit = -torch.xlogy(occurrences - 1, probs)
-    best_ob_idx = approx_benefit.argmax(dim=0)
-    best_benefit = approx_benefit[best_ob_idx]
 
-    if best_benefit.item() > 0:
-        return Ob(int(best_ob_idx.item()))
+@torch.no_grad()
+def find_best_patterns(
+    structure: Structure,
+    language: Language,
+    probs: torch.Tensor,
+    obtrees: list[ObTree],
+    *,
+    batch_size: int = 256,
+) -> list[Ob | None]:
+    """
+    Batched version of find_best_pattern.
 
-    counter["find_best_pattern.no_pattern"] += 1
-    return None
+    Occurrence propagation is linear in data, so obtrees are materialized into
+    [batch_size, 1 + item_count] blocks and each block is propagated in a
+    single multi-right-hand-side solve.
+    """
+    assert batch_size > 0
+    patterns: list[Ob | None] = []
+    for begin in range(0, len(obtrees), batch_size):
+        batch = obtrees[begin : begin + batch_size]
+        counter["find_best_pattern"] += len(batch)
+        data = ObTree.materialize_batch(structure, batch)
+        occurrences = language.compute_occurrences(structure, data, probs=probs)
+
+        # Benefit is the number of consolidated occurrences times the complexity,
+        # where complexity = -log(probability).
+        approx_benefit = -torch.xlogy(occurrences - 1, probs)
+        best_benefit, best_ob = approx_benefit.max(dim=-1)
+        for benefit, ob in zip(best_benefit.tolist(), best_ob.tolist()):
+            if benefit > 0:
+                patterns.append(Ob(ob))
+            else:
+                counter["find_best_pattern.no_pattern"] += 1
+                patterns.append(None)
+    return patterns
 
 
 @torch.no_grad()
@@ -125,8 +148,13 @@ def beta_compress(
     counter["beta_compress"] += 1
     equation_benefits: Counter[Expression] = Counter()
     cost_func = functools.partial(language.complexity, structure, probs)
-    for i, obtree in enumerate(obtrees):
-        benefits = beta_compress_obtree(structure, language, probs, obtree, cost_func)
+    extractor = Extractor(structure, language)
+    patterns = find_best_patterns(structure, language, probs, obtrees)
+    for obtree, pattern_ob in zip(obtrees, patterns):
+        counter["beta_compress_obtree"] += 1
+        benefits = _beta_compress_obtree_pattern(
+            extractor, probs, obtree, pattern_ob, cost_func
+        )
         equation_benefits.update(benefits)
     counter["beta_compress.equations"] = len(equation_benefits)
     return dict(equation_benefits)
@@ -138,27 +166,43 @@ def beta_compress_obtree(
     probs: torch.Tensor,
     obtree: ObTree,
     cost_func: Callable[[Expression], float],
+    *,
+    extractor: Extractor | None = None,
 ) -> dict[Expression, float]:
     """
     Apply beta-compression to simplify an obtree.
     """
     counter["beta_compress_obtree"] += 1
+    if extractor is None:
+        extractor = Extractor(structure, language)
     # Find best pattern as E-class (Ob)
     pattern_ob = find_best_pattern(structure, language, probs, obtree)
+    return _beta_compress_obtree_pattern(
+        extractor, probs, obtree, pattern_ob, cost_func
+    )
+
+
+def _beta_compress_obtree_pattern(
+    extractor: Extractor,
+    probs: torch.Tensor,
+    obtree: ObTree,
+    pattern_ob: Ob | None,
+    cost_func: Callable[[Expression], float],
+) -> dict[Expression, float]:
     if pattern_ob is None:
         counter["beta_compress_obtree.no_pattern"] += 1
         return {}
 
     # Extract expression with tilted language favoring the pattern
-    expr = extract_tilted(structure, language, probs, obtree, pattern_ob)
+    expr = extract_tilted(
+        extractor.structure, extractor.language, probs, obtree, pattern_ob
+    )
     if expr is None:
         counter["beta_compress_obtree.no_expr"] += 1
         return {}
 
     # Get the actual pattern expression for compression
-    extractor = Extractor(structure, language)
-    ob_to_expr = extractor.extract_all_obs()
-    pattern_expr = ob_to_expr.get(pattern_ob)
+    pattern_expr = extractor.extract_ob(pattern_ob)
     if pattern_expr is None:
         counter["beta_compress_obtree.no_pattern_expr"] += 1
         return {}
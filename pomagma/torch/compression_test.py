@@ -1,6 +1,11 @@
+import torch
+
 from pomagma.compiler.expressions import Expression
 from pomagma.compiler.parser import parse_string_to_expr
-from pomagma.torch.compression import beta_compress
+from pomagma.torch.compression import (
+    beta_compress,
+    find_best_patterns,
+)
 from pomagma.torch.corpus import ObTree
 from pomagma.torch.language import Language
 from pomagma.torch.structure import Structure
@@ -131,3 +136,28 @@ def test_obtree_materialize(structure: Structure, language: Language):
 
     # Most entries should be zero
     assert (tensor == 0.0).sum().item() >= structure.item_count - 2
+
+
+def test_find_best_patterns_batched(structure: Structure, language: Language):
+    """Test that batched occurrence propagation matches per-obtree propagation."""
+    expr_strings = [
+        "APP S K",
+        "COMP APP S K APP S K",
+        "COMP COMP K J COMP K J",
+    ]
+    obtrees = [ObTree.from_string(structure, s) for s in expr_strings]
+    probs = language.compute_probs(structure)
+
+    data = ObTree.materialize_batch(structure, obtrees)
+    assert data.shape == (len(obtrees), structure.item_count + 1)
+    occurrences = language.compute_occurrences(
+        structure, data, probs=probs, reltol=1e-5
+    )
+    for obtree, actual in zip(obtrees, occurrences):
+        expected = language.compute_occurrences(
+            structure, obtree.materialize(structure), probs=probs, reltol=1e-5
+        )
+        assert torch.allclose(actual, expected, rtol=1e-3, atol=1e-5)
+
+    patterns = find_best_patterns(structure, language, probs, obtrees, batch_size=2)
+    assert len(patterns) == len(obtrees)
@@ -1,6 +1,7 @@
 import logging
-from collections import Counter
+from collections import Counter, defaultdict
 from dataclasses import dataclass
+from typing import Sequence
 from weakref import WeakKeyDictionary
 
 import torch
@@ -66,6 +67,72 @@ class ObTree(metaclass=HashConsMeta):
         logger.warning(f"Unknown symbol: {name}")
         return ObTree(name=name, args=args)
 
+    @staticmethod
+    def from_exprs(structure: Structure, exprs: Sequence[Expression]) -> list["ObTree"]:
+        """
+        Bulk version of from_expr for a whole corpus.
+
+        Distinct subexpressions are resolved level-by-level, bottom-up, with one
+        batched hash table lookup per function symbol per level.
+        """
+        # Compute the height of each distinct subexpression, iteratively.
+        heights: dict[Expression, int] = {}
+        stack: list[Expression] = list(exprs)
+        while stack:
+            expr = stack[-1]
+            if expr in heights:
+                stack.pop()
+                continue
+            todo = [arg for arg in expr.args if arg not in heights]
+            if todo:
+                stack.extend(todo)
+                continue
+            stack.pop()
+            heights[expr] = 1 + max((heights[arg] for arg in expr.args), default=-1)
+        num_levels = 1 + max(heights.values(), default=-1)
+        levels: list[list[Expression]] = [[] for _ in range(num_levels)]
+        for expr, height in heights.items():
+            levels[height].append(expr)
+
+        # Resolve each level, batching lookups by function symbol.
+        result: dict[Expression, ObTree] = {}
+        for level in levels:
+            pending: defaultdict[str, list[Expression]] = defaultdict(list)
+            for expr in level:
+                name = expr.name
+                args = tuple(result[arg] for arg in expr.args)
+                if not all(arg.ob for arg in args):
+                    result[expr] = ObTree(name=name, args=args)
+                    continue
+                if expr.arity == 0 and name in structure.nullary_functions:
+                    result[expr] = ObTree(ob=structure.nullary_functions[name])
+                    continue
+                if expr.arity == 2 and (
+                    name in structure.binary_functions
+                    or name in structure.symmetric_functions
+                ):
+                    pending[name].append(expr)
+                    continue
+                logger.warning(f"Unknown symbol: {name}")
+                result[expr] = ObTree(name=name, args=args)
+            for name, batch in pending.items():
+                fn = structure.binary_functions.get(name)
+                if fn is None:
+                    fn = structure.symmetric_functions[name]
+                args_tensor = torch.tensor(
+                    [[result[arg].ob for arg in expr.args] for expr in batch],
+                    dtype=torch.int32,
+                )
+                for expr, ob in zip(batch, fn.lookup(args_tensor).tolist()):
+                    if ob:
+                        result[expr] = ObTree(ob=Ob(ob))
+                    else:
+                        logger.warning(f"Unknown symbol: {name}")
+                        args = tuple(result[arg] for arg in expr.args)
+                        result[expr] = ObTree(name=name, args=args)
+
+        return [result[expr] for expr in exprs]
+
     @staticmethod
     def from_string(structure: Structure, string: str) -> "ObTree":
         expr = parse_string_to_expr(string)
@@ -112,3 +179,22 @@ class ObTree(metaclass=HashConsMeta):
         for ob, count in self.stats.obs.items():
             result[ob] = count
         return result
+
+    @staticmethod
+    def materialize_batch(
+        structure: Structure, obtrees: "list[ObTree]"
+    ) -> torch.Tensor:
+        """Stack materialized ObTrees into a tensor of shape [B, 1 + item_count]."""
+        result = torch.zeros(
+            len(obtrees), structure.item_count + 1, dtype=torch.float32
+        )
+        rows: list[int] = []
+        cols: list[int] = []
+        vals: list[int] = []
+        for row, obtree in enumerate(obtrees):
+            for ob, count in obtree.stats.obs.items():
+                rows.append(row)
+                cols.append(ob)
+                vals.append(count)
+        result[rows, cols] = torch.tensor(vals, dtype=torch.float32)
+        return result
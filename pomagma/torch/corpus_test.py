@@ -285,3 +285,29 @@ def test_obtree_str_representation() -> None:
     y_tree = ObTree(ob=Ob(2))
     app_tree = ObTree(name="APP", args=(x_tree, y_tree))
     assert str(app_tree) == "APP [1] [2]"
+
+
+def test_obtree_from_exprs(structure: Structure) -> None:
+    """Test that bulk ObTree.from_exprs agrees with ObTree.from_expr."""
+    from pomagma.compiler.parser import parse_string_to_expr
+
+    strings = [
+        "S",
+        "APP S K",
+        "COMP APP S K APP S K",
+        "JOIN K APP K J",
+        "APP APP S K UNKNOWN",
+    ]
+    exprs = [parse_string_to_expr(s) for s in strings]
+    actual = ObTree.from_exprs(structure, exprs)
+    expected = [ObTree.from_expr(structure, expr) for expr in exprs]
+    assert actual == expected
+
+
+def test_binary_function_lookup_batched(structure: Structure) -> None:
+    for name, fn in structure.binary_functions.items():
+        args = fn.Vlr.args[:100]
+        expected = torch.tensor([fn[Ob(lhs), Ob(rhs)] for lhs, rhs in args.tolist()])
+        actual = fn.lookup(args)
+        assert actual.tolist() == expected.tolist()
+        assert (actual > 0).all()
@@ -17,8 +17,14 @@ TORCH_LIBRARY(pomagma, m) {
         "Tensor parent_counts, Tensor probs, float weight) -> Tensor");
     m.def("hash_pair(int lhs, int rhs) -> int");
     m.def(
-        "load_structure(str filename, bool relations) -> (str[], "
-        "Tensor[])");
+        "sparse_binary_function_lookup(Tensor hash_table, Tensor args) -> "
+        "Tensor");
+    m.def(
+        "sparse_binary_function_insert(Tensor(a!) hash_table, Tensor entries) "
+        "-> ()");
+    m.def(
+        "load_structure(str filename, bool relations, "
+        "bool packed_relations=False) -> (str, str[], Tensor[])");
     m.def("init_extension(str blob_dir) -> ()");
 }
 
@@ -30,6 +36,10 @@ TORCH_LIBRARY_IMPL(pomagma, CPU, m) {
     m.impl("binary_function_distribute_product",
            &pomagma::torch::binary_function_distribute_product);
     m.impl("hash_pair", &pomagma::torch::hash_pair);
+    m.impl("sparse_binary_function_lookup",
+           &pomagma::torch::sparse_binary_function_lookup);
+    m.impl("sparse_binary_function_insert",
+           &pomagma::torch::sparse_binary_function_insert);
     m.impl("load_structure", &pomagma::torch::load_structure);
     m.impl("init_extension", &pomagma::torch::init_extension);
 }
@@ -1,4 +1,5 @@
 import logging
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Dict, List, Optional
 
 import torch
@@ -14,6 +15,27 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True, slots=True, eq=False)
+class BackPointers:
+    """
+    Table of best grammar rules for each E-class, from which expressions can
+    be built top-down.
+
+    Fields:
+        names: Function names indexed by rule; names[0] is unused.
+        rule: Tensor of shape [1 + item_count] where rule[ob] is -1 if ob has
+            no derivation, 0 if ob is best derived by a nullary function, and
+            otherwise the index in names of the best binary function.
+        lhs: Tensor of shape [1 + item_count] of best left arguments.
+        rhs: Tensor of shape [1 + item_count] of best right arguments.
+    """
+
+    names: tuple[str, ...]
+    rule: torch.Tensor
+    lhs: torch.Tensor
+    rhs: torch.Tensor
+
+
 class Extractor:
     """Handles extraction of expressions from E-graphs and ObTrees."""
 
@@ -21,6 +43,124 @@ class Extractor:
         self.structure = structure
         self.language = language
         self._ob_to_expr_cache: Optional[Dict[Ob, Optional[Expression]]] = None
+        self._backpointers: Optional[BackPointers] = None
+        self._backpointer_lists: Optional[tuple[list, list, list]] = None
+        self._expr_cache: Dict[Ob, Optional[Expression]] = {Ob(0): None}
+        self._nullary_names: Dict[Ob, str] = {
+            ob: name for name, ob in structure.nullary_functions.items()
+        }
+
+    @torch.no_grad()
+    def compute_backpointers(self, *, best: torch.Tensor | None = None) -> BackPointers:
+        """
+        Computes the best grammar rule for every E-class at once, by a
+        segment-max over the Vlr tables of each function.
+        """
+        if self._backpointers is not None:
+            return self._backpointers
+
+        if best is None:
+            best = self.language.compute_best(self.structure)
+        N = 1 + self.structure.item_count
+        assert best.shape == (N,)
+
+        # Nullary functions.
+        obs = torch.tensor(list(self._nullary_names), dtype=torch.long)
+        best_value = torch.zeros(N, dtype=best.dtype)
+        best_value[obs] = self.language.nullary_functions.detach()[obs]
+        rule = torch.full((N,), -1, dtype=torch.long)
+        rule[obs[best_value[obs] > 0]] = 0
+        lhs = torch.zeros(N, dtype=torch.long)
+        rhs = torch.zeros(N, dtype=torch.long)
+
+        # Binary functions, in the same order as the reference implementation.
+        # Ties are broken in favor of earlier rules and earlier table entries.
+        names: list[str] = [""]
+        for self_fs, struct_fs in [
+            (self.language.binary_functions, self.structure.binary_functions),
+            (self.language.symmetric_functions, self.structure.symmetric_functions),
+        ]:
+            for name, weight in self_fs.items():
+                names.append(name)
+                Vlr = struct_fs[name].Vlr
+                args = Vlr.args.long()
+                nnz = args.size(0)
+                if nnz == 0:
+                    continue
+                seg = torch.repeat_interleave(
+                    torch.arange(N), Vlr.ptrs.long().diff(), output_size=nnz
+                )
+                part = weight.item() * best[args[:, 0]] * best[args[:, 1]]
+                seg_max = torch.zeros(N, dtype=best.dtype).scatter_reduce(
+                    0, seg, part, reduce="amax"
+                )
+                is_max = (part == seg_max[seg]) & (part > 0)
+                pos = torch.full((N,), nnz, dtype=torch.long).scatter_reduce(
+                    0, seg[is_max], torch.arange(nnz)[is_max], reduce="amin"
+                )
+                better = seg_max > best_value
+                best_value = torch.where(better, seg_max, best_value)
+                rule[better] = len(names) - 1
+                lhs[better] = args[pos[better], 0]
+                rhs[better] = args[pos[better], 1]
+
+        # Obs with zero probability have no derivation.
+        rule[best <= 0] = -1
+        rule[0] = -1
+
+        self._backpointers = BackPointers(
+            names=tuple(names), rule=rule, lhs=lhs, rhs=rhs
+        )
+        return self._backpointers
+
+    def extract_ob(self, ob: Ob) -> Optional[Expression]:
+        """
+        Lazily extracts the shortest expression for a single E-class, building
+        only the subexpressions it needs from the back-pointer table.
+        """
+        cache = self._expr_cache
+        if ob in cache:
+            return cache[ob]
+        bp = self.compute_backpointers()
+        if self._backpointer_lists is None:
+            self._backpointer_lists = (
+                bp.rule.tolist(),
+                bp.lhs.tolist(),
+                bp.rhs.tolist(),
+            )
+        rule, lhs, rhs = self._backpointer_lists
+
+        # Build bottom-up with an explicit stack, to avoid deep recursion.
+        pending: set[Ob] = set()
+        stack: List[Ob] = [ob]
+        while stack:
+            x = stack[-1]
+            if x in cache:
+                stack.pop()
+                continue
+            r = rule[x]
+            if r < 0:
+                cache[x] = None
+            elif r == 0:
+                cache[x] = Expression.make(self._nullary_names[x])
+            else:
+                children = [Ob(lhs[x]), Ob(rhs[x])]
+                todo = [c for c in children if c not in cache]
+                if todo and x not in pending:
+                    pending.add(x)
+                    stack.extend(todo)
+                    continue
+                if todo:
+                    cache[x] = None  # cyclic back-pointers
+                else:
+                    lhs_expr, rhs_expr = (cache[c] for c in children)
+                    if lhs_expr is None or rhs_expr is None:
+                        cache[x] = None
+                    else:
+                        cache[x] = Expression.make(bp.names[r], lhs_expr, rhs_expr)
+            pending.discard(x)
+            stack.pop()
+        return cache[ob]
 
     def extract_all_obs(
         self, *, best: torch.Tensor | None = None
@@ -32,6 +172,28 @@ class Extractor:
         if self._ob_to_expr_cache is not None:
             return self._ob_to_expr_cache
 
+        bp = self.compute_backpointers(best=best)
+        expressions: Dict[Ob, Optional[Expression]] = {Ob(0): None}
+        for ob in map(Ob, range(1, 1 + self.structure.item_count)):
+            expressions[ob] = self.extract_ob(ob)
+        self._ob_to_expr_cache = expressions
+
+        # Check that all expressions were successfully extracted.
+        extracted_count = sum(
+            1 for ob, e in expressions.items() if e is not None and ob != Ob(0)
+        )
+        logger.info(f"Extracted {extracted_count}/{self.structure.item_count} obs")
+        expected_count = (bp.rule[1:] >= 0).long().sum().item()
+        assert extracted_count == expected_count
+
+        return expressions
+
+    def extract_all_obs_reference(
+        self, *, best: torch.Tensor | None = None
+    ) -> Dict[Ob, Optional[Expression]]:
+        """
+        Reference implementation of extract_all_obs(), looping over obs.
+        """
         if best is None:
             best = self.language.compute_best(self.structure)
         assert best.shape == (1 + self.structure.item_count,)
@@ -102,9 +264,6 @@ class Extractor:
 
             expressions[ob] = best_expr
 
-        # Cache and return
-        self._ob_to_expr_cache = expressions
-
         # Check that all expressions were successfully extracted.
         extracted_count = sum(
             1 for ob, e in expressions.items() if e is not None and ob != Ob(0)
@@ -125,8 +284,7 @@ class Extractor:
         """
         if obtree.ob is not None:
             # This is a leaf - extract from E-class
-            ob_expressions = self.extract_all_obs()
-            return ob_expressions.get(obtree.ob)
+            return self.extract_ob(obtree.ob)
 
         # This is an internal node - recursively extract arguments
         if obtree.name is None or obtree.args is None:
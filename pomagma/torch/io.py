@@ -1,5 +1,9 @@
+import json
 import logging
-from typing import Iterable, Literal, TypeVar
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Literal, Mapping, TypeVar
 
 import numpy as np
 import torch
@@ -7,12 +11,14 @@ from google.protobuf.message import Message
 from immutables import Map
 
 import pomagma.atlas.structure_pb2 as pb2
-from pomagma.io import blobstore
+import pomagma.util
+from pomagma.io import blobstore, create_directories
 from pomagma.io.protobuf import InFile
 
 from .structure import (
     BinaryFunction,
     Ob,
+    PackedBinaryRelation,
     SparseBinaryFunction,
     SparseTernaryRelation,
     Structure,
@@ -34,32 +40,9 @@ def delta_decompress(ob_map: pb2.ObMap) -> tuple[list[Ob], list[Ob]]:
 
     assert len(ob_map.key_diff_minus_one) == len(ob_map.val_diff)
 
-    keys = []
-    vals = []
-    key = 0
-    val = 0
-
-    for i in range(len(ob_map.key_diff_minus_one)):
-        key += ob_map.key_diff_minus_one[i] + 1
-        val += ob_map.val_diff[i]
-        keys.append(key)
-        vals.append(val)
-
-    return keys, vals
-
-
-def load_ob_map(ob_map: pb2.ObMap) -> tuple[Iterable[Ob], Iterable[Ob]]:
-    """
-    Load an ObMap from protobuf to Python lists.
-    """
-    if ob_map.key:
-        return ob_map.key, ob_map.val
-    return delta_decompress(ob_map)
-
-
-def count_ob_map_entries(ob_map: pb2.ObMap) -> int:
-    """Count the number of entries in an ObMap."""
-    return len(ob_map.key) + len(ob_map.key_diff_minus_one)  # either dense or sparse
+    keys = np.cumsum(np.array(ob_map.key_diff_minus_one, dtype=np.int64) + 1)
+    vals = np.cumsum(np.array(ob_map.val_diff, dtype=np.int64))
+    return keys.tolist(), vals.tolist()
 
 
 def load_dense_set(ob_set: pb2.ObSet, max_item: int) -> torch.Tensor:
@@ -106,99 +89,97 @@ def iter_chunks(message: _M) -> Iterable[_M]:
             assert not chunk.blobs
 
 
-def count_binary_function_entries(proto_func: pb2.BinaryFunction) -> int:
-    """Count the number of entries in a binary function."""
-    return sum(
-        count_ob_map_entries(row.rhs_val)
-        for chunk in iter_chunks(proto_func)
-        for row in chunk.rows
-    )
-
-
-def load_binary_function(
-    proto_func: pb2.BinaryFunction, item_count: int
-) -> BinaryFunction:
+def decode_binary_function_chunk(chunk: pb2.BinaryFunction) -> np.ndarray:
     """
-    Load binary function data into a BinaryFunction object.
+    Decode the rows of one chunk of a binary function.
+    Returns an array of shape [N, 3] of (lhs, rhs, val) entries in proto order.
     """
-    # Pass 1: Count entries for each table
-    func_entries = 0
-    Vlr_counts = [0] * (item_count + 1)  # indexed by val
-    Rvl_counts = [0] * (item_count + 1)  # indexed by rhs
-    Lvr_counts = [0] * (item_count + 1)  # indexed by lhs
+    parts: list[np.ndarray] = []
+    for row in chunk.rows:
+        ob_map = row.rhs_val
+        if ob_map.key:
+            keys = np.array(ob_map.key, dtype=np.int64)
+            vals = np.array(ob_map.val, dtype=np.int64)
+        else:
+            keys = np.cumsum(np.array(ob_map.key_diff_minus_one, dtype=np.int64) + 1)
+            vals = np.cumsum(np.array(ob_map.val_diff, dtype=np.int64))
+        part = np.empty((len(keys), 3), dtype=np.int64)
+        part[:, 0] = row.lhs
+        part[:, 1] = keys
+        part[:, 2] = vals
+        parts.append(part)
+    if not parts:
+        return np.zeros((0, 3), dtype=np.int64)
+    return np.concatenate(parts)
+
+
+def _read_and_decode_blob(hexdigest: str) -> np.ndarray:
+    chunk = pb2.BinaryFunction()
+    with InFile(blobstore.find_blob(hexdigest)) as f:
+        f.read(chunk)
+    assert not chunk.blobs
+    return decode_binary_function_chunk(chunk)
+
+
+def load_binary_function_entries(
+    proto_func: pb2.BinaryFunction, *, max_workers: int | None = None
+) -> np.ndarray:
+    """
+    Load all (lhs, rhs, val) entries of a binary function, in proto order.
 
-    for chunk in iter_chunks(proto_func):
-        for row in chunk.rows:
-            lhs = row.lhs
-            keys, vals = load_ob_map(row.rhs_val)
-            for rhs, val in zip(keys, vals):
-                func_entries += 1
-                Vlr_counts[val] += 1
-                Rvl_counts[rhs] += 1
-                Lvr_counts[lhs] += 1
-
-    # Create pointers from counts
-    def create_ptrs_from_counts(counts: list[int]) -> torch.Tensor:
-        ptrs = torch.zeros(len(counts) + 1, dtype=torch.int32)
-        for i in range(len(counts)):
-            ptrs[i + 1] = ptrs[i] + counts[i]
-        return ptrs
-
-    Vlr_ptrs = create_ptrs_from_counts(Vlr_counts)
-    Rvl_ptrs = create_ptrs_from_counts(Rvl_counts)
-    Lvr_ptrs = create_ptrs_from_counts(Lvr_counts)
-
-    # Allocate tensors
-    LRv = SparseBinaryFunction(func_entries)
-    Vlr_nnz = int(Vlr_ptrs[-1].item())
-    Rvl_nnz = int(Rvl_ptrs[-1].item())
-    Lvr_nnz = int(Lvr_ptrs[-1].item())
-
-    Vlr_args = torch.zeros((Vlr_nnz, 2), dtype=torch.int32)
-    Rvl_args = torch.zeros((Rvl_nnz, 2), dtype=torch.int32)
-    Lvr_args = torch.zeros((Lvr_nnz, 2), dtype=torch.int32)
-
-    # Pass 2: Load data with position tracking
-    Vlr_pos = [0] * (item_count + 1)
-    Rvl_pos = [0] * (item_count + 1)
-    Lvr_pos = [0] * (item_count + 1)
-
-    for chunk in iter_chunks(proto_func):
-        for row in chunk.rows:
-            lhs = row.lhs
-            keys, vals = load_ob_map(row.rhs_val)
-            for rhs, val in zip(keys, vals):
-                LRv[lhs, rhs] = val
+    Each blob chunk is an independent gzip file, so chunks are read, gunzipped,
+    and decoded concurrently in a thread pool, then concatenated in order.
+    """
+    parts = [decode_binary_function_chunk(proto_func)]
+    if proto_func.blobs:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            parts.extend(pool.map(_read_and_decode_blob, proto_func.blobs))
+    return np.concatenate(parts)
 
-                # Vlr table: indexed by val, stores (lhs, rhs)
-                idx = Vlr_ptrs[val] + Vlr_pos[val]
-                Vlr_args[idx, 0] = lhs
-                Vlr_args[idx, 1] = rhs
-                Vlr_pos[val] += 1
 
-                # Rvl table: indexed by rhs, stores (val, lhs)
-                idx = Rvl_ptrs[rhs] + Rvl_pos[rhs]
-                Rvl_args[idx, 0] = val
-                Rvl_args[idx, 1] = lhs
-                Rvl_pos[rhs] += 1
+def build_sparse_ternary_relation(
+    keys: np.ndarray, args: np.ndarray, item_count: int
+) -> SparseTernaryRelation:
+    """
+    Build a CSR table indexed by keys with a stable sort, so that entries with
+    equal keys keep their input order.
+    """
+    order = np.argsort(keys, kind="stable")
+    counts = np.bincount(keys, minlength=item_count + 1)
+    ptrs = np.zeros(item_count + 2, dtype=np.int32)
+    np.cumsum(counts, out=ptrs[1:])
+    return SparseTernaryRelation(
+        ptrs=torch.from_numpy(ptrs),
+        args=torch.from_numpy(args[order].astype(np.int32)),
+    )
 
-                # Lvr table: indexed by lhs, stores (val, rhs)
-                idx = Lvr_ptrs[lhs] + Lvr_pos[lhs]
-                Lvr_args[idx, 0] = val
-                Lvr_args[idx, 1] = rhs
-                Lvr_pos[lhs] += 1
 
-    # Verify that positions match counts
-    assert Vlr_pos == Vlr_counts, f"Vlr position mismatch: {Vlr_pos} != {Vlr_counts}"
-    assert Rvl_pos == Rvl_counts, f"Rvl position mismatch: {Rvl_pos} != {Rvl_counts}"
-    assert Lvr_pos == Lvr_counts, f"Lvr position mismatch: {Lvr_pos} != {Lvr_counts}"
+def build_binary_function(
+    name: str, entries: np.ndarray, item_count: int
+) -> BinaryFunction:
+    """
+    Build a BinaryFunction from an array of shape [N, 3] of (lhs, rhs, val)
+    entries, inserted in order.
+    """
+    lhs = entries[:, 0]
+    rhs = entries[:, 1]
+    val = entries[:, 2]
+    LRv = SparseBinaryFunction(len(entries))
+    LRv.insert(torch.from_numpy(entries))
+    Vlr = build_sparse_ternary_relation(val, entries[:, [0, 1]], item_count)
+    Rvl = build_sparse_ternary_relation(rhs, entries[:, [2, 0]], item_count)
+    Lvr = build_sparse_ternary_relation(lhs, entries[:, [2, 1]], item_count)
+    return BinaryFunction(name=name, LRv=LRv, Vlr=Vlr, Rvl=Rvl, Lvr=Lvr)
 
-    # Create BinaryFunctionTable objects
-    Vlr = SparseTernaryRelation(ptrs=Vlr_ptrs, args=Vlr_args)
-    Rvl = SparseTernaryRelation(ptrs=Rvl_ptrs, args=Rvl_args)
-    Lvr = SparseTernaryRelation(ptrs=Lvr_ptrs, args=Lvr_args)
 
-    return BinaryFunction(name=proto_func.name, LRv=LRv, Vlr=Vlr, Rvl=Rvl, Lvr=Lvr)
+def load_binary_function(
+    proto_func: pb2.BinaryFunction, item_count: int
+) -> BinaryFunction:
+    """
+    Load binary function data into a BinaryFunction object.
+    """
+    entries = load_binary_function_entries(proto_func)
+    return build_binary_function(proto_func.name, entries, item_count)
 
 
 def load_symmetric_function(
@@ -208,117 +189,16 @@ def load_symmetric_function(
     Load symmetric function data into a BinaryFunction object.
     For symmetric functions, we duplicate off-diagonal elements.
     """
-    # Pass 1: Count entries for each table, including symmetric duplicates
-    func_entries = 0
-    Vlr_counts = [0] * (item_count + 1)  # indexed by val
-    Rvl_counts = [0] * (item_count + 1)  # indexed by rhs
-    Lvr_counts = [0] * (item_count + 1)  # indexed by lhs
+    entries = load_binary_function_entries(proto_func)
 
-    for chunk in iter_chunks(proto_func):
-        for row in chunk.rows:
-            lhs = row.lhs
-            keys, vals = load_ob_map(row.rhs_val)
-            for rhs, val in zip(keys, vals):
-                # Original entry
-                func_entries += 1
-                Vlr_counts[val] += 1
-                Rvl_counts[rhs] += 1
-                Lvr_counts[lhs] += 1
-
-                # Symmetric entry (if different)
-                if lhs == rhs:
-                    continue
-                func_entries += 1
-                Vlr_counts[val] += 1  # Same val, but (rhs, lhs) instead of (lhs, rhs)
-                Rvl_counts[lhs] += 1  # Now indexed by lhs, stores (val, rhs)
-                Lvr_counts[rhs] += 1  # Now indexed by rhs, stores (val, lhs)
-
-    # Create pointers from counts
-    def create_ptrs_from_counts(counts: list[int]) -> torch.Tensor:
-        ptrs = torch.zeros(len(counts) + 1, dtype=torch.int32)
-        for i in range(len(counts)):
-            ptrs[i + 1] = ptrs[i] + counts[i]
-        return ptrs
-
-    Vlr_ptrs = create_ptrs_from_counts(Vlr_counts)
-    Rvl_ptrs = create_ptrs_from_counts(Rvl_counts)
-    Lvr_ptrs = create_ptrs_from_counts(Lvr_counts)
-
-    # Allocate tensors
-    func = SparseBinaryFunction(func_entries)
-    Vlr_nnz = int(Vlr_ptrs[-1].item())
-    Rvl_nnz = int(Rvl_ptrs[-1].item())
-    Lvr_nnz = int(Lvr_ptrs[-1].item())
-
-    Vlr_args = torch.zeros((Vlr_nnz, 2), dtype=torch.int32)
-    Rvl_args = torch.zeros((Rvl_nnz, 2), dtype=torch.int32)
-    Lvr_args = torch.zeros((Lvr_nnz, 2), dtype=torch.int32)
-
-    # Pass 2: Load data with position tracking, including symmetric duplicates
-    Vlr_pos = [0] * (item_count + 1)
-    Rvl_pos = [0] * (item_count + 1)
-    Lvr_pos = [0] * (item_count + 1)
-
-    for chunk in iter_chunks(proto_func):
-        for row in chunk.rows:
-            lhs = row.lhs
-            keys, vals = load_ob_map(row.rhs_val)
-            for rhs, val in zip(keys, vals):
-                # Original entry: (lhs, rhs, val)
-                func[lhs, rhs] = val
-
-                # Vlr table: indexed by val, stores (lhs, rhs)
-                idx = Vlr_ptrs[val] + Vlr_pos[val]
-                Vlr_args[idx, 0] = lhs
-                Vlr_args[idx, 1] = rhs
-                Vlr_pos[val] += 1
-
-                # Rvl table: indexed by rhs, stores (val, lhs)
-                idx = Rvl_ptrs[rhs] + Rvl_pos[rhs]
-                Rvl_args[idx, 0] = val
-                Rvl_args[idx, 1] = lhs
-                Rvl_pos[rhs] += 1
-
-                # Lvr table: indexed by lhs, stores (val, rhs)
-                idx = Lvr_ptrs[lhs] + Lvr_pos[lhs]
-                Lvr_args[idx, 0] = val
-                Lvr_args[idx, 1] = rhs
-                Lvr_pos[lhs] += 1
-
-                # Symmetric entry: (rhs, lhs, val) if lhs != rhs
-                if lhs == rhs:
-                    continue
-                func[rhs, lhs] = val
-
-                # Vlr table: indexed by val, stores (rhs, lhs)
-                idx = Vlr_ptrs[val] + Vlr_pos[val]
-                Vlr_args[idx, 0] = rhs
-                Vlr_args[idx, 1] = lhs
-                Vlr_pos[val] += 1
-
-                # Rvl table: indexed by lhs (now the rhs), stores (val, rhs)
-                idx = Rvl_ptrs[lhs] + Rvl_pos[lhs]
-                Rvl_args[idx, 0] = val
-                Rvl_args[idx, 1] = rhs
-                Rvl_pos[lhs] += 1
-
-                # Lvr table: indexed by rhs (now the lhs), stores (val, lhs)
-                idx = Lvr_ptrs[rhs] + Lvr_pos[rhs]
-                Lvr_args[idx, 0] = val
-                Lvr_args[idx, 1] = lhs
-                Lvr_pos[rhs] += 1
-
-    # Verify that positions match counts
-    assert Vlr_pos == Vlr_counts
-    assert Rvl_pos == Rvl_counts
-    assert Lvr_pos == Lvr_counts
-
-    # Create SparseTernaryRelation objects
-    Vlr = SparseTernaryRelation(ptrs=Vlr_ptrs, args=Vlr_args)
-    Rvl = SparseTernaryRelation(ptrs=Rvl_ptrs, args=Rvl_args)
-    Lvr = SparseTernaryRelation(ptrs=Lvr_ptrs, args=Lvr_args)
-
-    return BinaryFunction(name=proto_func.name, LRv=func, Vlr=Vlr, Rvl=Rvl, Lvr=Lvr)
+    # Interleave each entry with its transpose, dropping diagonal duplicates.
+    swapped = entries[:, [1, 0, 2]]
+    both = np.stack([entries, swapped], axis=1)
+    keep = np.ones((len(entries), 2), dtype=bool)
+    keep[:, 1] = entries[:, 0] != entries[:, 1]
+    entries = both[keep]
+
+    return build_binary_function(proto_func.name, entries, item_count)
 
 
 def load_unary_relation(proto_rel: pb2.UnaryRelation, item_count: int) -> torch.Tensor:
@@ -358,22 +238,58 @@ def load_structure(
     filename: str,
     *,
     relations: bool = False,
+    packed_relations: bool = False,
     backend: Literal["python", "cpp"] = "cpp",
+    cache: bool = False,
 ) -> Structure:
+    """
+    Load a structure from a protobuf file.
+
+    Args:
+        filename: Path to the .pb file.
+        relations: Whether to load relation data. Default: False.
+        packed_relations: Whether to store binary relations as packed bitsets.
+            Default: False.
+        backend: Which loader to use on cache misses. Default: "cpp".
+        cache: Whether to use a memory-mapped cache in CACHE_DIR, keyed by the
+            blob hexdigest. Default: False.
+    """
+    if backend not in ("python", "cpp"):
+        raise ValueError(f"Invalid backend: {backend}")
+    if cache:
+        hexdigest = blobstore.load_blob_ref(filename)
+        cache_filename = find_structure_cache(
+            hexdigest, relations=relations, packed_relations=packed_relations
+        )
+        if os.path.exists(cache_filename):
+            logger.debug(f"Loading cached structure: {cache_filename}")
+            return load_structure_cache(cache_filename)
     if backend == "python":
-        return load_structure_py(filename, relations=relations)
-    if backend == "cpp":
-        return load_structure_cpp(filename, relations=relations)
-    raise ValueError(f"Invalid backend: {backend}")
+        structure = load_structure_py(
+            filename, relations=relations, packed_relations=packed_relations
+        )
+    else:
+        structure = load_structure_cpp(
+            filename, relations=relations, packed_relations=packed_relations
+        )
+    if cache:
+        logger.debug(f"Caching structure: {cache_filename}")
+        dump_structure_cache(structure, cache_filename)
+        structure = load_structure_cache(cache_filename)
+    return structure
 
 
-def load_structure_py(filename: str, *, relations: bool = False) -> Structure:
+def load_structure_py(
+    filename: str, *, relations: bool = False, packed_relations: bool = False
+) -> Structure:
     """
     Load a structure from a protobuf file.
 
     Args:
         filename: Path to the .pb file.
         relations: Whether to load relation data. Default: False.
+        packed_relations: Whether to store binary relations as packed bitsets.
+            Default: False.
     """
     proto_structure = pb2.Structure()
     with InFile(blobstore.find_blob(blobstore.load_blob_ref(filename))) as f:
@@ -417,6 +333,10 @@ def load_structure_py(filename: str, *, relations: bool = False) -> Structure:
             binary_relations[proto_rel.name] = load_binary_relation(
                 proto_rel, item_count
             )
+            if packed_relations:
+                binary_relations[proto_rel.name] = PackedBinaryRelation.from_dense(
+                    binary_relations[proto_rel.name]
+                )
 
     return Structure(
         name=name,
@@ -429,30 +349,35 @@ def load_structure_py(filename: str, *, relations: bool = False) -> Structure:
     )
 
 
-def load_structure_cpp(filename: str, *, relations: bool = False) -> Structure:
+def load_structure_cpp(
+    filename: str, *, relations: bool = False, packed_relations: bool = False
+) -> Structure:
     """
     Load a structure from a protobuf file using C++ implementation.
 
     Args:
         filename: Path to the .pb file.
         relations: Whether to load relation data. Default: False.
+        packed_relations: Whether to store binary relations as packed bitsets.
+            Default: False.
     """
-    # Resolve blob path once for both C++ and Python usage
     resolved_blob_path = blobstore.find_blob(blobstore.load_blob_ref(filename))
 
     # Load tensors indexed by fully qualified names
+    name: str
     keys: list[str]
     values: list[torch.Tensor]
-    cpp_relations = False  # TODO: Implement relations in C++
-    keys, values = torch.ops.pomagma.load_structure(resolved_blob_path, cpp_relations)
-    tensors = dict(zip(keys, values))
+    name, keys, values = torch.ops.pomagma.load_structure(
+        resolved_blob_path, relations, packed_relations
+    )
+    return structure_from_tensors(name, dict(zip(keys, values)))
 
-    # Fall back to Python proto loading for structure name and relations
-    proto_structure = pb2.Structure()
-    with InFile(resolved_blob_path) as f:
-        f.read(proto_structure)
 
-    name = proto_structure.name
+def structure_from_tensors(name: str, tensors: Mapping[str, torch.Tensor]) -> Structure:
+    """
+    Assemble a Structure from tensors indexed by fully qualified names, as
+    produced by torch.ops.pomagma.load_structure or structure_to_tensors.
+    """
     item_count = tensors["item_count"].item()
     assert isinstance(item_count, int)
 
@@ -507,18 +432,15 @@ def load_structure_cpp(filename: str, *, relations: bool = False) -> Structure:
 
     # Parse relations
     unary_relations: dict[str, torch.Tensor] = {}
-    binary_relations: dict[str, torch.Tensor] = {}
-    if relations:
-        # Fall back to Python proto loading for relations
-        for proto_rel in proto_structure.unary_relations:
-            logger.debug(f"Loading unary relation: {proto_rel.name}")
-            unary_relations[proto_rel.name] = load_unary_relation(proto_rel, item_count)
-
-        for proto_rel in proto_structure.binary_relations:
-            logger.debug(f"Loading binary relation: {proto_rel.name}")
-            binary_relations[proto_rel.name] = load_binary_relation(
-                proto_rel, item_count
-            )
+    binary_relations: dict[str, torch.Tensor | PackedBinaryRelation] = {}
+    for key, tensor in tensors.items():
+        if key.startswith("unary_relations."):
+            unary_relations[key[len("unary_relations.") :]] = tensor
+        elif key.startswith("binary_relations."):
+            binary_relations[key[len("binary_relations.") :]] = tensor
+        elif key.startswith("packed_binary_relations."):
+            rel_name = key[len("packed_binary_relations.") :]
+            binary_relations[rel_name] = PackedBinaryRelation(words=tensor)
 
     return Structure(
         name=name,
@@ -529,3 +451,131 @@ def load_structure_cpp(filename: str, *, relations: bool = False) -> Structure:
         unary_relations=Map(unary_relations),
         binary_relations=Map(binary_relations),
     )
+
+
+def structure_to_tensors(structure: Structure) -> dict[str, torch.Tensor]:
+    """
+    Flatten a Structure to tensors indexed by fully qualified names.
+    This is the inverse of structure_from_tensors.
+    """
+    tensors: dict[str, torch.Tensor] = {}
+    tensors["item_count"] = torch.tensor(structure.item_count, dtype=torch.int64)
+    for name, val in structure.nullary_functions.items():
+        tensors[f"nullary_functions.{name}"] = torch.tensor(val, dtype=torch.int32)
+    for prefix, funcs in [
+        ("binary_functions", structure.binary_functions),
+        ("symmetric_functions", structure.symmetric_functions),
+    ]:
+        for name, func in funcs.items():
+            tensors[f"{prefix}.{name}.LRv"] = func.LRv.hash_table
+            for table in ["Vlr", "Rvl", "Lvr"]:
+                rel: SparseTernaryRelation = getattr(func, table)
+                tensors[f"{prefix}.{name}.{table}.ptrs"] = rel.ptrs
+                tensors[f"{prefix}.{name}.{table}.args"] = rel.args
+    for name, rel in structure.unary_relations.items():
+        tensors[f"unary_relations.{name}"] = rel
+    for name, rel in structure.binary_relations.items():
+        if isinstance(rel, PackedBinaryRelation):
+            tensors[f"packed_binary_relations.{name}"] = rel.words
+        else:
+            tensors[f"binary_relations.{name}"] = rel
+    return tensors
+
+
+# Structure cache file format, all integers little-endian:
+#   magic (8 bytes) | header size (8 bytes) | json header | padding | tensor data
+# where each tensor's data starts at an offset aligned to CACHE_ALIGNMENT bytes.
+CACHE_MAGIC = b"PMGTSC01"
+CACHE_ALIGNMENT = 64
+CACHE_DIR = os.path.join(pomagma.util.DATA, "cache", "torch")
+_CACHE_DTYPES: dict[str, torch.dtype] = {
+    "bool": torch.bool,
+    "uint8": torch.uint8,
+    "int32": torch.int32,
+    "int64": torch.int64,
+    "float32": torch.float32,
+    "float64": torch.float64,
+}
+
+
+def _align(offset: int) -> int:
+    return -(-offset // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+
+
+def find_structure_cache(
+    hexdigest: str, *, relations: bool = False, packed_relations: bool = False
+) -> str:
+    """Return path to the cache file of a structure blob."""
+    if not relations:
+        suffix = "fun"
+    elif packed_relations:
+        suffix = "packed"
+    else:
+        suffix = "rel"
+    return os.path.join(CACHE_DIR, f"{hexdigest}.{suffix}.tensors")
+
+
+def dump_structure_cache(structure: Structure, filename: str) -> None:
+    """
+    Write a Structure to a flat, aligned tensor file. The file is written to a
+    temporary path and atomically renamed, so that concurrent writers are safe.
+    """
+    tensors = structure_to_tensors(structure)
+    entries = []
+    offset = 0
+    for key, tensor in tensors.items():
+        dtype = str(tensor.dtype).removeprefix("torch.")
+        assert dtype in _CACHE_DTYPES, f"Unsupported dtype: {tensor.dtype}"
+        nbytes = tensor.numel() * tensor.element_size()
+        entries.append(
+            {
+                "key": key,
+                "dtype": dtype,
+                "shape": list(tensor.shape),
+                "offset": offset,
+                "nbytes": nbytes,
+            }
+        )
+        offset = _align(offset + nbytes)
+    header = json.dumps({"name": structure.name, "tensors": entries}).encode()
+    data_start = _align(len(CACHE_MAGIC) + 8 + len(header))
+
+    dirname = os.path.dirname(os.path.abspath(filename))
+    create_directories(dirname)
+    temp_filename = f"{filename}.temp.{os.getpid()}"
+    with open(temp_filename, "wb") as f:
+        f.write(CACHE_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for entry, tensor in zip(entries, tensors.values()):
+            f.seek(data_start + entry["offset"])
+            data = tensor.detach().cpu().contiguous().view(-1).view(torch.uint8)
+            f.write(data.numpy().tobytes())
+        f.truncate(data_start + offset)
+    os.replace(temp_filename, filename)
+
+
+def load_structure_cache(filename: str) -> Structure:
+    """
+    Memory-map a Structure from a file written by dump_structure_cache.
+
+    The file is mapped copy-on-write, so that concurrent processes share
+    physical pages and no tensor data is copied at load time.
+    """
+    with open(filename, "rb") as f:
+        magic = f.read(len(CACHE_MAGIC))
+        if magic != CACHE_MAGIC:
+            raise ValueError(f"Invalid structure cache: {filename}")
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    data_start = _align(len(CACHE_MAGIC) + 8 + header_size)
+
+    size = os.path.getsize(filename)
+    buffer = torch.from_file(filename, shared=False, size=size, dtype=torch.uint8)
+    tensors: dict[str, torch.Tensor] = {}
+    for entry in header["tensors"]:
+        begin = data_start + entry["offset"]
+        data = buffer[begin : begin + entry["nbytes"]]
+        dtype = _CACHE_DTYPES[entry["dtype"]]
+        tensors[entry["key"]] = data.view(dtype).view(entry["shape"])
+    return structure_from_tensors(header["name"], tensors)
@@ -4,10 +4,16 @@ import os
 import pytest
 import torch
 
-from pomagma.atlas.structure_pb2 import ObMap, ObSet
+from pomagma.atlas.structure_pb2 import BinaryFunction, ObMap, ObSet
 
-from .io import delta_decompress, load_dense_set
-from .structure import Structure
+from .io import (
+    decode_binary_function_chunk,
+    delta_decompress,
+    dump_structure_cache,
+    load_dense_set,
+    load_structure_cache,
+)
+from .structure import Ob, PackedBinaryRelation, Structure
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +45,22 @@ def test_delta_decompress() -> None:
     assert vals == expected_vals, f"Expected vals {expected_vals}, got {vals}"
 
 
+def test_decode_binary_function_chunk() -> None:
+    chunk = BinaryFunction()
+    row = chunk.rows.add()
+    row.lhs = 2
+    row.rhs_val.key_diff_minus_one.extend([0, 1])
+    row.rhs_val.val_diff.extend([7, -2])
+    row = chunk.rows.add()
+    row.lhs = 4
+    row.rhs_val.key.extend([3])
+    row.rhs_val.val.extend([9])
+
+    entries = decode_binary_function_chunk(chunk)
+
+    assert entries.tolist() == [[2, 1, 7], [2, 3, 5], [4, 3, 9]]
+
+
 def test_dense_set_loading() -> None:
     ob_set = ObSet()
     ob_set.dense = bytes([0x2A])
@@ -56,3 +78,35 @@ def test_dense_set_loading() -> None:
 
 def test_structure_loading(structure_cpp: Structure, structure_py: Structure) -> None:
     structure_cpp.assert_eq(structure_py)
+
+
+def test_structure_cache(tmp_path, structure_cpp: Structure) -> None:
+    filename = str(tmp_path / "structure.tensors")
+    dump_structure_cache(structure_cpp, filename)
+    cached = load_structure_cache(filename)
+    cached.assert_eq(structure_cpp)
+
+
+def test_structure_loading_relations() -> None:
+    structure_cpp = Structure.load(TEST_FILE, relations=True, backend="cpp")
+    structure_py = Structure.load(TEST_FILE, relations=True, backend="python")
+    structure_cpp.assert_eq(structure_py)
+    assert structure_cpp.binary_relations
+
+    packed_cpp = Structure.load(
+        TEST_FILE, relations=True, packed_relations=True, backend="cpp"
+    )
+    packed_py = Structure.load(
+        TEST_FILE, relations=True, packed_relations=True, backend="python"
+    )
+    packed_cpp.assert_eq(packed_py)
+    for name, dense in structure_cpp.binary_relations.items():
+        packed = packed_cpp.binary_relations[name]
+        assert isinstance(packed, PackedBinaryRelation)
+        assert isinstance(dense, torch.Tensor)
+        assert torch.equal(packed.to_dense(), dense)
+        rhs = torch.tensor([1, 2, structure_cpp.item_count])
+        assert torch.equal(packed.cols(rhs), dense[:, rhs])
+        lhs = Ob(1)
+        assert torch.equal(packed.row(lhs), dense[lhs])
+        assert packed[lhs, Ob(2)] == bool(dense[lhs, 2])
@@ -1,6 +1,7 @@
 import logging
 import math
-from typing import Mapping, Sequence
+import time
+from typing import Literal, Mapping, Sequence
 
 import torch
 from immutables import Map
@@ -9,6 +10,7 @@ from pomagma.compiler.expressions import Expression
 from pomagma.compiler.parser import parse_string_to_expr
 
 from .corpus import CorpusStats, ObTree
+from .solvers import Solver, solve_fixed_point
 from .structure import Structure
 
 logger = logging.getLogger(__name__)
@@ -99,6 +101,8 @@ class Language(torch.nn.Module):
         reltol: float = 1e-3,
         init_probs: torch.Tensor | None = None,
         min_steps: int = 5,
+        solver: Solver = "jacobi",
+        residuals: list[float] | None = None,
     ) -> torch.Tensor:
         """
         Propagates from a normalized grammar to a sub-normalized weighted set of obs.
@@ -111,34 +115,98 @@ class Language(torch.nn.Module):
             reltol: Relative tolerance for convergence
             init_probs: Optional warm start initialization
             min_steps: Minimum steps to run even if converged (for gradient quality)
+            solver: Fixed-point solver, see solve_fixed_point()
+            residuals: Optional list to which per-iteration residuals are appended
         """
+        # Initialize with warm start if provided, else atoms.
+        if init_probs is None:
+            probs = self.nullary_functions.detach()
+        else:
+            probs = init_probs.clone()
+
+        # Propagate until convergence (with minimum steps).
+        return solve_fixed_point(
+            lambda probs: self._compute_probs_step(structure, probs),
+            probs,
+            reltol=reltol,
+            solver=solver,
+            min_steps=min_steps,
+            jvp=lambda probs, v: self._compute_probs_jvp(structure, probs, v),
+            residuals=residuals,
+        )
+
+    @staticmethod
+    def compute_probs_batch(
+        languages: Sequence["Language"],
+        structure: Structure,
+        *,
+        reltol: float = 1e-3,
+        init_probs: torch.Tensor | None = None,
+        min_steps: int = 5,
+        solver: Solver = "jacobi",
+    ) -> torch.Tensor:
+        """
+        Batched version of compute_probs for many languages over one structure.
+
+        All languages must have the same function symbols. Weights are stacked
+        into tensors with a leading batch dimension, so that each sweep walks
+        every function table once for the whole batch.
+
+        Args:
+            languages: A nonempty sequence of B languages
+            structure: The E-graph structure
+            reltol: Relative tolerance for convergence
+            init_probs: Optional warm start of shape [B, 1 + item_count]
+            min_steps: Minimum steps to run even if converged (for gradient quality)
+            solver: Fixed-point solver, see solve_fixed_point()
+
+        Returns:
+            A tensor of shape [B, 1 + item_count] whose row b equals
+            languages[b].compute_probs(structure).
+        """
+        assert languages
         assert 0.0 < reltol < 1.0
         assert min_steps >= 0
-        eps = torch.finfo(self.nullary_functions.dtype).eps
+        nullary_functions = torch.stack([lang.nullary_functions for lang in languages])
+        binary_functions = {
+            name: torch.stack([lang.binary_functions[name] for lang in languages])
+            for name in languages[0].binary_functions
+        }
+        symmetric_functions = {
+            name: torch.stack([lang.symmetric_functions[name] for lang in languages])
+            for name in languages[0].symmetric_functions
+        }
+
+        def step(probs: torch.Tensor) -> torch.Tensor:
+            out = nullary_functions.clone()
+            for name, weight in binary_functions.items():
+                fn = structure.binary_functions[name]
+                out += weight[:, None] * fn.sum_product(probs, probs)
+            for name, weight in symmetric_functions.items():
+                fn = structure.symmetric_functions[name]
+                out += weight[:, None] * fn.sum_product(probs, probs)
+            return out
 
         # Initialize with warm start if provided, else atoms.
         if init_probs is None:
-            probs = self.nullary_functions.detach()
+            probs = nullary_functions.detach()
         else:
+            assert init_probs.shape == nullary_functions.shape
             probs = init_probs.clone()
 
         # Propagate until convergence (with minimum steps).
-        diff = 1.0
-        step = 0
-        while diff > reltol or step < min_steps:
-            prev = probs
-            probs = self._compute_probs_step(structure, probs)
-            with torch.no_grad():
-                # Only the convergence check is in no_grad - doesn't affect gradients
-                diffs = (probs - prev).abs() / (probs + eps)
-                diff = diffs.max().item()
-            step += 1
-
-        return probs
+        return solve_fixed_point(
+            step, probs, reltol=reltol, solver=solver, min_steps=min_steps
+        )
 
     @torch.no_grad()
     def compute_best(
-        self, structure: Structure, *, reltol: float = 1e-3
+        self,
+        structure: Structure,
+        *,
+        reltol: float = 1e-3,
+        solver: Solver = "jacobi",
+        residuals: list[float] | None = None,
     ) -> torch.Tensor:
         """
         Propagates from a normalized grammar to find the best (max probability)
@@ -147,21 +215,14 @@ class Language(torch.nn.Module):
         Unlike compute_probs which sums over all derivations, this finds the single
         highest-probability derivation for each E-class for E-graph extraction.
         """
-        assert 0.0 < reltol < 1.0
-        eps = torch.finfo(self.nullary_functions.dtype).eps
-
-        # Initialize with atoms.
-        best = self.nullary_functions.detach()
-
-        # Propagate until convergence.
-        diff = 1.0
-        while diff > reltol:
-            prev = best
-            best = self._compute_best_step(structure, best)
-            diffs = (best - prev).abs() / (best + eps)
-            diff = diffs.max().item()
-
-        return best
+        # Initialize with atoms and propagate until convergence.
+        return solve_fixed_point(
+            lambda best: self._compute_best_step(structure, best),
+            self.nullary_functions.detach(),
+            reltol=reltol,
+            solver=solver,
+            residuals=residuals,
+        )
 
     def _compute_probs_step(
         self, structure: Structure, probs: torch.Tensor
@@ -176,6 +237,21 @@ class Language(torch.nn.Module):
             out += weight * fn.sum_product(probs, probs)
         return out
 
+    def _compute_probs_jvp(
+        self, structure: Structure, probs: torch.Tensor, tangent: torch.Tensor
+    ) -> torch.Tensor:
+        # Jacobian-vector product of _compute_probs_step, by bilinearity.
+        out = torch.zeros_like(probs)
+        for name, weight in self.binary_functions.items():
+            fn = structure.binary_functions[name]
+            out += weight * fn.sum_product(tangent, probs)
+            out += weight * fn.sum_product(probs, tangent)
+        for name, weight in self.symmetric_functions.items():
+            fn = structure.symmetric_functions[name]
+            out += weight * fn.sum_product(tangent, probs)
+            out += weight * fn.sum_product(probs, tangent)
+        return out
+
     def _compute_best_step(
         self, structure: Structure, best: torch.Tensor
     ) -> torch.Tensor:
@@ -278,34 +354,43 @@ class Language(torch.nn.Module):
         *,
         probs: torch.Tensor | None = None,
         reltol: float = 1e-3,
+        solver: Solver = "jacobi",
+        residuals: list[float] | None = None,
     ) -> torch.Tensor:
         """
         Counts the number of occurrences of each subexpression of each E-class in
         expressions from a corpus. This includes both leaf nodes (from grammar rules)
         and internal node E-classes.
+
+        Since propagation is linear in data, data may be a batch of shape
+        [B, 1 + item_count], e.g. one row per expression, in which case all rows
+        are propagated together and the result has the same shape.
         """
         # This uses backward propagation from observed data through the E-graph
         # structure, distributing occurrence counts based on
         # probability-weighted decompositions.
-        assert data.shape == self.nullary_functions.shape
+        assert data.dim() in (1, 2)
+        assert data.shape[-1:] == self.nullary_functions.shape
         assert 0.0 < reltol < 1.0
-        eps = torch.finfo(self.nullary_functions.dtype).eps
         if probs is None:
             # Compute the forward probabilities once
-            probs = self.compute_probs(structure, reltol=reltol)
-
-        # Initialize with the observed data - these are the "root" occurrences
-        counts = data.clone()
-
-        # Propagate until convergence
-        diff = 1.0
-        while diff > reltol:
-            prev = counts
-            counts = self._compute_occurrences_step(structure, counts, probs, data)
-            diffs = (counts - prev).abs() / (counts + eps)
-            diff = diffs.max().item()
-
-        return counts
+            probs = self.compute_probs(structure, reltol=reltol, solver=solver)
+
+        # Initialize with the observed data - these are the "root" occurrences,
+        # then propagate until convergence. The step is affine in counts, so its
+        # Jacobian-vector product is the step applied to the tangent, minus data.
+        return solve_fixed_point(
+            lambda counts: self._compute_occurrences_step(
+                structure, counts, probs, data
+            ),
+            data.clone(),
+            reltol=reltol,
+            solver=solver,
+            jvp=lambda counts, v: (
+                self._compute_occurrences_step(structure, v, probs, data) - data
+            ),
+            residuals=residuals,
+        )
 
     def log_prob(
         self,
@@ -541,6 +626,7 @@ class Language(torch.nn.Module):
         learning_rate: float = 0.1,
         tol: float = 1e-6,
         reltol: float = 1e-4,
+        solver: Solver = "jacobi",
     ) -> list[float]:
         """
         Fit language weights to a corpus using L-BFGS.
@@ -552,6 +638,7 @@ class Language(torch.nn.Module):
             learning_rate: Learning rate for L-BFGS
             tol: Tolerance for optimization convergence
             reltol: Relative tolerance for compute_probs iterations
+            solver: Fixed-point solver for compute_probs
 
         Returns:
             List of losses
@@ -560,10 +647,37 @@ class Language(torch.nn.Module):
         corpus_language = self.zeros_like()
         corpus_language.iadd_corpus(corpus_stats)
         corpus_size = int(corpus_language.nullary_functions.sum().item())
+        logger.info(f"Fitting to corpus of size {corpus_size}")
 
+        losses, _ = self._fit_lbfgs(
+            structure,
+            corpus_language,
+            max_steps=max_steps,
+            learning_rate=learning_rate,
+            tol=tol,
+            reltol=reltol,
+            solver=solver,
+        )
+        return losses
+
+    def _fit_lbfgs(
+        self,
+        structure: Structure,
+        corpus_language: "Language",
+        *,
+        max_steps: int,
+        learning_rate: float,
+        tol: float,
+        reltol: float,
+        solver: Solver,
+        init_probs: torch.Tensor | None = None,
+    ) -> tuple[list[float], torch.Tensor | None]:
+        """
+        Runs L-BFGS on the full-batch loss -corpus_language.log_prob(self).
+        Returns the list of losses and the last probs, for warm starting.
+        """
         # Track metrics
         losses: list[float] = []
-        logger.info(f"Fitting to corpus of size {corpus_size}")
 
         # Setup optimizer
         optimizer = torch.optim.LBFGS(
@@ -576,7 +690,7 @@ class Language(torch.nn.Module):
         )
 
         # Warm start for compute_probs
-        prev_probs = None
+        prev_probs = init_probs
 
         def closure():
             nonlocal prev_probs
@@ -584,7 +698,11 @@ class Language(torch.nn.Module):
 
             # Compute probabilities with warm start
             probs = self.compute_probs(
-                structure, reltol=reltol, init_probs=prev_probs, min_steps=3
+                structure,
+                reltol=reltol,
+                init_probs=prev_probs,
+                min_steps=3,
+                solver=solver,
             )
             prev_probs = probs.detach()
 
@@ -601,4 +719,130 @@ class Language(torch.nn.Module):
             if step % 10 == 0 or step == max_steps - 1:
                 logger.info(f"Step {step}: loss={loss.item():.6f}")
 
+        return losses, prev_probs
+
+    def fit_stochastic(
+        self,
+        structure: Structure,
+        corpus: Sequence[ObTree],
+        *,
+        batch_size: int = 64,
+        max_steps: int = 100,
+        optimizer: Literal["adam", "sgd"] = "adam",
+        learning_rate: float = 0.01,
+        polish_every: int = 0,
+        polish_steps: int = 1,
+        reltol: float = 1e-4,
+        solver: Solver = "jacobi",
+        generator: torch.Generator | None = None,
+    ) -> list[float]:
+        """
+        Fit language weights to a corpus of ObTrees by minibatch gradient descent.
+
+        Each step samples a minibatch of trees (without replacement within an
+        epoch), accumulates their counts into a small corpus language, and takes
+        one Adam or SGD step on the mean per-tree negative log-likelihood.
+        Because log_prob is linear in corpus counts, minibatch gradients are
+        unbiased estimates of full-corpus gradients. E-class probs are warm
+        started from the previous step, so each step typically needs only a
+        few propagation sweeps.
+
+        Args:
+            structure: The E-graph structure
+            corpus: A nonempty sequence of training trees
+            batch_size: Number of trees per minibatch
+            max_steps: Number of minibatch steps
+            optimizer: Either "adam" or "sgd"
+            learning_rate: Learning rate for the minibatch optimizer
+            polish_every: If positive, run full-batch L-BFGS every this many
+                steps and after the last step
+            polish_steps: Number of L-BFGS steps per polishing round
+            reltol: Relative tolerance for compute_probs iterations
+            solver: Fixed-point solver for compute_probs
+            generator: Optional random generator for minibatch sampling
+
+        Returns:
+            List of minibatch losses, as mean negative log-likelihood per tree
+        """
+        assert corpus
+        assert batch_size > 0
+        assert polish_steps > 0
+        if optimizer == "adam":
+            opt: torch.optim.Optimizer = torch.optim.Adam(
+                self.parameters(), lr=learning_rate
+            )
+        elif optimizer == "sgd":
+            opt = torch.optim.SGD(self.parameters(), lr=learning_rate)
+        else:
+            raise ValueError(f"Invalid optimizer: {optimizer}")
+
+        # The full corpus is only materialized for polishing.
+        full_language: Language | None = None
+        if polish_every > 0:
+            full_language = self.zeros_like()
+            for tree in corpus:
+                full_language.iadd_corpus(tree.stats)
+
+        logger.info(f"Fitting to corpus of {len(corpus)} trees")
+        losses: list[float] = []
+        prev_probs: torch.Tensor | None = None
+        order = torch.zeros(0, dtype=torch.long)
+        pos = 0
+        batch_size = min(batch_size, len(corpus))
+        total_trees = 0
+        start_time = time.perf_counter()
+        for step in range(max_steps):
+            step_time = time.perf_counter()
+
+            # Sample a minibatch, reshuffling at each epoch.
+            if pos + batch_size > len(order):
+                order = torch.randperm(len(corpus), generator=generator)
+                pos = 0
+            batch = order[pos : pos + batch_size].tolist()
+            pos += batch_size
+            batch_language = self.zeros_like()
+            for i in batch:
+                batch_language.iadd_corpus(corpus[i].stats)
+
+            opt.zero_grad()
+            probs = self.compute_probs(
+                structure,
+                reltol=reltol,
+                init_probs=prev_probs,
+                min_steps=3,
+                solver=solver,
+            )
+            prev_probs = probs.detach()
+            loss = -batch_language.log_prob(structure, self, probs) / len(batch)
+            loss.backward()
+            opt.step()
+            self.project_to_feasible_()
+            losses.append(loss.item())
+            total_trees += len(batch)
+
+            if full_language is not None and (
+                (step + 1) % polish_every == 0 or step == max_steps - 1
+            ):
+                polish_losses, prev_probs = self._fit_lbfgs(
+                    structure,
+                    full_language,
+                    max_steps=polish_steps,
+                    learning_rate=1.0,
+                    tol=1e-6,
+                    reltol=reltol,
+                    solver=solver,
+                    init_probs=prev_probs,
+                )
+                logger.info(
+                    f"Step {step}: polished full-batch loss={polish_losses[-1]:.6f}"
+                )
+
+            if step % 10 == 0 or step == max_steps - 1:
+                elapsed = time.perf_counter() - start_time
+                logger.info(
+                    f"Step {step}: loss={losses[-1]:.6f}, "
+                    f"{total_trees / elapsed:.1f} trees/sec, "
+                    f"{time.perf_counter() - step_time:.3f} sec/step"
+                )
+
         return losses
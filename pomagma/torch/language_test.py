@@ -1,3 +1,5 @@
+import math
+
 import pytest
 import torch
 from immutables import Map
@@ -456,3 +458,39 @@ def test_complexity_handles_invalid_inputs(
     )
     assert isinstance(complexity_unknown, float)
     assert complexity_unknown >= 0
+
+
+@pytest.mark.parametrize("optimizer", ["adam", "sgd"])
+@pytest.mark.parametrize("polish_every", [0, 2])
+def test_fit_stochastic(
+    simple_structure: Structure,
+    simple_language: Language,
+    optimizer: str,
+    polish_every: int,
+) -> None:
+    """Test minibatch fitting to a corpus of ObTrees."""
+    language_copy = Language(
+        nullary_functions=simple_language.nullary_functions.clone(),
+        binary_functions={
+            k: v.clone() for k, v in simple_language.binary_functions.items()
+        },
+    )
+    x_tree = ObTree(ob=Ob(1))
+    y_tree = ObTree(ob=Ob(2))
+    corpus = [x_tree, y_tree, ObTree(name="APP", args=(x_tree, y_tree))]
+
+    losses = language_copy.fit_stochastic(
+        simple_structure,
+        corpus,
+        batch_size=2,
+        max_steps=5,
+        optimizer=optimizer,  # type: ignore[arg-type]
+        polish_every=polish_every,
+        generator=torch.Generator().manual_seed(0),
+    )
+
+    assert len(losses) == 5
+    assert all(map(math.isfinite, losses))
+    assert torch.all(language_copy.nullary_functions >= 0)
+    total = language_copy.total()
+    assert torch.allclose(total, torch.tensor(1.0), atol=1e-6)
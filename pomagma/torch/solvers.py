@@ -0,0 +1,199 @@
+from typing import Callable, Literal
+
+import torch
+
+Solver = Literal["jacobi", "anderson", "newton_krylov"]
+SOLVERS: tuple[Solver, ...] = ("jacobi", "anderson", "newton_krylov")
+
+Step = Callable[[torch.Tensor], torch.Tensor]
+JVP = Callable[[torch.Tensor, torch.Tensor], torch.Tensor]
+
+
+def _reldiff(new: torch.Tensor, old: torch.Tensor, eps: float) -> float:
+    with torch.no_grad():
+        return ((new - old).abs() / (new + eps)).max().item()
+
+
+def _dot(a: torch.Tensor, b: torch.Tensor) -> float:
+    return (a.double() * b.double()).sum().item()
+
+
+def solve_fixed_point(
+    step: Step,
+    init: torch.Tensor,
+    *,
+    reltol: float,
+    solver: Solver = "jacobi",
+    min_steps: int = 0,
+    max_steps: int = 10000,
+    jvp: JVP | None = None,
+    memory: int = 5,
+    residuals: list[float] | None = None,
+) -> torch.Tensor:
+    """
+    Finds a nonnegative fixed point x = step(x), starting from init.
+
+    The residual of each iteration is the max relative difference between
+    successive iterates, and iteration stops once it is at most reltol.
+
+    Solvers:
+        jacobi: Plain fixed-point iteration x <- step(x).
+        anderson: Anderson mixing over the last `memory` iterates.
+        newton_krylov: Inexact Newton on step(x) - x = 0, solving each linear
+            system by GMRES using Jacobian-vector products jvp(x, v). If jvp is
+            not provided, it is approximated by finite differences.
+
+    Gradients: Jacobi iterations are recorded by autograd as usual. The other
+    solvers run without gradient tracking and are followed by `min_steps`
+    unrolled Jacobi steps, so that gradients are those of the last few steps
+    at the fixed point, as with a warm-started Jacobi solve.
+
+    Args:
+        step: The map whose fixed point is sought.
+        init: The initial iterate.
+        reltol: Relative tolerance for convergence.
+        solver: One of SOLVERS.
+        min_steps: Minimum number of (unrolled) Jacobi steps.
+        max_steps: Maximum number of solver iterations.
+        jvp: Optional Jacobian-vector product of step, for newton_krylov.
+        memory: History size for anderson.
+        residuals: Optional list to which the residual of each iteration is
+            appended, for comparing solvers.
+    """
+    assert 0.0 < reltol < 1.0
+    assert min_steps >= 0
+    if solver not in SOLVERS:
+        raise ValueError(f"Invalid solver: {solver}")
+    if residuals is None:
+        residuals = []
+    eps = torch.finfo(init.dtype).eps
+
+    if solver == "jacobi":
+        x = init
+        diff = 1.0
+        count = 0
+        while diff > reltol or count < min_steps:
+            prev = x
+            x = step(x)
+            diff = _reldiff(x, prev, eps)
+            residuals.append(diff)
+            count += 1
+        return x
+
+    with torch.no_grad():
+        x = init.detach()
+        if solver == "anderson":
+            x = _anderson(step, x, reltol, eps, max_steps, memory, residuals)
+        else:
+            x = _newton_krylov(step, x, reltol, eps, max_steps, jvp, residuals)
+
+    # Unroll a few Jacobi steps for gradients.
+    for _ in range(min_steps):
+        x = step(x)
+    return x
+
+
+def _anderson(
+    step: Step,
+    x: torch.Tensor,
+    reltol: float,
+    eps: float,
+    max_steps: int,
+    memory: int,
+    residuals: list[float],
+) -> torch.Tensor:
+    xs: list[torch.Tensor] = []
+    gs: list[torch.Tensor] = []
+    for _ in range(max_steps):
+        g = step(x)
+        diff = _reldiff(g, x, eps)
+        residuals.append(diff)
+        if diff <= reltol:
+            return g
+        xs.append(x.reshape(-1).double())
+        gs.append(g.reshape(-1).double())
+        if len(xs) > memory + 1:
+            xs.pop(0)
+            gs.pop(0)
+        if len(xs) == 1:
+            x = g
+            continue
+
+        # Minimize the mixed residual over the affine hull of recent iterates.
+        X = torch.stack(xs, dim=1)
+        G = torch.stack(gs, dim=1)
+        R = G - X
+        dR = R[:, 1:] - R[:, :-1]
+        dG = G[:, 1:] - G[:, :-1]
+        gamma = torch.linalg.lstsq(dR, R[:, -1:], driver="gelsd").solution
+        mixed = G[:, -1] - (dG @ gamma).squeeze(1)
+        x = mixed.to(x.dtype).reshape(x.shape).clamp(min=0)
+    return step(x)
+
+
+def _newton_krylov(
+    step: Step,
+    x: torch.Tensor,
+    reltol: float,
+    eps: float,
+    max_steps: int,
+    jvp: JVP | None,
+    residuals: list[float],
+) -> torch.Tensor:
+    if jvp is None:
+
+        def jvp(x: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+            h = eps**0.5 * (1.0 + x.abs().max().item())
+            return (step(x + h * v) - step(x)) / h
+
+    for _ in range(max_steps):
+        g = step(x)
+        diff = _reldiff(g, x, eps)
+        residuals.append(diff)
+        if diff <= reltol:
+            return g
+
+        # Solve (I - J) dx = g - x, where J is the Jacobian of step at x.
+        def matvec(v: torch.Tensor, x: torch.Tensor = x) -> torch.Tensor:
+            return v - jvp(x, v)
+
+        dx = gmres(matvec, g - x)
+        x = (x + dx).clamp(min=0)
+    return step(x)
+
+
+def gmres(
+    matvec: Callable[[torch.Tensor], torch.Tensor],
+    b: torch.Tensor,
+    *,
+    restart: int = 20,
+    rtol: float = 1e-2,
+) -> torch.Tensor:
+    """
+    Approximately solves A x = b by unrestarted GMRES with at most `restart`
+    Krylov vectors, where matvec(v) = A v.
+    """
+    b_norm = b.double().norm().item()
+    if b_norm == 0:
+        return torch.zeros_like(b)
+    V = [b / b_norm]
+    H = torch.zeros(restart + 1, restart, dtype=torch.float64)
+    y = torch.zeros(0, dtype=torch.float64)
+    for j in range(restart):
+        w = matvec(V[j])
+        for i in range(j + 1):  # modified Gram-Schmidt
+            H[i, j] = _dot(w, V[i])
+            w = w - H[i, j].item() * V[i]
+        H[j + 1, j] = w.double().norm().item()
+        e1 = torch.zeros(j + 2, 1, dtype=torch.float64)
+        e1[0] = b_norm
+        Hj = H[: j + 2, : j + 1]
+        y = torch.linalg.lstsq(Hj, e1, driver="gelsd").solution.squeeze(1)
+        res = (Hj @ y - e1.squeeze(1)).norm().item()
+        if res <= rtol * b_norm or H[j + 1, j].item() <= 1e-12 * b_norm:
+            break
+        V.append(w / H[j + 1, j].item())
+    x = torch.zeros_like(b)
+    for i, coeff in enumerate(y.tolist()):
+        x = x + coeff * V[i]
+    return x
@@ -0,0 +1,62 @@
+import pytest
+import torch
+
+from pomagma.torch.solvers import SOLVERS, Solver, gmres, solve_fixed_point
+
+
+@pytest.mark.parametrize("solver", SOLVERS)
+def test_solve_fixed_point_affine(solver: Solver) -> None:
+    torch.manual_seed(0)
+    n = 20
+    A = torch.rand(n, n)
+    A *= 0.9 / A.sum(dim=1, keepdim=True)  # contraction
+    b = torch.rand(n)
+    expected = torch.linalg.solve(torch.eye(n) - A, b)
+
+    residuals: list[float] = []
+    actual = solve_fixed_point(
+        lambda x: b + A @ x, b, reltol=1e-6, solver=solver, residuals=residuals
+    )
+    assert torch.allclose(actual, expected, rtol=1e-4)
+    assert residuals
+    assert residuals[-1] <= 1e-6
+
+
+def test_solve_fixed_point_acceleration() -> None:
+    torch.manual_seed(0)
+    n = 20
+    A = torch.rand(n, n)
+    A *= 0.99 / A.sum(dim=1, keepdim=True)  # near criticality
+    b = torch.rand(n)
+    counts = {}
+    for solver in SOLVERS:
+        residuals: list[float] = []
+        solve_fixed_point(
+            lambda x: b + A @ x, b, reltol=1e-5, solver=solver, residuals=residuals
+        )
+        counts[solver] = len(residuals)
+    assert counts["anderson"] < counts["jacobi"]
+    assert counts["newton_krylov"] < counts["jacobi"]
+
+
+def test_solve_fixed_point_gradients() -> None:
+    a = torch.tensor(0.5, requires_grad=True)
+    x = solve_fixed_point(
+        lambda x: 1 + a * x,
+        torch.zeros(()),
+        reltol=1e-6,
+        solver="anderson",
+        min_steps=50,
+    )
+    (grad,) = torch.autograd.grad(x, [a])
+    # x = 1 / (1 - a), so dx/da = 1 / (1 - a)^2 = 4.
+    assert torch.allclose(grad, torch.tensor(4.0), rtol=1e-3)
+
+
+def test_gmres() -> None:
+    torch.manual_seed(0)
+    n = 10
+    A = torch.eye(n) + 0.1 * torch.randn(n, n)
+    b = torch.randn(n)
+    x = gmres(lambda v: A @ v, b, restart=n, rtol=1e-8)
+    assert torch.allclose(A @ x, b, atol=1e-4)
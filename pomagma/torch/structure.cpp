@@ -7,6 +7,8 @@
 #include <pomagma/atlas/structure.pb.h>
 #include <pomagma/third_party/farmhash/farmhash.h>
 
+#include <algorithm>
+#include <cstring>
 #include <pomagma/io/blobstore.hpp>
 #include <pomagma/io/protobuf.hpp>
 
@@ -18,15 +20,16 @@ at::Tensor binary_function_reduce_product(const at::Tensor& f_ptrs,
                                           const at::Tensor& f_args,
                                           const at::Tensor& lhs,
                                           const at::Tensor& rhs) {
-    // Check shapes: f_ptrs [N+1], f_args [NNZ, 2], lhs [N], rhs [N]
+    // Check shapes: f_ptrs [N+1], f_args [NNZ, 2], lhs [N] or [B, N],
+    // rhs same shape as lhs.
     TORCH_CHECK(f_ptrs.dim() == 1);
     TORCH_CHECK(f_args.dim() == 2);
-    TORCH_CHECK(lhs.dim() == 1);
-    TORCH_CHECK(rhs.dim() == 1);
+    TORCH_CHECK(lhs.dim() == 1 || lhs.dim() == 2);
+    TORCH_CHECK(rhs.sizes() == lhs.sizes());
     const int64_t N = f_ptrs.size(0) - 1;
     const int64_t NNZ = f_args.size(0);
-    TORCH_CHECK(lhs.size(0) == N);
-    TORCH_CHECK(rhs.size(0) == N);
+    const int64_t B = lhs.dim() == 2 ? lhs.size(0) : 1;
+    TORCH_CHECK(lhs.size(-1) == N);
 
     // Check dtypes
     TORCH_CHECK(f_ptrs.dtype() == at::kInt);
@@ -56,22 +59,29 @@ at::Tensor binary_function_reduce_product(const at::Tensor& f_ptrs,
     at::Tensor out = at::empty_like(lhs);
     float* out_data = out.data_ptr<float>();
 
+    // Each CSR row is walked once and its entries are applied to every batch
+    // element, so the cost of reading f_args is amortized across the batch.
 #pragma omp parallel for schedule(dynamic, 16)
     for (int64_t i = 0; i < N; i++) {
-        float accum = 0;
         const int64_t begin = f_ptrs_data[i];
         const int64_t end = f_ptrs_data[i + 1];
+        for (int64_t b = 0; b < B; b++) {
+            out_data[b * N + i] = 0;
+        }
         for (int64_t j = begin; j < end; j++) {
             const int64_t lhs_idx = f_args_data[j * 2];
             const int64_t rhs_idx = f_args_data[j * 2 + 1];
-            const float val = lhs_data[lhs_idx] * rhs_data[rhs_idx];
-            if constexpr (temperature) {
-                accum += val;
-            } else {
-                accum = std::max(accum, val);
+            for (int64_t b = 0; b < B; b++) {
+                const float val =
+                    lhs_data[b * N + lhs_idx] * rhs_data[b * N + rhs_idx];
+                float& accum = out_data[b * N + i];
+                if constexpr (temperature) {
+                    accum += val;
+                } else {
+                    accum = std::max(accum, val);
+                }
             }
         }
-        out_data[i] = accum;
     }
 
     return out;
@@ -82,14 +92,16 @@ at::Tensor binary_function_distribute_product(const at::Tensor& f_ptrs,
                                               const at::Tensor& parent_counts,
                                               const at::Tensor& probs,
                                               double weight) {
-    // Check shapes: f_ptrs [N+1], f_args [NNZ, 2], parent_counts [N], probs [N]
+    // Check shapes: f_ptrs [N+1], f_args [NNZ, 2], parent_counts [N] or
+    // [B, N], probs [N]
     TORCH_CHECK(f_ptrs.dim() == 1);
     TORCH_CHECK(f_args.dim() == 2);
-    TORCH_CHECK(parent_counts.dim() == 1);
+    TORCH_CHECK(parent_counts.dim() == 1 || parent_counts.dim() == 2);
     TORCH_CHECK(probs.dim() == 1);
     const int64_t N = f_ptrs.size(0) - 1;
     const int64_t NNZ = f_args.size(0);
-    TORCH_CHECK(parent_counts.size(0) == N);
+    const int64_t B = parent_counts.dim() == 2 ? parent_counts.size(0) : 1;
+    TORCH_CHECK(parent_counts.size(-1) == N);
     TORCH_CHECK(probs.size(0) == N);
 
     // Check dtypes
@@ -117,16 +129,21 @@ at::Tensor binary_function_distribute_product(const at::Tensor& f_ptrs,
     const float* parent_counts_data = parent_counts.data_ptr<float>();
     const float* probs_data = probs.data_ptr<float>();
 
-    at::Tensor out = at::zeros_like(probs);
+    at::Tensor out = at::zeros_like(parent_counts);
     float* out_data = out.data_ptr<float>();
 
     const float eps = 1e-10f;  // Small epsilon to avoid division by zero
     const float weight_f = static_cast<float>(weight);
 
-    // For each parent E-class, distribute its count to children
+    // For each parent E-class, distribute its count to children. Each
+    // decomposition's fraction depends only on probs, so it is computed once
+    // and applied to every batch element.
     for (int64_t v = 0; v < N; v++) {
-        const float parent_count = parent_counts_data[v];
-        if (parent_count == 0.0f) continue;
+        bool any_count = false;
+        for (int64_t b = 0; b < B; b++) {
+            any_count |= parent_counts_data[b * N + v] != 0.0f;
+        }
+        if (not any_count) continue;
 
         const float parent_prob = probs_data[v];
         if (parent_prob <= eps)
@@ -142,13 +159,17 @@ at::Tensor binary_function_distribute_product(const at::Tensor& f_ptrs,
             // Probability contribution of this decomposition f(l,r) = v
             const float decomp_prob = weight_f * probs_data[l] * probs_data[r];
             const float fraction = decomp_prob / parent_prob;
-            const float contribution = parent_count * fraction;
+
+            for (int64_t b = 0; b < B; b++) {
+                const float contribution =
+                    parent_counts_data[b * N + v] * fraction;
 
 // Add contributions to both children (atomic operations for thread safety)
 #pragma omp atomic
-            out_data[l] += contribution;
+                out_data[b * N + l] += contribution;
 #pragma omp atomic
-            out_data[r] += contribution;
+                out_data[b * N + r] += contribution;
+            }
         }
     }
 
@@ -167,6 +188,90 @@ int64_t hash_pair(int64_t lhs, int64_t rhs) {
     return static_cast<int64_t>(hash_value);
 }
 
+at::Tensor sparse_binary_function_lookup(const at::Tensor& hash_table,
+                                         const at::Tensor& args) {
+    // Check shapes: hash_table [H, 3], args [N, 2]
+    TORCH_CHECK(hash_table.dim() == 2);
+    TORCH_CHECK(hash_table.size(1) == 3);
+    TORCH_CHECK(args.dim() == 2);
+    TORCH_CHECK(args.size(1) == 2);
+    const int64_t H = hash_table.size(0);
+    const int64_t N = args.size(0);
+    TORCH_CHECK(H > 0);
+
+    // Check dtypes, devices, and contiguity
+    TORCH_CHECK(hash_table.dtype() == at::kInt);
+    TORCH_CHECK(args.dtype() == at::kInt);
+    TORCH_CHECK(hash_table.device().type() == at::DeviceType::CPU);
+    TORCH_CHECK(args.device().type() == at::DeviceType::CPU);
+    TORCH_CHECK(hash_table.is_contiguous());
+    TORCH_CHECK(args.is_contiguous());
+
+    const int32_t* table_data = hash_table.data_ptr<int32_t>();
+    const int32_t* args_data = args.data_ptr<int32_t>();
+    at::Tensor out = at::empty({N}, at::dtype(at::kInt));
+    int32_t* out_data = out.data_ptr<int32_t>();
+
+    // Linear probing, as in SparseBinaryFunction.__getitem__.
+#pragma omp parallel for schedule(static)
+    for (int64_t i = 0; i < N; i++) {
+        const int32_t lhs = args_data[i * 2];
+        const int32_t rhs = args_data[i * 2 + 1];
+        int64_t h = std::abs(hash_pair(lhs, rhs)) % H;
+        int32_t val = 0;
+        for (int64_t step = 0; step < H; step++) {
+            const int32_t* entry = table_data + h * 3;
+            if (entry[0] == lhs and entry[1] == rhs) {
+                val = entry[2];
+                break;
+            }
+            if (entry[0] == 0) break;
+            h = (h + 1) % H;
+        }
+        out_data[i] = val;
+    }
+
+    return out;
+}
+
+void sparse_binary_function_insert(const at::Tensor& hash_table,
+                                   const at::Tensor& entries) {
+    // Check shapes: hash_table [H, 3], entries [N, 3]
+    TORCH_CHECK(hash_table.dim() == 2);
+    TORCH_CHECK(hash_table.size(1) == 3);
+    TORCH_CHECK(entries.dim() == 2);
+    TORCH_CHECK(entries.size(1) == 3);
+    const int64_t H = hash_table.size(0);
+    const int64_t N = entries.size(0);
+    TORCH_CHECK(N < H, "hash table is too small");
+
+    // Check dtypes, devices, and contiguity
+    TORCH_CHECK(hash_table.dtype() == at::kInt);
+    TORCH_CHECK(entries.dtype() == at::kInt);
+    TORCH_CHECK(hash_table.device().type() == at::DeviceType::CPU);
+    TORCH_CHECK(entries.device().type() == at::DeviceType::CPU);
+    TORCH_CHECK(hash_table.is_contiguous());
+    TORCH_CHECK(entries.is_contiguous());
+
+    int32_t* table_data = hash_table.data_ptr<int32_t>();
+    const int32_t* entries_data = entries.data_ptr<int32_t>();
+
+    // Insert sequentially, so that probe sequences match
+    // SparseBinaryFunction.__setitem__ and load_structure.
+    for (int64_t i = 0; i < N; i++) {
+        const int32_t lhs = entries_data[i * 3];
+        const int32_t rhs = entries_data[i * 3 + 1];
+        const int32_t val = entries_data[i * 3 + 2];
+        int64_t h = std::abs(hash_pair(lhs, rhs)) % H;
+        while (table_data[h * 3] != 0) {
+            h = (h + 1) % H;
+        }
+        table_data[h * 3] = lhs;
+        table_data[h * 3 + 1] = rhs;
+        table_data[h * 3 + 2] = val;
+    }
+}
+
 template <typename MessageType, typename Func>
 void visit_chunks(const MessageType& message, Func func) {
     // Visit the main message first
@@ -185,8 +290,9 @@ void visit_chunks(const MessageType& message, Func func) {
     }
 }
 
-std::tuple<std::vector<std::string>, std::vector<at::Tensor>> load_structure(
-    const std::string& filename, bool relations) {
+std::tuple<std::string, std::vector<std::string>, std::vector<at::Tensor>>
+load_structure(const std::string& filename, bool relations,
+               bool packed_relations) {
     std::vector<std::string> keys;
     std::vector<at::Tensor> tensors;
 
@@ -437,11 +543,80 @@ std::tuple<std::vector<std::string>, std::vector<at::Tensor>> load_structure(
 
     // Process relations if requested
     if (relations) {
-        // TODO: Add unary and binary relations processing here if needed
-        TORCH_CHECK(false, "Relations not implemented");
+        const int64_t dim = item_count + 1;
+        const int64_t words = (dim + 63) / 64;
+
+        // Unpack an LSB-first bitset into a dense bool row, or-ing with dest.
+        auto unpack_dense = [dim](const std::string& dense, bool* dest) {
+            const int64_t size = std::min<int64_t>(dense.size() * 8, dim);
+            const auto* bytes = reinterpret_cast<const uint8_t*>(dense.data());
+            for (int64_t i = 0; i < size; ++i) {
+                dest[i] |= (bytes[i / 8] >> (i % 8)) & 1;
+            }
+        };
+
+        // Or an LSB-first bitset into a row of little-endian uint64 words,
+        // matching the in-memory layout of DenseSet.
+        auto pack_dense = [dim, words](const std::string& dense,
+                                       int64_t* dest) {
+            auto* dest_bytes = reinterpret_cast<uint8_t*>(dest);
+            const int64_t size = std::min<int64_t>(dense.size(), words * 8);
+            const auto* bytes = reinterpret_cast<const uint8_t*>(dense.data());
+            for (int64_t i = 0; i < size; ++i) {
+                dest_bytes[i] |= bytes[i];
+            }
+            if (dim % 64) {
+                dest[words - 1] &= (int64_t(1) << (dim % 64)) - 1;
+            }
+        };
+
+        for (const auto& proto_rel : proto_structure.unary_relations()) {
+            at::Tensor set = at::zeros({dim}, at::dtype(at::kBool));
+            bool* set_data = set.data_ptr<bool>();
+            visit_chunks(proto_rel,
+                         [&](const atlas::protobuf::UnaryRelation& chunk) {
+                             unpack_dense(chunk.set().dense(), set_data);
+                         });
+            keys.emplace_back("unary_relations." + proto_rel.name());
+            tensors.emplace_back(set);
+        }
+
+        for (const auto& proto_rel : proto_structure.binary_relations()) {
+            at::Tensor rel;
+            if (packed_relations) {
+                rel = at::zeros({dim, words}, at::dtype(at::kLong));
+                int64_t* rel_data = rel.data_ptr<int64_t>();
+                visit_chunks(
+                    proto_rel,
+                    [&](const atlas::protobuf::BinaryRelation& chunk) {
+                        for (const auto& row : chunk.rows()) {
+                            TORCH_CHECK(row.lhs() < dim);
+                            pack_dense(row.rhs().dense(),
+                                       rel_data + row.lhs() * words);
+                        }
+                    });
+                keys.emplace_back("packed_binary_relations." +
+                                  proto_rel.name());
+            } else {
+                rel = at::zeros({dim, dim}, at::dtype(at::kBool));
+                bool* rel_data = rel.data_ptr<bool>();
+                visit_chunks(
+                    proto_rel,
+                    [&](const atlas::protobuf::BinaryRelation& chunk) {
+                        for (const auto& row : chunk.rows()) {
+                            TORCH_CHECK(row.lhs() < dim);
+                            unpack_dense(row.rhs().dense(),
+                                         rel_data + row.lhs() * dim);
+                        }
+                    });
+                keys.emplace_back("binary_relations." + proto_rel.name());
+            }
+            tensors.emplace_back(rel);
+        }
     }
 
-    return std::make_tuple(std::move(keys), std::move(tensors));
+    return std::make_tuple(proto_structure.name(), std::move(keys),
+                           std::move(tensors));
 }
 
 void init_extension(const std::string& blob_dir) { init_blob_dir(blob_dir); }
@@ -30,10 +30,20 @@ at::Tensor binary_function_distribute_product(const at::Tensor& f_ptrs,
 // Hash function for SparseBinaryFunction
 int64_t hash_pair(int64_t lhs, int64_t rhs);
 
-// Structure loading function (stub for testing) - returns parallel arrays of
-// keys and tensors
-std::tuple<std::vector<std::string>, std::vector<at::Tensor>> load_structure(
-    const std::string& filename, bool relations);
+// Batched lookup in a SparseBinaryFunction hash table [H, 3] of args [N, 2]
+at::Tensor sparse_binary_function_lookup(const at::Tensor& hash_table,
+                                         const at::Tensor& args);
+
+// Sequential insertion of entries [N, 3] into a SparseBinaryFunction hash table
+void sparse_binary_function_insert(const at::Tensor& hash_table,
+                                   const at::Tensor& entries);
+
+// Structure loading function - returns the structure name and parallel arrays
+// of keys and tensors. Binary relations are dense bool matrices, or if
+// packed_relations, rows of uint64 bitset words stored as int64.
+std::tuple<std::string, std::vector<std::string>, std::vector<at::Tensor>>
+load_structure(const std::string& filename, bool relations,
+               bool packed_relations);
 
 // Initialize the extension with blob directory
 void init_extension(const std::string& blob_dir);
@@ -84,6 +84,19 @@ class SparseBinaryFunction:
             h = (h + 1) % H
         return int(self.hash_table[h, 2])
 
+    def lookup(self, args: torch.Tensor) -> torch.Tensor:
+        """
+        Batched lookup of many (lhs, rhs) pairs at once.
+
+        Args:
+            args: Tensor of shape [N, 2] of (lhs, rhs) pairs.
+
+        Returns:
+            Tensor of shape [N] of values, with zero where undefined.
+        """
+        args = args.to(torch.int32).contiguous()
+        return torch.ops.pomagma.sparse_binary_function_lookup(self.hash_table, args)
+
     def __setitem__(self, key: tuple[Ob, Ob], val: Ob) -> None:
         lhs, rhs = key
         H = self.hash_table.size(0)
@@ -94,6 +107,14 @@ class SparseBinaryFunction:
         self.hash_table[h, 1] = rhs
         self.hash_table[h, 2] = val
 
+    def insert(self, entries: torch.Tensor) -> None:
+        """
+        Batched insertion of an [N, 3] tensor of (lhs, rhs, val) entries, in
+        order, equivalent to repeated __setitem__.
+        """
+        entries = entries.to(torch.int32).contiguous()
+        torch.ops.pomagma.sparse_binary_function_insert(self.hash_table, entries)
+
 
 @dataclass(frozen=True, slots=True, eq=False)
 class SparseTernaryRelation:
@@ -153,8 +174,18 @@ class BinaryFunction:
         """Lookup the value of the function at the given (lhs, rhs) pair."""
         return self.LRv[key]
 
+    def lookup(self, args: torch.Tensor) -> torch.Tensor:
+        """Batched lookup of an [N, 2] tensor of (lhs, rhs) pairs."""
+        return self.LRv.lookup(args)
+
     def sum_product(self, lhs: torch.Tensor, rhs: torch.Tensor) -> torch.Tensor:
-        """Differentiably convolve two weight vectors."""
+        """
+        Differentiably convolve two weight vectors.
+
+        Inputs may be vectors of shape [1 + item_count] or batches of vectors of
+        shape [B, 1 + item_count], in which case each batch element is
+        convolved independently while sharing a single walk over the table.
+        """
         return BinaryFunctionSumProduct.apply(
             self.Vlr.ptrs,
             self.Vlr.args,
@@ -182,12 +213,78 @@ class BinaryFunction:
 
     @torch.no_grad()
     def max_product(self, lhs: torch.Tensor, rhs: torch.Tensor) -> torch.Tensor:
-        """Non-differentiably max-convolve two weight vectors."""
+        """
+        Non-differentiably max-convolve two weight vectors, optionally batched
+        as in sum_product.
+        """
         return torch.ops.pomagma.binary_function_max_product(
             self.Vlr.ptrs, self.Vlr.args, lhs, rhs
         )
 
 
+@dataclass(frozen=True, slots=True, eq=False)
+class PackedBinaryRelation:
+    """
+    A binary relation stored as packed bitsets, one row per left argument.
+
+    This matches the layout of the C++ DenseSet: bit j % 64 of word j // 64 of
+    row i is set iff (i, j) is in the relation. Words are uint64 stored as
+    int64, since torch lacks full uint64 support.
+
+    Fields:
+        words: Tensor of shape [1 + item_count, W] where W = ceil((1 + item_count)
+            / 64), of dtype int64.
+    """
+
+    words: torch.Tensor
+
+    @property
+    def item_count(self) -> int:
+        return self.words.size(0) - 1
+
+    @staticmethod
+    def from_dense(dense: torch.Tensor) -> "PackedBinaryRelation":
+        """Packs a dense bool tensor of shape [1 + item_count, 1 + item_count]."""
+        dim = dense.size(0)
+        assert dense.shape == (dim, dim)
+        num_words = -(-dim // 64)
+        bits = torch.zeros(dim, num_words * 64, dtype=torch.int64)
+        bits[:, :dim] = dense
+        bits = bits.view(dim, num_words, 64) << torch.arange(64, dtype=torch.int64)
+        return PackedBinaryRelation(words=bits.sum(dim=-1))
+
+    def to_dense(self) -> torch.Tensor:
+        """Unpacks to a dense bool tensor of shape [1 + item_count, 1 + item_count]."""
+        return self.rows(torch.arange(self.words.size(0)))
+
+    def rows(self, lhs: torch.Tensor) -> torch.Tensor:
+        """Returns dense bool rows of shape [K, 1 + item_count] for K lhs obs."""
+        dim = self.words.size(0)
+        shifts = torch.arange(64, dtype=torch.int64)
+        bits = (self.words[lhs.long()][..., None] >> shifts) & 1
+        return bits.flatten(-2)[..., :dim].bool()
+
+    def row(self, lhs: Ob) -> torch.Tensor:
+        """Returns the dense bool set {rhs | (lhs, rhs) in relation}."""
+        return self.rows(torch.tensor([lhs]))[0]
+
+    def col(self, rhs: Ob) -> torch.Tensor:
+        """Returns the dense bool set {lhs | (lhs, rhs) in relation}."""
+        return self.cols(torch.tensor([rhs]))[:, 0]
+
+    def cols(self, rhs: torch.Tensor) -> torch.Tensor:
+        """Returns dense bool columns of shape [1 + item_count, K] for K rhs obs."""
+        rhs = rhs.long()
+        return ((self.words[:, rhs // 64] >> (rhs % 64)) & 1).bool()
+
+    def __getitem__(self, key: tuple[Ob, Ob]) -> bool:
+        lhs, rhs = key
+        return bool((int(self.words[lhs, rhs // 64]) >> (rhs % 64)) & 1)
+
+    def assert_eq(self, other: "PackedBinaryRelation") -> None:
+        assert_tensors_equal(self.words, other.words)
+
+
 @dataclass(frozen=True, slots=True, eq=False)
 class Structure:
     """
@@ -196,7 +293,8 @@ class Structure:
     Functions are stored as BinaryFunction objects with sparse CSR representations.
     Relations are dense tensors:
     - Unary relations: shape [1 + item_count]
-    - Binary relations: shape [1 + item_count, 1 + item_count]
+    - Binary relations: shape [1 + item_count, 1 + item_count], or
+      PackedBinaryRelation objects if loaded with packed_relations=True.
     """
 
     name: str
@@ -205,7 +303,7 @@ class Structure:
     binary_functions: Mapping[str, BinaryFunction]
     symmetric_functions: Mapping[str, BinaryFunction]
     unary_relations: Mapping[str, torch.Tensor]
-    binary_relations: Mapping[str, torch.Tensor]
+    binary_relations: Mapping[str, "torch.Tensor | PackedBinaryRelation"]
 
     def assert_eq(self, other: "Structure") -> None:
         assert self.name == other.name
@@ -230,18 +328,32 @@ class Structure:
         assert set(self.binary_relations) == set(other.binary_relations)
         for name, rel in self.binary_relations.items():
             assert name in other.binary_relations
-            assert_tensors_equal(rel, other.binary_relations[name])
+            other_rel = other.binary_relations[name]
+            if isinstance(rel, PackedBinaryRelation):
+                assert isinstance(other_rel, PackedBinaryRelation)
+                rel.assert_eq(other_rel)
+            else:
+                assert isinstance(other_rel, torch.Tensor)
+                assert_tensors_equal(rel, other_rel)
 
     @staticmethod
     def load(
         filename: str,
         *,
         relations: bool = False,
+        packed_relations: bool = False,
         backend: Literal["python", "cpp"] = "cpp",
+        cache: bool = False,
     ) -> "Structure":
         """
         Load a structure from a protobuf file.
         """
         from .io import load_structure
 
-        return load_structure(filename, relations=relations, backend=backend)
+        return load_structure(
+            filename,
+            relations=relations,
+            packed_relations=packed_relations,
+            backend=backend,
+            cache=cache,
+        )
@@ -7,7 +7,9 @@ import pytest
 import torch
 from immutables import Map
 
+from .extraction import Extractor
 from .language import Language
+from .solvers import Solver
 from .structure import (
     BinaryFunction,
     BinaryFunctionSumProduct,
@@ -114,6 +116,29 @@ def test_binary_function(item_count: int, temperature: bool) -> None:
     assert out.device == lhs.device
 
 
+@pytest.mark.parametrize("temperature", [True, False])
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_binary_function_batched(batch_size: int, temperature: bool) -> None:
+    item_count = 10
+    table = make_dense_bin_fun(item_count)
+    f_ptrs, f_args = make_Vlr_sparse(item_count, table)
+
+    lhs = torch.randn(batch_size, 1 + item_count, dtype=torch.float32)
+    rhs = torch.randn(batch_size, 1 + item_count, dtype=torch.float32)
+
+    if temperature:
+        op = torch.ops.pomagma.binary_function_sum_product
+    else:
+        op = torch.ops.pomagma.binary_function_max_product
+
+    actual = op(f_ptrs, f_args, lhs, rhs)
+    assert actual.shape == (batch_size, 1 + item_count)
+    expected = torch.stack(
+        [op(f_ptrs, f_args, lhs[b], rhs[b]) for b in range(batch_size)]
+    )
+    assert torch.allclose(actual, expected)
+
+
 @pytest.mark.parametrize("item_count", [5, 10])
 def test_torch_binary_function_gradients(item_count: int) -> None:
     """Test that TorchBinaryFunction gradients are correctly implemented."""
@@ -220,6 +245,35 @@ def test_compute_probs(structure: Structure, language: Language) -> None:
     assert 0.5 <= total_prob <= 1.0
 
 
+@pytest.mark.parametrize("solver", ["anderson", "newton_krylov"])
+def test_compute_probs_solver(
+    structure: Structure, language: Language, solver: Solver
+) -> None:
+    expected = language.compute_probs(structure, reltol=1e-5)
+    residuals: list[float] = []
+    actual = language.compute_probs(
+        structure, reltol=1e-5, solver=solver, residuals=residuals
+    )
+    assert residuals
+    assert torch.allclose(actual, expected, rtol=1e-3, atol=1e-6)
+
+
+def test_compute_probs_batch(structure: Structure, language: Language) -> None:
+    languages = [language, language.zeros_like()]
+    with torch.no_grad():
+        languages[1].nullary_functions.copy_(language.nullary_functions)
+        for name, weight in language.binary_functions.items():
+            languages[1].binary_functions[name].copy_(0.5 * weight)
+        for name, weight in language.symmetric_functions.items():
+            languages[1].symmetric_functions[name].copy_(0.5 * weight)
+
+    probs = Language.compute_probs_batch(languages, structure, reltol=1e-4)
+    assert probs.shape == (len(languages), structure.item_count + 1)
+    for lang, actual in zip(languages, probs):
+        expected = lang.compute_probs(structure, reltol=1e-4)
+        assert torch.allclose(actual, expected, rtol=1e-3, atol=1e-6)
+
+
 def test_log_prob(structure: Structure, language: Language) -> None:
     data = language
     probs = language.compute_probs(structure)
@@ -494,6 +548,20 @@ def test_extract_all(structure: Structure, language: Language) -> None:
             assert isinstance(expr, Expression)
 
 
+def test_extract_all_obs_reference(structure: Structure, language: Language) -> None:
+    best = language.compute_best(structure)
+    expected = Extractor(structure, language).extract_all_obs_reference(best=best)
+    extractor = Extractor(structure, language)
+    actual = extractor.extract_all_obs(best=best)
+    assert actual == expected
+
+    # Lazy extraction agrees with bulk extraction.
+    lazy = Extractor(structure, language)
+    lazy.compute_backpointers(best=best)
+    for ob in random.sample(range(1, 1 + structure.item_count), 20):
+        assert lazy.extract_ob(Ob(ob)) == expected[Ob(ob)]
+
+
 @pytest.mark.parametrize("item_count", [10])
 def test_extract_all_mul(item_count: int) -> None:
     """Test extract_all with the multiplication table example."""
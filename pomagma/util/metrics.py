@@ -7,17 +7,28 @@ These are observability tools whose growth is logarithmic in time.
 import atexit
 import logging
 from collections import Counter, defaultdict
-from collections.abc import Mapping
+from collections.abc import Callable, Mapping
 
 logger = logging.getLogger(__name__)
 
 COUNTERS: Mapping[str, Counter[str]] = defaultdict(Counter)
 """Global counters for function calls and errors. Not thread safe."""
 
+COLLECTORS: list[Callable[[], None]] = []
+"""Callbacks that copy cheaper per-object tallies into COUNTERS on read."""
+
+
+def collect_counters() -> Mapping[str, Counter[str]]:
+    """Updates COUNTERS from all COLLECTORS, then returns COUNTERS."""
+    for collect in COLLECTORS:
+        collect()
+    return COUNTERS
+
 
 @atexit.register
 def log_counters() -> None:
     """Logs counter statistics."""
+    collect_counters()
     if not any(v for counter in COUNTERS.values() for v in counter.values()):
         return
     table = [("count", "counter", "key")] + [